@@ -2,10 +2,10 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
 from .models import (
-    PaymentProof, UserProfile, Video, AuditLog,
+    PaymentProof, UserProfile, Video,
     MembershipTier, MembershipAccess, AccessRequest,
     VideoStreamSession, VideoAnalytics, MegaVideo,
-    MembershipUpgradeRequest
+    MembershipUpgradeRequest, BackgroundJob, RevenueEntry
 )
 from django.utils.html import mark_safe, format_html
 from django.utils import timezone
@@ -15,6 +15,8 @@ from django.http import HttpResponse
 from django.core.mail import send_mail
 from datetime import timedelta
 from django.conf import settings
+from .services.write_buffer import record_audit
+from .services.revenue import record_upgrade_request
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -116,7 +118,7 @@ class VideoAdmin(admin.ModelAdmin):
 
     def delete_model(self, request, obj):
         # Log the deletion
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='video_delete',
             action=f'Deleted video: {obj.title}',
@@ -128,7 +130,7 @@ class VideoAdmin(admin.ModelAdmin):
     def delete_queryset(self, request, queryset):
         # Log bulk deletions
         for obj in queryset:
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action_type='video_delete',
                 action=f'Deleted video: {obj.title} (bulk delete)',
@@ -150,10 +152,10 @@ class VideoAnalyticsAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
 
 class MegaVideoAdmin(admin.ModelAdmin):
-    list_display = ['title', 'membership_tier', 'is_free', 'created_at', 'views', 'thumbnail_preview']
-    list_filter = ['membership_tier', 'is_free', 'created_at']
+    list_display = ['title', 'membership_tier', 'is_free', 'hls_status', 'created_at', 'views', 'thumbnail_preview']
+    list_filter = ['membership_tier', 'is_free', 'hls_status', 'created_at']
     search_fields = ['title', 'description']
-    readonly_fields = ['created_at', 'updated_at', 'views', 'thumbnail_preview']
+    readonly_fields = ['created_at', 'updated_at', 'views', 'thumbnail_preview', 'hls_status', 'hls_playlist', 'hls_packaged_at']
     fieldsets = (
         ('Video Information', {
             'fields': ('title', 'description', 'mega_file_link', 'is_free', 'membership_tier')
@@ -161,6 +163,9 @@ class MegaVideoAdmin(admin.ModelAdmin):
         ('Thumbnail', {
             'fields': ('thumbnail', 'thumbnail_url', 'thumbnail_preview')
         }),
+        ('HLS Streaming', {
+            'fields': ('hls_status', 'hls_playlist', 'hls_packaged_at')
+        }),
         ('Statistics', {
             'fields': ('views', 'duration_ms', 'created_at', 'updated_at')
         }),
@@ -179,7 +184,7 @@ class MegaVideoAdmin(admin.ModelAdmin):
         action_type = 'mega_video_update' if change else 'mega_video_create'
         action_desc = f'Updated mega video: {obj.title}' if change else f'Created mega video: {obj.title}'
         
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type=action_type,
             action=action_desc,
@@ -190,7 +195,7 @@ class MegaVideoAdmin(admin.ModelAdmin):
     
     def delete_model(self, request, obj):
         # Log the deletion
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='mega_video_delete',
             action=f'Deleted mega video: {obj.title}',
@@ -237,11 +242,13 @@ class MembershipUpgradeRequestAdmin(admin.ModelAdmin):
             
             if obj.status == 'approved':
                 # Update user's membership
-                profile = obj.user.userprofile
+                profile = obj.user.profile
                 profile.membership_tier = obj.desired_tier
                 profile.membership_start_date = timezone.now()
-                profile.membership_end_date = timezone.now() + timedelta(days=30)  # 30-day membership
+                profile.membership_end_date = timezone.now() + timedelta(days=obj.MEMBERSHIP_DAYS)
                 profile.save()
+
+                record_upgrade_request(obj, request.user, profile.membership_start_date, profile.membership_end_date)
                 
                 # Send email notification to user
                 subject = 'Membership Upgrade Approved'
@@ -284,3 +291,33 @@ class MembershipUpgradeRequestAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         return False  # Prevent deletion of upgrade requests
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'priority', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'unique_key', 'last_error')
+    readonly_fields = ('attempts', 'locked_by', 'locked_until', 'result', 'last_error', 'created_at', 'started_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status='failed').update(status='queued', attempts=0, run_at=timezone.now())
+        self.message_user(request, f'{updated} job(s) queued again.')
+    retry_jobs.short_description = 'Retry selected failed jobs'
+
+@admin.register(RevenueEntry)
+class RevenueEntryAdmin(admin.ModelAdmin):
+    """The ledger is append-only: entries can be browsed but never edited or removed"""
+    list_display = ('recorded_at', 'source', 'source_id', 'user', 'tier', 'amount', 'period_start', 'period_end')
+    list_filter = ('source', 'tier', 'recorded_at')
+    search_fields = ('user__username', 'user__email')
+    date_hierarchy = 'recorded_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -10,3 +10,5 @@ class MyappConfig(AppConfig):
         """Initialize app-specific configurations."""
         # Import and register template tags
         import myapp.templatetags.myapp_filters  # noqa
+        # Keep dashboard counters in step with model changes
+        import myapp.signals  # noqa
@@ -0,0 +1,241 @@
+import random
+import importlib
+import threading
+import traceback
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Database-backed job queue. Web requests call enqueue(); `manage.py runworker`
+# claims jobs with claim_job() and runs them with run_job(). Tasks are plain
+# functions registered with @task in myapp/tasks.py. Each task belongs to a
+# queue, and a worker started with --queue only claims jobs from those queues:
+# tasks that write files under MEDIA_ROOT use the 'media' queue, so they run
+# on the host that serves MEDIA_ROOT.
+
+
+def get_job_settings() -> dict:
+    """Return background job settings merged with defaults"""
+    defaults = {
+        'POLL_INTERVAL': 2,  # seconds an idle worker sleeps between polls
+        'LEASE_SECONDS': 300,  # a running job is reclaimed if its worker goes silent this long
+        'HEARTBEAT_SECONDS': 60,  # how often a worker extends the lease of the job it is running
+        'MAX_ATTEMPTS': 3,
+        'BACKOFF_BASE': 30,  # first retry delay; doubles on each attempt
+        'BACKOFF_MAX': 3600,
+        # task name -> seconds between runs, scheduled by the worker
+        'PERIODIC': {
+            'reconcile_dashboard_counters': 3600,
+            'roll_up_video_analytics': 600,
+            'prune_change_events': 3600,
+            # archive_old_rows is opt-in: it needs ARCHIVE['STORAGE'] configured
+        },
+    }
+    defaults.update(getattr(settings, 'BACKGROUND_JOBS', {}))
+    return defaults
+
+
+_tasks = {}
+
+
+def task(name=None, max_attempts=None, priority=0, queue='default'):
+    """Register a function as a job task: `@task(priority=5, queue='media')`"""
+    def decorator(func):
+        _tasks[name or func.__name__] = {
+            'func': func,
+            'max_attempts': max_attempts,
+            'priority': priority,
+            'queue': queue,
+        }
+        return func
+    return decorator
+
+
+def get_task(name: str) -> dict:
+    """Look up a registered task, loading myapp.tasks on first use"""
+    if name not in _tasks:
+        importlib.import_module('myapp.tasks')
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"Unknown background task: {name}")
+
+
+def enqueue(task_name: str, kwargs: dict = None, priority: int = None, delay: float = 0,
+            created_by=None, unique_key: str = ''):
+    """
+    Queue a task to run in the worker and return its BackgroundJob. With a
+    unique_key, an already queued or running job with the same key is
+    returned instead of adding a duplicate.
+    """
+    from .models import BackgroundJob
+
+    registered = get_task(task_name)
+
+    if unique_key:
+        existing = BackgroundJob.objects.filter(
+            unique_key=unique_key,
+            status__in=['queued', 'running']
+        ).first()
+        if existing:
+            return existing
+
+    return BackgroundJob.objects.create(
+        task=task_name,
+        kwargs=kwargs or {},
+        queue=registered['queue'],
+        unique_key=unique_key,
+        priority=registered['priority'] if priority is None else priority,
+        max_attempts=registered['max_attempts'] or get_job_settings()['MAX_ATTEMPTS'],
+        run_at=timezone.now() + timedelta(seconds=delay),
+        created_by=created_by if created_by and created_by.is_authenticated else None,
+    )
+
+
+def schedule_periodic() -> None:
+    """
+    Make sure every PERIODIC task has its next run queued. The unique key
+    keeps concurrent workers from scheduling the same task twice.
+    """
+    from .models import BackgroundJob
+
+    for task_name, interval in get_job_settings()['PERIODIC'].items():
+        unique_key = f'periodic:{task_name}'
+        if BackgroundJob.objects.filter(unique_key=unique_key, status__in=['queued', 'running']).exists():
+            continue
+        last = BackgroundJob.objects.filter(unique_key=unique_key).order_by('-created_at').first()
+        delay = 0
+        if last and last.finished_at:
+            delay = max((last.finished_at + timedelta(seconds=interval) - timezone.now()).total_seconds(), 0)
+        enqueue(task_name, delay=delay, unique_key=unique_key)
+
+
+def claim_job(worker_id: str, queues=None):
+    """
+    Lease the next runnable job to this worker, or return None. Uses
+    SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, and a
+    conditional UPDATE (optimistic lease) elsewhere, e.g. SQLite. With
+    `queues`, only jobs in those queues are considered.
+    """
+    from .models import BackgroundJob
+
+    now = timezone.now()
+    claimable = BackgroundJob.objects.filter(
+        # Running jobs whose lease expired belong to a worker that died
+        Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+    ).order_by('-priority', 'run_at', 'id')
+    if queues:
+        claimable = claimable.filter(queue__in=queues)
+    lease = {
+        'status': 'running',
+        'locked_by': worker_id,
+        'locked_until': now + timedelta(seconds=get_job_settings()['LEASE_SECONDS']),
+        'started_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = claimable.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            BackgroundJob.objects.filter(pk=job.pk).update(**lease)
+    else:
+        for job in claimable[:5]:
+            # Losing the race to another worker just means trying the next candidate
+            if BackgroundJob.objects.filter(
+                pk=job.pk,
+                status=job.status,
+                attempts=job.attempts,
+                locked_until=job.locked_until
+            ).update(**lease):
+                break
+        else:
+            return None
+
+    job.refresh_from_db()
+    return job
+
+
+def _retry_delay(attempts: int) -> float:
+    job_settings = get_job_settings()
+    delay = min(job_settings['BACKOFF_BASE'] * 2 ** max(attempts - 1, 0), job_settings['BACKOFF_MAX'])
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _heartbeat(job, owned, stop: threading.Event) -> None:
+    """Extend the lease on a running job every HEARTBEAT_SECONDS until `stop` is set"""
+    job_settings = get_job_settings()
+    try:
+        while not stop.wait(job_settings['HEARTBEAT_SECONDS']):
+            if not owned.update(locked_until=timezone.now() + timedelta(seconds=job_settings['LEASE_SECONDS'])):
+                logger.warning(f"Job {job.pk} ({job.task}) lost its lease; it may be run again by another worker")
+                return
+    except Exception as e:
+        logger.error(f"Error extending the lease of job {job.pk}: {str(e)}")
+    finally:
+        # Closes this thread's own database connection
+        connection.close()
+
+
+def _call_task(job, owned):
+    """
+    Run a job's task while a heartbeat thread keeps its lease alive, so a
+    Drive sync or export that outlasts LEASE_SECONDS is not reclaimed and
+    run twice, while a worker that dies still loses its jobs quickly.
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job, owned, stop), name=f'job-{job.pk}-heartbeat', daemon=True)
+    heartbeat.start()
+    try:
+        return get_task(job.task)['func'](**job.kwargs)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def run_job(job) -> bool:
+    """Run a claimed job and record the outcome; returns True on success"""
+    from .models import BackgroundJob
+
+    # Only touch the row while we still hold the lease
+    owned = BackgroundJob.objects.filter(pk=job.pk, locked_by=job.locked_by, status='running')
+
+    try:
+        result = _call_task(job, owned)
+    except Exception as e:
+        now = timezone.now()
+        error = traceback.format_exc()[-5000:]
+        if job.attempts < job.max_attempts:
+            delay = _retry_delay(job.attempts)
+            logger.warning(f"Job {job.pk} ({job.task}) failed on attempt {job.attempts}, retrying in {delay:.0f}s: {str(e)}")
+            owned.update(
+                status='queued',
+                run_at=now + timedelta(seconds=delay),
+                locked_by='',
+                locked_until=None,
+                last_error=error
+            )
+        else:
+            logger.error(f"Job {job.pk} ({job.task}) failed after {job.attempts} attempts: {str(e)}")
+            owned.update(
+                status='failed',
+                finished_at=now,
+                locked_until=None,
+                last_error=error
+            )
+        return False
+
+    owned.update(
+        status='succeeded',
+        result=result,
+        finished_at=timezone.now(),
+        locked_until=None,
+        last_error=''
+    )
+    return True
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from myapp.models import MegaVideo
+from myapp.services.hls_service import expire_stale_processing, package_mega_video
+
+
+class Command(BaseCommand):
+    help = 'Package MegaVideos into a 240p-1080p HLS ladder with a master playlist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int, help='IDs of the videos to package')
+        parser.add_argument('--source', help='Local file or URL to read instead of the video link (single video only)')
+        parser.add_argument('--pending', action='store_true', help='Package every video without a ready ladder')
+        parser.add_argument('--force', action='store_true', help='Re-package videos that are already ready')
+
+    def handle(self, *args, **options):
+        video_ids = options['video_ids']
+        source = options.get('source')
+
+        if source and len(video_ids) != 1:
+            raise CommandError('--source can only be used with exactly one video id')
+
+        expired = expire_stale_processing()
+        if expired:
+            self.stdout.write(f'Reset {expired} video(s) stuck in processing')
+
+        if options['pending']:
+            videos = MegaVideo.objects.exclude(hls_status='ready')
+        elif video_ids:
+            videos = MegaVideo.objects.filter(id__in=video_ids)
+        else:
+            raise CommandError('Pass one or more video ids or --pending')
+
+        if not options['force']:
+            videos = videos.exclude(hls_status__in=['ready', 'processing'])
+
+        packaged = failed = 0
+        for video in videos:
+            self.stdout.write(f'Packaging video {video.id}: {video.title}')
+            try:
+                playlist = package_mega_video(video, source=source)
+                packaged += 1
+                self.stdout.write(self.style.SUCCESS(f'  -> {playlist}'))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'  failed: {str(e)}'))
+
+        self.stdout.write(f'Packaged {packaged} video(s), {failed} failed')
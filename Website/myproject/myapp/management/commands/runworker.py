@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import time
+import threading
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from myapp.jobs import get_job_settings, schedule_periodic, claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (sync, thumbnails, exports) from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after running this many jobs')
+        parser.add_argument('--sleep', type=float, help='Seconds to wait between polls when idle')
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Only run jobs from this queue (repeatable); all queues by default'
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options.get('sleep') or get_job_settings()['POLL_INTERVAL']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            # Finish the current job, then exit
+            self.stdout.write('Stopping after the current job...')
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        queues = options.get('queues')
+        self.stdout.write(f"Worker {worker_id} started ({', '.join(queues) if queues else 'all queues'})")
+        processed = failed = 0
+        next_schedule = 0
+        while not stop.is_set():
+            close_old_connections()
+            if not options['burst'] and time.monotonic() >= next_schedule:
+                schedule_periodic()
+                next_schedule = time.monotonic() + 60
+            job = claim_job(worker_id, queues)
+            if job is None:
+                if options['burst']:
+                    break
+                stop.wait(poll_interval)
+                continue
+
+            self.stdout.write(f'Running job {job.pk}: {job.task} (attempt {job.attempts}/{job.max_attempts})')
+            if run_job(job):
+                processed += 1
+            else:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'  job {job.pk} failed'))
+
+            if options['max_jobs'] and processed + failed >= options['max_jobs']:
+                break
+
+        close_old_connections()
+        self.stdout.write(f'Worker {worker_id} exiting: {processed} succeeded, {failed} failed')
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2025-10-20 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_megavideo_video_source_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='megavideo',
+            name='hls_packaged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='megavideo',
+            name='hls_playlist',
+            field=models.CharField(blank=True, help_text='HLS master playlist path relative to MEDIA_ROOT', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='megavideo',
+            name='hls_status',
+            field=models.CharField(choices=[('none', 'Not packaged'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.25 on 2025-10-21 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_megavideo_hls_playlist_megavideo_hls_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriveFolderSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder_id', models.CharField(max_length=255, unique=True)),
+                ('start_page_token', models.CharField(blank=True, max_length=255)),
+                ('last_full_sync', models.DateTimeField(blank=True, null=True)),
+                ('last_incremental_sync', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
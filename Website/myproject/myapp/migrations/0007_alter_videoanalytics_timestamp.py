@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2025-10-22 14:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videoanalytics',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
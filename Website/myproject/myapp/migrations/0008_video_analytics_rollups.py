@@ -0,0 +1,116 @@
+# Generated by Django 4.2.25 on 2025-10-23 10:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_alter_videoanalytics_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('high_water_mark', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VideoDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('watch_seconds', models.FloatField(default=0)),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VideoDailyViewer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('tier', models.CharField(choices=[('regular', 'Regular'), ('vip', 'VIP'), ('diamond', 'Diamond')], max_length=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VideoTierDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('regular', 'Regular'), ('vip', 'VIP'), ('diamond', 'Diamond')], max_length=10)),
+                ('day', models.DateField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('watch_seconds', models.FloatField(default=0)),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='videoanalytics',
+            index=models.Index(fields=['timestamp'], name='myapp_analytics_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoanalytics',
+            index=models.Index(fields=['session', 'timestamp'], name='myapp_analytics_sess_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='videodailystats',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='myapp.video'),
+        ),
+        migrations.AddField(
+            model_name='videodailyviewer',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='videodailyviewer',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_viewers', to='myapp.video'),
+        ),
+        migrations.AddField(
+            model_name='videotierdailystats',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tier_daily_stats', to='myapp.video'),
+        ),
+        migrations.AddIndex(
+            model_name='videodailystats',
+            index=models.Index(fields=['day'], name='myapp_vdaily_day_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='videodailystats',
+            unique_together={('video', 'day')},
+        ),
+        migrations.AddIndex(
+            model_name='videodailyviewer',
+            index=models.Index(fields=['day'], name='myapp_vviewer_day_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='videodailyviewer',
+            unique_together={('video', 'day', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='videotierdailystats',
+            index=models.Index(fields=['day', 'tier'], name='myapp_vtierdaily_day_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='videotierdailystats',
+            unique_together={('video', 'tier', 'day')},
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.25 on 2025-10-24 10:15
+
+from django.db import migrations, transaction
+
+# Full-text index over AuditLog.action, per database (see services/audit_search.py).
+# Other databases get no index and search falls back to a LIKE scan.
+# The PostgreSQL index is built CONCURRENTLY so audit log writes are not blocked
+# while it builds; that cannot run in a transaction, hence atomic = False below.
+# A failed concurrent build leaves an INVALID index behind, so it is dropped first.
+INSTALL = {
+    'postgresql': [
+        "DROP INDEX CONCURRENTLY IF EXISTS myapp_audit_action_fts_idx",
+        "CREATE INDEX CONCURRENTLY myapp_audit_action_fts_idx ON myapp_auditlog "
+        "USING GIN (to_tsvector('simple', action))",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS myapp_auditlog_fts "
+        "USING fts5(action, content='myapp_auditlog', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS myapp_auditlog_fts_ai AFTER INSERT ON myapp_auditlog BEGIN "
+        "INSERT INTO myapp_auditlog_fts(rowid, action) VALUES (new.id, new.action); END",
+        "CREATE TRIGGER IF NOT EXISTS myapp_auditlog_fts_ad AFTER DELETE ON myapp_auditlog BEGIN "
+        "INSERT INTO myapp_auditlog_fts(myapp_auditlog_fts, rowid, action) VALUES ('delete', old.id, old.action); END",
+        "CREATE TRIGGER IF NOT EXISTS myapp_auditlog_fts_au AFTER UPDATE OF action ON myapp_auditlog BEGIN "
+        "INSERT INTO myapp_auditlog_fts(myapp_auditlog_fts, rowid, action) VALUES ('delete', old.id, old.action); "
+        "INSERT INTO myapp_auditlog_fts(rowid, action) VALUES (new.id, new.action); END",
+        # Index the rows that already exist
+        "INSERT INTO myapp_auditlog_fts(myapp_auditlog_fts) VALUES ('rebuild')",
+    ],
+}
+
+UNINSTALL = {
+    'postgresql': [
+        "DROP INDEX CONCURRENTLY IF EXISTS myapp_audit_action_fts_idx",
+    ],
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS myapp_auditlog_fts_ai",
+        "DROP TRIGGER IF EXISTS myapp_auditlog_fts_ad",
+        "DROP TRIGGER IF EXISTS myapp_auditlog_fts_au",
+        "DROP TABLE IF EXISTS myapp_auditlog_fts",
+    ],
+}
+
+
+def _run(statements, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for statement in statements.get(connection.vendor, []):
+            schema_editor.execute(statement)
+        return
+    # Everywhere else the table, triggers and rebuild go in together or not at all
+    with transaction.atomic(using=connection.alias):
+        for statement in statements.get(connection.vendor, []):
+            schema_editor.execute(statement)
+
+
+def install_search(apps, schema_editor):
+    _run(INSTALL, schema_editor)
+
+
+def uninstall_search(apps, schema_editor):
+    _run(UNINSTALL, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('myapp', '0010_audit_log_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
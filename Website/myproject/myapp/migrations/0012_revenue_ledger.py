@@ -0,0 +1,84 @@
+# Generated by Django 4.2.25 on 2025-10-24 15:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from datetime import timedelta
+from django.db import migrations, models
+
+# Prices and durations as they stood when the ledger was introduced; past
+# approvals are booked at these, later price changes only affect new entries
+TIER_PRICING = {'regular': 0, 'vip': 25, 'diamond': 50}
+TIER_DURATION = {'regular': 0, 'vip': 90, 'diamond': 365}
+
+
+def backfill_ledger(apps, schema_editor):
+    PaymentProof = apps.get_model('myapp', 'PaymentProof')
+    MembershipUpgradeRequest = apps.get_model('myapp', 'MembershipUpgradeRequest')
+    RevenueEntry = apps.get_model('myapp', 'RevenueEntry')
+    DashboardCounter = apps.get_model('myapp', 'DashboardCounter')
+
+    entries = []
+    for proof in PaymentProof.objects.filter(status='approved').iterator(chunk_size=2000):
+        recorded_at = proof.processed_at or proof.uploaded_at
+        entries.append(RevenueEntry(
+            source='payment_proof',
+            source_id=proof.pk,
+            user_id=proof.user_id,
+            tier=proof.requested_tier,
+            amount=TIER_PRICING.get(proof.requested_tier, 0),
+            period_start=recorded_at,
+            period_end=recorded_at + timedelta(days=TIER_DURATION.get(proof.requested_tier, 30)),
+            recorded_at=recorded_at,
+            recorded_by_id=proof.processed_by_id
+        ))
+    for upgrade in MembershipUpgradeRequest.objects.filter(status='approved').iterator(chunk_size=2000):
+        recorded_at = upgrade.processed_at or upgrade.updated_at
+        entries.append(RevenueEntry(
+            source='upgrade_request',
+            source_id=upgrade.pk,
+            user_id=upgrade.user_id,
+            tier=upgrade.desired_tier,
+            amount=TIER_PRICING.get(upgrade.desired_tier, 0),
+            period_start=recorded_at,
+            # MembershipUpgradeRequest.MEMBERSHIP_DAYS; historical models do not carry class attributes
+            period_end=recorded_at + timedelta(days=365),
+            recorded_at=recorded_at,
+            recorded_by_id=upgrade.processed_by_id
+        ))
+    RevenueEntry.objects.bulk_create(entries, batch_size=2000)
+
+    # Revenue is summed from the ledger now, not kept as a counter
+    DashboardCounter.objects.filter(name='revenue.approved').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_audit_log_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('payment_proof', 'Payment Proof'), ('upgrade_request', 'Membership Upgrade Request')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('tier', models.CharField(max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_revenue', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='revenue_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['recorded_at'], name='myapp_revenue_recorded_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'source_id'), name='myapp_revenue_source_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
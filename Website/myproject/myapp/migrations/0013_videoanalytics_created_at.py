@@ -0,0 +1,32 @@
+# Generated by Django 4.2.25 on 2025-10-25 10:12
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_timestamps(apps, schema_editor):
+    # Existing rows were rolled up by event time, so that is their insert time
+    VideoAnalytics = apps.get_model('myapp', 'VideoAnalytics')
+    VideoAnalytics.objects.update(created_at=F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_revenue_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoanalytics',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_timestamps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='videoanalytics',
+            index=models.Index(fields=['created_at'], name='myapp_analytics_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2025-10-26 09:40
+
+from django.db import migrations, models
+
+# Tasks that write under MEDIA_ROOT (see the queue= arguments in myapp/tasks.py)
+MEDIA_TASKS = ['generate_mega_thumbnail', 'generate_profile_thumbnail', 'export_table', 'export_audit_logs_pdf']
+
+
+def move_media_jobs(apps, schema_editor):
+    # Jobs queued before the split must also run on the host that serves the files
+    BackgroundJob = apps.get_model('myapp', 'BackgroundJob')
+    BackgroundJob.objects.filter(task__in=MEDIA_TASKS, status__in=['queued', 'running']).update(queue='media')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_videoanalytics_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='queue',
+            field=models.CharField(default='default', help_text='Workers started with --queue only claim their queues', max_length=50),
+        ),
+        migrations.RunPython(move_media_jobs, migrations.RunPython.noop),
+    ]
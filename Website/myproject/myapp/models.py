@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse
+from django.conf import settings
 import uuid
 import os
 import logging
@@ -10,14 +11,13 @@ from PIL import Image
 from django.core.exceptions import ValidationError
 from django.utils.crypto import get_random_string
 from .services.mega_service import MegaService
-import ffmpeg_streaming
-from ffmpeg_streaming import Formats, Representation, Size
 import tempfile
 import requests
 import subprocess
 from urllib.parse import urlparse
-from django.core.files import File
-from .services.mega_thumbnail_service import generate_video_thumbnail
+from django.core.serializers.json import DjangoJSONEncoder
+from .services.mega_thumbnail_service import extract_video_thumbnail
+from .services.write_buffer import record_audit
 
 logger = logging.getLogger(__name__)
 
@@ -61,7 +61,21 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s Profile"
 
     def save(self, *args, **kwargs):
-        if self.profile_picture and not self.profile_picture_thumbnail:
+        needs_thumbnail = bool(self.profile_picture and not self.profile_picture_thumbnail)
+        super().save(*args, **kwargs)
+
+        if needs_thumbnail:
+            # Resize in the background worker instead of the upload request
+            from .jobs import enqueue
+            enqueue(
+                'generate_profile_thumbnail',
+                {'profile_id': self.pk},
+                unique_key=f'profile_thumbnail:{self.pk}'
+            )
+
+    def generate_thumbnail(self):
+        """Create profile_picture_thumbnail from profile_picture; returns True on success"""
+        if self.profile_picture:
             # Generate thumbnail
             try:
                 from PIL import Image
@@ -93,10 +107,10 @@ class UserProfile(models.Model):
                     ContentFile(thumb_io.getvalue()),
                     save=False
                 )
+                return True
             except Exception as e:
                 logger.error(f"Error creating thumbnail for {self.user.username}: {str(e)}")
-
-        super().save(*args, **kwargs)
+        return False
 
     def get_membership_tier_display(self):
         return dict(self.MEMBERSHIP_CHOICES).get(self.membership_tier, 'Regular')
@@ -248,15 +262,15 @@ class Video(models.Model):
         if not user.is_authenticated:
             return None
         
-        try:
-            return self.progress.get(user=user)
-        except VideoProgress.DoesNotExist:
+        from .services.progress_buffer import get_progress, progress_instance
+        if get_progress(user.id, self.id) is None:
             return None
+        return progress_instance(user, self)
     
     def increment_view_count(self):
-        """Increment view count for this video"""
-        self.views += 1
-        self.save(update_fields=['views'])
+        """Increment view count for this video; buffered and written as views = views + n"""
+        from .services.view_counter import count_view
+        count_view(self)
     
     def get_next_video(self, user):
         """Get next video in sequence that is accessible to user"""
@@ -318,14 +332,29 @@ class Video(models.Model):
 
     def track_analytics(self, session, event_type, position, duration, metadata=None):
         """Track video analytics events"""
-        if self.analytics_enabled and session:
-            VideoAnalytics.objects.create(
-                session=session,
-                event_type=event_type,
-                position=position,
-                duration=duration,
-                metadata=metadata or {}
-            )
+        self.track_analytics_batch(session, [{
+            'event_type': event_type,
+            'position': position,
+            'duration': duration,
+            'metadata': metadata
+        }])
+
+    def track_analytics_batch(self, session, events):
+        """Queue validated analytics events for the next bulk write"""
+        if self.analytics_enabled and session and events:
+            from .services.write_buffer import get_analytics_buffer
+            now = timezone.now()
+            get_analytics_buffer().add([
+                VideoAnalytics(
+                    session=session,
+                    event_type=event['event_type'],
+                    timestamp=now,
+                    position=event['position'],
+                    duration=event['duration'],
+                    metadata=event.get('metadata') or {}
+                )
+                for event in events
+            ])
 
     def get_stream_url(self, user=None):
         """Get the streaming URL for the video"""
@@ -445,6 +474,8 @@ class PaymentProof(models.Model):
         return self.TIER_DURATION.get(self.requested_tier, 30)
     
     def approve(self, admin_user, feedback=None):
+        from .services.revenue import record_payment_proof
+
         self.status = 'approved'
         self.processed_at = timezone.now()
         self.processed_by = admin_user
@@ -457,9 +488,12 @@ class PaymentProof(models.Model):
         profile.membership_start_date = timezone.now()
         profile.membership_end_date = timezone.now() + timezone.timedelta(days=self.get_duration())
         profile.save()
+
+        # Book the payment in the revenue ledger
+        record_payment_proof(self, admin_user, profile.membership_start_date, profile.membership_end_date)
         
         # Log the activity
-        AuditLog.objects.create(
+        record_audit(
             user=self.user,
             action_type='payment',
             action=f'Payment proof approved for {self.requested_tier} membership (${self.get_amount()}) by {admin_user.username}',
@@ -469,7 +503,7 @@ class PaymentProof(models.Model):
         )
         
         # Log membership change
-        AuditLog.objects.create(
+        record_audit(
             user=self.user,
             action_type='membership_change',
             action=f'Membership upgraded to {self.requested_tier} tier for {self.get_duration()} days',
@@ -486,7 +520,7 @@ class PaymentProof(models.Model):
         self.save()
         
         # Log the activity
-        AuditLog.objects.create(
+        record_audit(
             user=self.user,
             action_type='payment',
             action=f'Payment proof rejected for {self.requested_tier} membership (${self.get_amount()}) by {admin_user.username}. Reason: {feedback or "No reason provided"}',
@@ -519,7 +553,8 @@ class AuditLog(models.Model):
     )
     action_type = models.CharField(max_length=50, choices=ACTION_TYPES)
     action = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is recorded; buffered entries are written later
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     status = models.CharField(max_length=20, default='success')
     related_user = models.ForeignKey(
@@ -532,6 +567,12 @@ class AuditLog(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pages walk (timestamp, id), optionally within one action type or user
+            models.Index(fields=['timestamp', 'id'], name='myapp_audit_ts_idx'),
+            models.Index(fields=['action_type', 'timestamp'], name='myapp_audit_type_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='myapp_audit_user_ts_idx'),
+        ]
     
     def __str__(self):
         username = self.user.username if self.user else 'Anonymous'
@@ -573,12 +614,38 @@ class MegaVideo(models.Model):
     membership_tier = models.CharField(max_length=20, choices=MEMBERSHIP_TIERS, default='regular')
     duration_ms = models.BigIntegerField(null=True, blank=True)
     views = models.PositiveIntegerField(default=0)
+    HLS_STATUSES = [
+        ('none', 'Not packaged'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    hls_playlist = models.CharField(
+        max_length=500,
+        blank=True,
+        help_text='HLS master playlist path relative to MEDIA_ROOT'
+    )
+    hls_status = models.CharField(max_length=20, choices=HLS_STATUSES, default='none')
+    hls_packaged_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
+    @property
+    def drive_file_id(self):
+        """Google Drive file ID for Drive-hosted videos"""
+        if self.video_source != 'gdrive':
+            return None
+        return MegaService.extract_gdrive_file_id(self.mega_file_link)
+
+    def get_hls_url(self):
+        """Return the master playlist URL if an HLS ladder has been packaged"""
+        if self.hls_status == 'ready' and self.hls_playlist:
+            return f"{settings.MEDIA_URL}{self.hls_playlist}"
+        return None
+
     def duration(self):
         """Return formatted duration string"""
         if self.duration_ms:
@@ -616,29 +683,47 @@ class MegaVideo(models.Model):
         return reverse('video_player', kwargs={'video_id': self.id})
 
     def save(self, *args, **kwargs):
-        # If no thumbnail is provided and we have a MEGA link, try to generate one
-        if not self.thumbnail and not self.thumbnail_url and self.mega_file_link:
-            try:
-                # Generate thumbnail from video
-                thumbnail_path = generate_video_thumbnail(self.mega_file_link)
-                
-                if thumbnail_path:
-                    # Save the generated thumbnail
-                    with open(thumbnail_path, 'rb') as f:
-                        self.thumbnail.save(
-                            f"video_{uuid.uuid4()}.jpg",
-                            File(f),
-                            save=False
-                        )
-            except Exception as e:
-                logger.error(f"Error generating thumbnail: {str(e)}")
-
         # If a new thumbnail is uploaded, update the thumbnail URL
         if self.thumbnail and not self.thumbnail_url:
             self.thumbnail_url = self.thumbnail.url
 
+        # Only new videos or changed links need a generated thumbnail, not every save
+        needs_thumbnail = (
+            not self.thumbnail and not self.thumbnail_url and self.mega_file_link and (
+                self._state.adding or
+                MegaVideo.objects.filter(pk=self.pk).exclude(mega_file_link=self.mega_file_link).exists()
+            )
+        )
+
         super().save(*args, **kwargs)
 
+        # If no thumbnail is provided and we have a MEGA link, generate one in the background
+        if needs_thumbnail:
+            from .jobs import enqueue
+            enqueue(
+                'generate_mega_thumbnail',
+                {'video_id': self.pk},
+                unique_key=f'mega_thumbnail:{self.pk}'
+            )
+
+    def generate_thumbnail(self):
+        """Grab a frame from the first seconds of the video as the thumbnail; returns True on success"""
+        from django.core.files.base import ContentFile
+
+        # Only the leading byte ranges are fetched and piped through ffmpeg
+        thumbnail_bytes = extract_video_thumbnail(self)
+        if not thumbnail_bytes:
+            return False
+
+        # Save the generated thumbnail
+        self.thumbnail.save(
+            f"video_{uuid.uuid4()}.jpg",
+            ContentFile(thumbnail_bytes),
+            save=False
+        )
+        self.thumbnail_url = self.thumbnail.url
+        return True
+
     def get_thumbnail_url(self):
         """Get the thumbnail URL, with fallback to a default image"""
         if self.thumbnail:
@@ -761,13 +846,217 @@ class VideoAnalytics(models.Model):
     """Model to track video analytics"""
     session = models.ForeignKey(VideoStreamSession, on_delete=models.CASCADE, related_name='analytics')
     event_type = models.CharField(max_length=50)  # play, pause, seek, complete
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event is received; rows are written later in batches
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Set when the row is actually inserted; rollups consume rows by this
+    created_at = models.DateTimeField(auto_now_add=True)
     position = models.FloatField()
     duration = models.FloatField()
     metadata = models.JSONField(default=dict)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='myapp_analytics_ts_idx'),
+            models.Index(fields=['session', 'timestamp'], name='myapp_analytics_sess_ts_idx'),
+            # Rollups scan newly inserted rows by insert time
+            models.Index(fields=['created_at'], name='myapp_analytics_created_idx'),
+        ]
+
+class DriveFolderSyncState(models.Model):
+    """Changes API start page token for incremental Google Drive folder syncs"""
+    folder_id = models.CharField(max_length=255, unique=True)
+    start_page_token = models.CharField(max_length=255, blank=True)
+    last_full_sync = models.DateTimeField(null=True, blank=True)
+    last_incremental_sync = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Sync state for {self.folder_id}"
+
+class RollupCheckpoint(models.Model):
+    """High-water mark of an incremental rollup: source rows before it are already counted"""
+    name = models.CharField(max_length=100, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.high_water_mark}"
+
+class VideoDailyStats(models.Model):
+    """Per video per day totals rolled up from VideoAnalytics (see services/analytics_rollup.py)"""
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    plays = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    watch_seconds = models.FloatField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+        unique_together = ('video', 'day')
+        indexes = [
+            models.Index(fields=['day'], name='myapp_vdaily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.video_id} on {self.day}"
+
+class VideoTierDailyStats(models.Model):
+    """Per video, viewer membership tier and day totals rolled up from VideoAnalytics"""
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='tier_daily_stats')
+    tier = models.CharField(max_length=10, choices=UserProfile.MEMBERSHIP_CHOICES)
+    day = models.DateField()
+    plays = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    watch_seconds = models.FloatField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+        unique_together = ('video', 'tier', 'day')
+        indexes = [
+            models.Index(fields=['day', 'tier'], name='myapp_vtierdaily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.video_id} / {self.tier} on {self.day}"
+
+class VideoDailyViewer(models.Model):
+    """Viewers already counted for a video and day, so unique viewers roll up incrementally"""
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='daily_viewers')
+    day = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    tier = models.CharField(max_length=10, choices=UserProfile.MEMBERSHIP_CHOICES)
+
+    class Meta:
+        unique_together = ('video', 'day', 'user')
+        indexes = [
+            models.Index(fields=['day'], name='myapp_vviewer_day_idx'),
+        ]
+
+class BackgroundJob(models.Model):
+    """Deferred work run by `manage.py runworker` (see myapp/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    queue = models.CharField(max_length=50, default='default', help_text='Workers started with --queue only claim their queues')
+    unique_key = models.CharField(max_length=255, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.SmallIntegerField(default=0, help_text='Higher priorities run first')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_at'], name='myapp_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+    def to_dict(self):
+        """Status payload for the job status endpoint"""
+        return {
+            'id': self.pk,
+            'task': self.task,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'result': self.result,
+            'error': self.last_error.strip().splitlines()[-1] if self.last_error else None,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class RevenueEntry(models.Model):
+    """
+    Immutable revenue ledger row, written once when a payment proof or upgrade
+    request is approved (see services/revenue.py). The amount is the price at
+    approval time, so later price changes never rewrite past revenue.
+    """
+    SOURCES = [
+        ('payment_proof', 'Payment Proof'),
+        ('upgrade_request', 'Membership Upgrade Request'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCES)
+    source_id = models.PositiveBigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='revenue_entries')
+    tier = models.CharField(max_length=10)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    recorded_at = models.DateTimeField(default=timezone.now)
+    recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='recorded_revenue')
+
+    class Meta:
+        ordering = ['-recorded_at']
+        constraints = [
+            # Approving the same thing twice must not count it twice
+            models.UniqueConstraint(fields=['source', 'source_id'], name='myapp_revenue_source_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['recorded_at'], name='myapp_revenue_recorded_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} #{self.source_id}: {self.amount} ({self.tier})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Revenue entries are immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Revenue entries are immutable")
+
+class DashboardCounter(models.Model):
+    """Running dashboard total maintained by signals (see services/dashboard_counters.py)"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class ChangeEvent(models.Model):
+    """Change notification shared by every process through the database (see services/change_bus.py)"""
+    channel = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Listeners re-read recent rows; pruning deletes old ones
+            models.Index(fields=['created_at'], name='myapp_change_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} #{self.pk}"
 
 class MembershipUpgradeRequest(models.Model):
     STATUS_CHOICES = [
@@ -775,6 +1064,9 @@ class MembershipUpgradeRequest(models.Model):
         ('approved', 'Approved'),
         ('rejected', 'Rejected')
     ]
+
+    # Length of the membership an approved upgrade grants, on every approval path
+    MEMBERSHIP_DAYS = 365
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upgrade_requests')
     desired_tier = models.CharField(max_length=10, choices=UserProfile.MEMBERSHIP_CHOICES)
@@ -805,6 +1097,8 @@ class MembershipUpgradeRequest(models.Model):
 
     def approve(self, admin_user, comment=''):
         """Approve the upgrade request"""
+        from .services.revenue import record_upgrade_request
+
         with transaction.atomic():
             self.status = 'approved'
             self.admin_comment = comment
@@ -816,11 +1110,14 @@ class MembershipUpgradeRequest(models.Model):
             profile = self.user.profile
             profile.membership_tier = self.desired_tier
             profile.membership_start_date = timezone.now()
-            profile.membership_end_date = timezone.now() + timezone.timedelta(days=365)
+            profile.membership_end_date = timezone.now() + timezone.timedelta(days=self.MEMBERSHIP_DAYS)
             profile.save()
 
+            # Book the upgrade in the revenue ledger
+            record_upgrade_request(self, admin_user, profile.membership_start_date, profile.membership_end_date)
+
             # Log the change
-            AuditLog.objects.create(
+            record_audit(
                 user=admin_user,
                 action_type='membership_change',
                 action=f'Approved upgrade request to {self.get_desired_tier_display()}',
@@ -838,7 +1135,7 @@ class MembershipUpgradeRequest(models.Model):
         self.save()
 
         # Log the rejection
-        AuditLog.objects.create(
+        record_audit(
             user=admin_user,
             action_type='membership_change',
             action=f'Rejected upgrade request to {self.get_desired_tier_display()}',
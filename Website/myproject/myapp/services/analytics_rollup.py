@@ -0,0 +1,297 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Incremental per-day rollups of VideoAnalytics into VideoDailyStats and
+# VideoTierDailyStats. roll_up_analytics() consumes the rows inserted between
+# the checkpoint's high-water mark and now - LAG, updates the rollups and
+# moves the mark in one transaction, so every event is counted exactly once.
+# The mark is on created_at (insert time), not the event timestamp: events
+# are buffered and retried before they are written, so a row can land long
+# after its timestamp, and a mark on timestamps would already have passed it.
+
+CHECKPOINT_NAME = 'video_analytics'
+
+# Events after which the player was playing, so the position advance to the
+# next event of the same session counts as watch time
+PLAYING_EVENTS = {'play', 'resume', 'progress', 'timeupdate', 'heartbeat'}
+COMPLETION_EVENTS = {'complete', 'ended'}
+
+METRICS = ('plays', 'unique_viewers', 'watch_seconds', 'completions')
+
+
+def get_rollup_settings() -> dict:
+    """Return analytics rollup settings merged with defaults"""
+    defaults = {
+        # created_at is stamped by the inserting worker just before its bulk
+        # insert commits; this covers open transactions and clock skew between workers
+        'LAG': 300,
+        'WINDOW': 3600,  # seconds of inserted rows consumed per transaction
+        'MAX_WINDOWS': 24,  # per run; the next run continues from the mark
+    }
+    defaults.update(getattr(settings, 'ANALYTICS_ROLLUP', {}))
+    return defaults
+
+
+def _aggregate_sessions(events):
+    """
+    Fold the events of whole stream sessions, ordered by session and time,
+    into metric totals keyed by (video_id, day, user_id).
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(('plays', 'watch_seconds', 'completions'), 0))
+    last = None
+    for event in events:
+        if last is not None and last['session_id'] != event['session_id']:
+            last = None
+        if last is None:
+            # First event recorded for this stream session
+            key = (event['session__video_id'], timezone.localtime(event['timestamp']).date(), event['session__user_id'])
+            deltas[key]['plays'] += 1
+
+        key = (event['session__video_id'], timezone.localtime(event['timestamp']).date(), event['session__user_id'])
+        if last is not None and last['event_type'] in PLAYING_EVENTS:
+            advanced = event['position'] - last['position']
+            elapsed = (event['timestamp'] - last['timestamp']).total_seconds()
+            if advanced > 0:
+                # Cap by wall-clock time so a forward seek is not counted as watched
+                deltas[key]['watch_seconds'] += min(advanced, elapsed + 1)
+        if event['event_type'] in COMPLETION_EVENTS:
+            deltas[key]['completions'] += 1
+        # Make sure the viewer is recorded even for events that add nothing
+        deltas[key]
+        last = event
+    return deltas
+
+
+def _apply(model, rows, key_fields):
+    """Add metric deltas to rollup rows, creating the missing ones"""
+    if not rows:
+        return
+    videos = {key[0] for key in rows}
+    days = {key[-1] for key in rows}
+    existing = {
+        tuple(getattr(obj, field) for field in key_fields): obj
+        for obj in model.objects.filter(video_id__in=videos, day__in=days)
+    }
+    to_create, to_update = [], []
+    for key, metrics in rows.items():
+        obj = existing.get(key)
+        if obj is None:
+            to_create.append(model(**dict(zip(key_fields, key)), **metrics))
+            continue
+        for metric, value in metrics.items():
+            setattr(obj, metric, getattr(obj, metric) + value)
+        obj.updated_at = timezone.now()
+        to_update.append(obj)
+    model.objects.bulk_create(to_create, batch_size=500)
+    model.objects.bulk_update(to_update, list(METRICS) + ['updated_at'], batch_size=500)
+
+
+def _roll_up_window(start, end) -> int:
+    """Roll up rows with start <= created_at < end; returns the number of events"""
+    from ..models import VideoAnalytics, VideoDailyStats, VideoTierDailyStats, VideoDailyViewer, UserProfile
+
+    session_ids = set(
+        VideoAnalytics.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values_list('session_id', flat=True).distinct()
+    )
+    if not session_ids:
+        return 0
+
+    # A late row can fall anywhere in its session's timeline and change the
+    # watch time credited to the event after it, so the touched sessions are
+    # folded with and without this window and the difference is applied
+    fields = ('session_id', 'session__video_id', 'session__user_id', 'event_type', 'position', 'timestamp', 'created_at')
+    history = list(
+        VideoAnalytics.objects.filter(session_id__in=session_ids, created_at__lt=end)
+        .order_by('session_id', 'timestamp', 'id')
+        .values(*fields)
+    )
+    after = _aggregate_sessions(history)
+    before = _aggregate_sessions([event for event in history if event['created_at'] < start])
+    deltas = {
+        key: {metric: value - before.get(key, {}).get(metric, 0) for metric, value in metrics.items()}
+        for key, metrics in after.items()
+    }
+    new_events = sum(1 for event in history if event['created_at'] >= start)
+
+    # Viewers not yet counted for their video and day
+    user_ids = {key[2] for key in deltas}
+    tiers = dict(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'membership_tier'))
+    seen = {
+        (video_id, day, user_id): tier
+        for video_id, day, user_id, tier in VideoDailyViewer.objects.filter(
+            video_id__in={key[0] for key in deltas},
+            day__in={key[1] for key in deltas},
+            user_id__in=user_ids
+        ).values_list('video_id', 'day', 'user_id', 'tier')
+    }
+    new_viewers = [
+        VideoDailyViewer(video_id=key[0], day=key[1], user_id=key[2], tier=tiers.get(key[2], 'regular'))
+        for key in deltas if key not in seen
+    ]
+    VideoDailyViewer.objects.bulk_create(new_viewers, batch_size=500)
+    for viewer in new_viewers:
+        seen[(viewer.video_id, viewer.day, viewer.user_id)] = viewer.tier
+    new_keys = {(viewer.video_id, viewer.day, viewer.user_id) for viewer in new_viewers}
+
+    daily = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    by_tier = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for key, metrics in deltas.items():
+        video_id, day, user_id = key
+        # A viewer stays in the tier they were first counted under that day
+        tier = seen[key]
+        for row in (daily[(video_id, day)], by_tier[(video_id, tier, day)]):
+            for metric, value in metrics.items():
+                row[metric] += value
+            if key in new_keys:
+                row['unique_viewers'] += 1
+
+    _apply(VideoDailyStats, daily, ('video_id', 'day'))
+    _apply(VideoTierDailyStats, by_tier, ('video_id', 'tier', 'day'))
+    return new_events
+
+
+def roll_up_analytics() -> dict:
+    """Advance the rollups from the high-water mark towards now - LAG"""
+    from ..models import RollupCheckpoint, VideoAnalytics
+
+    rollup_settings = get_rollup_settings()
+    cutoff = timezone.now() - timedelta(seconds=rollup_settings['LAG'])
+    window = timedelta(seconds=rollup_settings['WINDOW'])
+    processed = windows = 0
+
+    while windows < rollup_settings['MAX_WINDOWS']:
+        with transaction.atomic():
+            checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+            start = checkpoint.high_water_mark
+            if start is None:
+                first = VideoAnalytics.objects.order_by('created_at').values_list('created_at', flat=True).first()
+                if first is None:
+                    break
+                start = first
+            if start >= cutoff:
+                break
+
+            end = min(start + window, cutoff)
+            # Skip empty stretches instead of walking them one window at a time
+            upcoming = VideoAnalytics.objects.filter(created_at__gte=start, created_at__lt=cutoff).order_by('created_at').values_list('created_at', flat=True).first()
+            if upcoming is None:
+                end = cutoff
+            elif upcoming >= end:
+                start = upcoming
+                end = min(start + window, cutoff)
+
+            processed += _roll_up_window(start, end)
+            checkpoint.high_water_mark = end
+            checkpoint.save()
+            windows += 1
+
+    if processed:
+        logger.info(f"Rolled up {processed} analytics events in {windows} windows")
+    return {'events': processed, 'windows': windows}
+
+
+def rebuild_rollups() -> dict:
+    """Drop the rollups and recount from the first inserted row"""
+    from ..models import RollupCheckpoint, VideoDailyStats, VideoTierDailyStats, VideoDailyViewer
+
+    with transaction.atomic():
+        VideoDailyStats.objects.all().delete()
+        VideoTierDailyStats.objects.all().delete()
+        VideoDailyViewer.objects.all().delete()
+        RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).delete()
+
+    totals = {'events': 0, 'windows': 0}
+    while True:
+        result = roll_up_analytics()
+        totals['events'] += result['events']
+        totals['windows'] += result['windows']
+        if result['windows'] < get_rollup_settings()['MAX_WINDOWS']:
+            return totals
+
+
+# Query API for reports; all of these read only the rollup tables
+
+def video_totals(start_day, end_day, video_ids=None, limit=None):
+    """Per-video totals for start_day..end_day inclusive, most watched first"""
+    from ..models import VideoDailyStats, VideoDailyViewer
+
+    stats = VideoDailyStats.objects.filter(day__gte=start_day, day__lte=end_day)
+    viewers = VideoDailyViewer.objects.filter(day__gte=start_day, day__lte=end_day)
+    if video_ids is not None:
+        stats = stats.filter(video_id__in=video_ids)
+        viewers = viewers.filter(video_id__in=video_ids)
+
+    rows = list(
+        stats.values('video_id', title=F('video__title'))
+        .annotate(
+            plays=Sum('plays'),
+            watch_seconds=Sum('watch_seconds'),
+            completions=Sum('completions'),
+            viewer_days=Sum('unique_viewers')
+        )
+        .order_by('-watch_seconds')
+    )
+    if limit:
+        rows = rows[:limit]
+
+    # Distinct viewers over the whole range, not the sum of daily uniques
+    unique = dict(
+        viewers.filter(video_id__in=[row['video_id'] for row in rows])
+        .values('video_id').annotate(count=Count('user_id', distinct=True))
+        .values_list('video_id', 'count')
+    )
+    for row in rows:
+        row['unique_viewers'] = unique.get(row['video_id'], 0)
+        row['completion_rate'] = round(row['completions'] / row['plays'], 4) if row['plays'] else 0
+    return rows
+
+
+def daily_series(start_day, end_day, video_id=None):
+    """Totals per day for one video, or all videos, with missing days filled with zeros"""
+    from ..models import VideoDailyStats
+
+    stats = VideoDailyStats.objects.filter(day__gte=start_day, day__lte=end_day)
+    if video_id is not None:
+        stats = stats.filter(video_id=video_id)
+    by_day = {
+        row['day']: row
+        for row in stats.values('day').annotate(
+            plays=Sum('plays'),
+            unique_viewers=Sum('unique_viewers'),
+            watch_seconds=Sum('watch_seconds'),
+            completions=Sum('completions')
+        )
+    }
+
+    series = []
+    day = start_day
+    while day <= end_day:
+        row = by_day.get(day, {})
+        series.append({'day': day.isoformat(), **{metric: row.get(metric) or 0 for metric in METRICS}})
+        day += timedelta(days=1)
+    return series
+
+
+def tier_totals(start_day, end_day, video_id=None):
+    """Totals per viewer membership tier"""
+    from ..models import VideoTierDailyStats
+
+    stats = VideoTierDailyStats.objects.filter(day__gte=start_day, day__lte=end_day)
+    if video_id is not None:
+        stats = stats.filter(video_id=video_id)
+    return list(
+        stats.values('tier').annotate(
+            plays=Sum('plays'),
+            viewer_days=Sum('unique_viewers'),
+            watch_seconds=Sum('watch_seconds'),
+            completions=Sum('completions')
+        ).order_by('tier')
+    )
@@ -0,0 +1,344 @@
+import json
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Cold storage for append-only tables. Rows older than a configurable age are
+# written to zstd-compressed Parquet files partitioned by UTC day,
+#   <archive>/date=YYYY-MM-DD/part-<first id>-<last id>.parquet
+# in ARCHIVE['STORAGE'], and deleted from the database only once their file
+# reads back from there with the same rows. The storage must be shared and
+# persistent (e.g. S3): a service's own disk is not visible to the others and
+# is wiped on redeploy. Without it nothing is archived. A retried batch
+# selects the same rows, so it overwrites its own file instead of
+# duplicating them.
+
+ARCHIVES = {
+    'audit_logs': {
+        'model': 'AuditLog',
+        'age_setting': 'AUDIT_LOG_DAYS',
+        # column name -> values() lookup
+        'columns': {
+            'id': 'id',
+            'user_id': 'user_id',
+            'username': 'user__username',
+            'action_type': 'action_type',
+            'action': 'action',
+            'timestamp': 'timestamp',
+            'ip_address': 'ip_address',
+            'status': 'status',
+            'related_user_id': 'related_user_id',
+        },
+    },
+    'video_analytics': {
+        'model': 'VideoAnalytics',
+        'age_setting': 'VIDEO_ANALYTICS_DAYS',
+        'columns': {
+            'id': 'id',
+            'session_id': 'session_id',
+            'video_id': 'session__video_id',
+            'user_id': 'session__user_id',
+            'event_type': 'event_type',
+            'timestamp': 'timestamp',
+            'position': 'position',
+            'duration': 'duration',
+            'metadata': 'metadata',
+        },
+    },
+}
+
+
+def get_archive_settings() -> dict:
+    """Return archival settings merged with defaults"""
+    defaults = {
+        'STORAGE': None,  # a STORAGES-style {'BACKEND': ..., 'OPTIONS': {...}} entry
+        'AUDIT_LOG_DAYS': 90,
+        'VIDEO_ANALYTICS_DAYS': 60,
+        'BATCH_SIZE': 10000,  # rows per select/write/delete round
+        'MAX_BATCHES': 50,  # per run
+        'COMPRESSION': 'zstd',
+    }
+    defaults.update(getattr(settings, 'ARCHIVE', {}))
+    return defaults
+
+
+def _schema(name: str):
+    import pyarrow as pa
+
+    timestamp = pa.timestamp('us', tz='UTC')
+    types = {
+        'audit_logs': {
+            'id': pa.int64(), 'user_id': pa.int64(), 'username': pa.string(),
+            'action_type': pa.string(), 'action': pa.string(), 'timestamp': timestamp,
+            'ip_address': pa.string(), 'status': pa.string(), 'related_user_id': pa.int64(),
+        },
+        'video_analytics': {
+            'id': pa.int64(), 'session_id': pa.string(), 'video_id': pa.int64(), 'user_id': pa.int64(),
+            'event_type': pa.string(), 'timestamp': timestamp, 'position': pa.float64(),
+            'duration': pa.float64(), 'metadata': pa.string(),
+        },
+    }[name]
+    return pa.schema([(column, types[column]) for column in ARCHIVES[name]['columns']])
+
+
+def get_archive_storage():
+    """The storage holding the Parquet files, or None if archiving is not configured"""
+    from django.core.files.storage import storages
+
+    params = get_archive_settings()['STORAGE']
+    return storages.create_storage(params) if params else None
+
+
+def _checkpoint_name(name: str) -> str:
+    return f'archive:{name}'
+
+
+def archived_before(name: str):
+    """
+    Everything older than this has been moved out of the database (None if
+    nothing has), except analytics rows that arrived late and are not rolled
+    up yet; those stay in the database until they are.
+    """
+    from ..models import RollupCheckpoint
+
+    return RollupCheckpoint.objects.filter(name=_checkpoint_name(name)).values_list('high_water_mark', flat=True).first()
+
+
+def _cutoff(name: str):
+    archive_settings = get_archive_settings()
+    cutoff = timezone.now() - timedelta(days=archive_settings[ARCHIVES[name]['age_setting']])
+    if name == 'video_analytics':
+        # Never archive events the daily rollups have not counted yet
+        from .analytics_rollup import CHECKPOINT_NAME
+        from ..models import RollupCheckpoint
+        rolled_up = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).values_list('high_water_mark', flat=True).first()
+        if rolled_up is None:
+            return None
+        cutoff = min(cutoff, rolled_up)
+    return cutoff
+
+
+def _to_columns(name: str, rows: list) -> dict:
+    columns = {column: [row[column] for row in rows] for column in ARCHIVES[name]['columns']}
+    if 'session_id' in columns:
+        columns['session_id'] = [str(value) for value in columns['session_id']]
+    if 'metadata' in columns:
+        columns['metadata'] = [json.dumps(value) for value in columns['metadata']]
+    return columns
+
+
+def _write_partition(storage, name: str, day, rows: list) -> str:
+    """Write one day's rows to the archive storage and confirm they read back"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from django.core.files.base import ContentFile
+
+    path = f"{name}/date={day.isoformat()}/part-{rows[0]['id']}-{rows[-1]['id']}.parquet"
+    table = pa.Table.from_pydict(_to_columns(name, rows), schema=_schema(name))
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression=get_archive_settings()['COMPRESSION'])
+
+    if storage.exists(path):
+        # A retried batch; replace the earlier attempt rather than saving beside it
+        storage.delete(path)
+    saved = storage.save(path, ContentFile(sink.getvalue().to_pybytes()))
+    if saved != path:
+        raise RuntimeError(f"Archive storage saved {path} as {saved}")
+
+    with storage.open(path, 'rb') as file:
+        stored_ids = pq.read_table(file, columns=['id'])['id'].to_pylist()
+    if stored_ids != [row['id'] for row in rows]:
+        raise RuntimeError(f"Archive file {path} does not hold the rows just written")
+    return path
+
+
+def archive_table(name: str) -> dict:
+    """Move rows older than the configured age into Parquet, one batch at a time"""
+    from .. import models
+
+    spec = ARCHIVES[name]
+    model = getattr(models, spec['model'])
+    archive_settings = get_archive_settings()
+    storage = get_archive_storage()
+    if storage is None:
+        logger.warning(f"Not archiving {spec['model']} rows: ARCHIVE['STORAGE'] is not configured")
+        return {'archived': 0, 'files': 0, 'skipped': 'no archive storage'}
+    cutoff = _cutoff(name)
+    if cutoff is None:
+        return {'archived': 0, 'files': 0, 'skipped': 'not rolled up yet'}
+
+    lookups = list(spec['columns'].values())
+    archived = files = 0
+    # Rows before the boundary are all archived; it only reaches the cutoff once nothing older is left
+    boundary = None
+    candidates = model.objects.filter(timestamp__lt=cutoff)
+    if name == 'video_analytics':
+        # The rollup mark is on insert time; a late row is only counted once that passes it
+        candidates = candidates.filter(created_at__lt=cutoff)
+    for _ in range(archive_settings['MAX_BATCHES']):
+        rows = list(
+            candidates
+            .order_by('timestamp', 'id')
+            .values(*lookups)[:archive_settings['BATCH_SIZE']]
+        )
+        if not rows:
+            boundary = cutoff
+            break
+        rows = [{column: row[lookup] for column, lookup in spec['columns'].items()} for row in rows]
+
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row['timestamp'].astimezone(dt_timezone.utc).date(), []).append(row)
+        for day, day_rows in by_day.items():
+            _write_partition(storage, name, day, sorted(day_rows, key=lambda row: row['id']))
+            files += 1
+
+        # Only delete once every file has been read back from the archive storage
+        with transaction.atomic():
+            model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        boundary = rows[-1]['timestamp']
+
+    previous = archived_before(name)
+    if boundary is not None and (previous is None or boundary > previous):
+        models.RollupCheckpoint.objects.update_or_create(
+            name=_checkpoint_name(name),
+            defaults={'high_water_mark': boundary}
+        )
+    if archived:
+        logger.info(f"Archived {archived} {spec['model']} rows into {files} files")
+    return {'archived': archived, 'files': files, 'cutoff': cutoff.isoformat()}
+
+
+def read_archive(name: str, start=None, end=None, filters=None, columns=None):
+    """
+    Archived rows with start <= timestamp < end as a pyarrow Table. Only the
+    day partitions inside the range are opened. `filters` maps columns to
+    required values, e.g. {'video_id': 3}.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    schema = _schema(name)
+    columns = columns or schema.names
+    storage = get_archive_storage()
+    if storage is None or not storage.exists(name):
+        return schema.empty_table().select(columns)
+
+    expression = None
+
+    def both(condition):
+        return condition if expression is None else expression & condition
+
+    first_day = last_day = None
+    if start is not None:
+        start = start.astimezone(dt_timezone.utc)
+        first_day = start.date().isoformat()
+        expression = both(ds.field('timestamp') >= pa.scalar(start, type=schema.field('timestamp').type))
+    if end is not None:
+        end = end.astimezone(dt_timezone.utc)
+        last_day = end.date().isoformat()
+        expression = both(ds.field('timestamp') < pa.scalar(end, type=schema.field('timestamp').type))
+    for column, value in (filters or {}).items():
+        expression = both(ds.field(column) == value)
+
+    tables = []
+    partitions, _ = storage.listdir(name)
+    for partition in sorted(partitions):
+        day = partition[len('date='):]
+        if not partition.startswith('date=') or (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        _, file_names = storage.listdir(f'{name}/{partition}')
+        for file_name in sorted(file_names):
+            if not file_name.endswith('.parquet'):
+                continue
+            with storage.open(f'{name}/{partition}/{file_name}', 'rb') as file:
+                table = pq.read_table(file, schema=schema)
+            tables.append(table.filter(expression) if expression is not None else table)
+
+    if not tables:
+        return schema.empty_table().select(columns)
+    return pa.concat_tables(tables).select(columns)
+
+
+def read_audit_logs(params, limit=None, before=None) -> list:
+    """
+    Archived audit logs matching the dashboard filters (same params as
+    filter_audit_logs), newest first, as unsaved AuditLog instances.
+    `before` is a (timestamp, id) keyset: only older entries are returned.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from .audit_search import search_terms, word_prefix_pattern
+
+    from django.contrib.auth.models import User
+    from ..models import AuditLog
+
+    tz = timezone.get_current_timezone()
+    start = end = None
+    try:
+        if params.get('start_date'):
+            start = timezone.make_aware(datetime.combine(datetime.strptime(params['start_date'], '%Y-%m-%d').date(), time.min), tz)
+        if params.get('end_date'):
+            end = timezone.make_aware(datetime.combine(datetime.strptime(params['end_date'], '%Y-%m-%d').date() + timedelta(days=1), time.min), tz)
+    except ValueError:
+        pass
+
+    # Only ranges that explicitly reach back past the hot table touch the files
+    boundary = archived_before('audit_logs')
+    if boundary is None or start is None or start >= boundary:
+        return []
+
+    filters = {}
+    if params.get('action_type'):
+        filters['action_type'] = params['action_type']
+    if params.get('user_id'):
+        try:
+            filters['user_id'] = int(params['user_id'])
+        except ValueError:
+            return []
+
+    if before is not None:
+        # Partition pruning by the keyset timestamp, then the exact tie-break on id
+        before_end = before[0] + timedelta(microseconds=1)
+        end = before_end if end is None else min(end, before_end)
+    table = read_archive('audit_logs', start, end, filters)
+    # The archive has no text index; a range of day files is small enough to scan.
+    # Terms match word prefixes, as the database search does.
+    for term in search_terms(params.get('q', '')):
+        table = table.filter(pc.match_substring_regex(table['action'], word_prefix_pattern(term), ignore_case=True))
+    if before is not None and table.num_rows:
+        timestamp = pa.scalar(before[0].astimezone(dt_timezone.utc), type=table.schema.field('timestamp').type)
+        table = table.filter(pc.or_(
+            pc.less(table['timestamp'], timestamp),
+            pc.and_(pc.equal(table['timestamp'], timestamp), pc.less(table['id'], before[1]))
+        ))
+    table = table.sort_by([('timestamp', 'descending'), ('id', 'descending')])
+    if limit is not None:
+        table = table.slice(0, limit)
+    rows = table.to_pylist()
+
+    user_ids = {row['user_id'] for row in rows if row['user_id']} | {row['related_user_id'] for row in rows if row['related_user_id']}
+    users = User.objects.in_bulk(user_ids)
+    logs = []
+    for row in rows:
+        log = AuditLog(
+            id=row['id'],
+            user_id=row['user_id'] if row['user_id'] in users else None,
+            action_type=row['action_type'],
+            action=row['action'],
+            timestamp=row['timestamp'],
+            ip_address=row['ip_address'],
+            status=row['status'],
+            related_user_id=row['related_user_id'] if row['related_user_id'] in users else None
+        )
+        log.user = users.get(row['user_id'])
+        log.related_user = users.get(row['related_user_id'])
+        log.archived = True
+        logs.append(log)
+    return logs
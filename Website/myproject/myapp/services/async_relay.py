@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import weakref
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .drive_client_pool import get_drive_pool
+
+logger = logging.getLogger(__name__)
+
+DRIVE_MEDIA_URL = 'https://www.googleapis.com/drive/v3/files/{file_id}?alt=media'
+
+# Response headers passed through from the upstream host
+RELAYED_HEADERS = ['Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges', 'Last-Modified', 'ETag']
+
+
+def get_async_streaming_settings() -> dict:
+    """Return async streaming settings merged with defaults"""
+    defaults = {
+        'ENABLED': False,
+        'MAX_UPSTREAM_CONNECTIONS': 1000,
+        'MAX_KEEPALIVE_CONNECTIONS': 100,
+        'CONNECT_TIMEOUT': 10,
+        'READ_TIMEOUT': 30,
+        'RELAY_CHUNK_SIZE': 64 * 1024,
+    }
+    defaults.update(getattr(settings, 'ASYNC_STREAMING', {}))
+    return defaults
+
+
+# One pooled client per event loop; uvicorn workers run a single loop each
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared non-blocking HTTP client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        streaming_settings = get_async_streaming_settings()
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=streaming_settings['MAX_UPSTREAM_CONNECTIONS'],
+                max_keepalive_connections=streaming_settings['MAX_KEEPALIVE_CONNECTIONS'],
+            ),
+            timeout=httpx.Timeout(
+                streaming_settings['READ_TIMEOUT'],
+                connect=streaming_settings['CONNECT_TIMEOUT'],
+            ),
+            follow_redirects=True,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def open_upstream(url: str, headers: dict = None) -> httpx.Response:
+    """Send a GET upstream without reading the body"""
+    client = get_async_client()
+    request = client.build_request('GET', url, headers=headers or {})
+    return await client.send(request, stream=True)
+
+
+async def iter_upstream(response: httpx.Response):
+    """
+    Relay an upstream body chunk by chunk. The ASGI server only asks for
+    the next chunk once the previous one has been written to the client, so
+    a slow viewer throttles the upstream read instead of filling memory.
+    """
+    chunk_size = get_async_streaming_settings()['RELAY_CHUNK_SIZE']
+    try:
+        async for chunk in response.aiter_bytes(chunk_size):
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+async def aiter_sync(iterator):
+    """
+    Pull a sync iterator from the event loop one item at a time. Django's
+    ASGI handler reads a sync StreamingHttpResponse body (and FileResponse,
+    as there is no file_wrapper) with sync_to_async(list), i.e. all of it
+    into memory before the first byte is sent.
+    """
+    iterator = iter(iterator)
+    next_item = sync_to_async(next)
+    done = object()
+    try:
+        while True:
+            item = await next_item(iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        # Release cursors and files on the same thread, also when the client disconnects
+        close = getattr(iterator, 'close', None)
+        if close:
+            await sync_to_async(close)()
+
+
+def streaming_body(iterator):
+    """
+    A sync iterator as a StreamingHttpResponse body that is sent chunk by
+    chunk under both WSGI and ASGI. Every sync streaming response that can
+    be served through myproject/asgi.py must go through this.
+    """
+    if get_async_streaming_settings()['ENABLED']:
+        return aiter_sync(iterator)
+    return iterator
+
+
+async def get_drive_access_token() -> str:
+    """Return the pool's shared access token, kept fresh by its background refresher"""
+    return await sync_to_async(get_drive_pool().get_access_token, thread_sensitive=False)()
+
+
+async def fetch_drive_range(file_id: str, start: int, end: int) -> bytes:
+    """Download bytes start..end (inclusive) of a Drive file"""
+    token = await get_drive_access_token()
+    response = await get_async_client().get(
+        DRIVE_MEDIA_URL.format(file_id=file_id),
+        headers={'Authorization': f'Bearer {token}', 'Range': f'bytes={start}-{end}'},
+    )
+    response.raise_for_status()
+    return response.content
+
+
+async def aiter_drive_range(file_id: str, start: int, end: int, size: int, store):
+    """
+    Async counterpart of drive_chunk_cache.iter_byte_range: serve cached
+    chunks from disk off the event loop and fetch the missing ones upstream.
+    """
+    first_index = start // store.chunk_size
+    last_index = end // store.chunk_size
+
+    for index in range(first_index, last_index + 1):
+        data = await asyncio.to_thread(store.get, file_id, index)
+        if data is None:
+            chunk_start, chunk_end = store.chunk_bounds(index, size)
+            data = await fetch_drive_range(file_id, chunk_start, chunk_end)
+            await asyncio.to_thread(store.put, file_id, index, data)
+
+        chunk_offset = index * store.chunk_size
+        yield data[max(start - chunk_offset, 0):end - chunk_offset + 1]
@@ -0,0 +1,182 @@
+import base64
+import binascii
+import logging
+from datetime import datetime, time, timedelta
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from .archive import read_audit_logs
+from .audit_search import search_audit_logs
+
+logger = logging.getLogger(__name__)
+
+AUDIT_LOG_HEADERS = ['User', 'Action', 'Type', 'IP Address', 'Timestamp']
+
+
+# Badge colour per action type on the audit log page
+AUDIT_BADGE_COLORS = {
+    'login': 'info',
+    'logout': 'secondary',
+    'register': 'success',
+    'profile_update': 'primary',
+    'payment': 'warning',
+    'video_upload': 'info',
+    'video_delete': 'danger',
+    'membership_change': 'primary',
+    'settings_update': 'info',
+    'user_activation': 'success',
+    'user_deactivation': 'danger',
+}
+
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 200
+PDF_TABLE_ROWS = 500
+
+
+def _day_start(value: str):
+    """Midnight at the start of a YYYY-MM-DD day in the current timezone"""
+    day = datetime.strptime(value, '%Y-%m-%d').date()
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def filter_audit_logs(params) -> QuerySet:
+    """Audit logs matching the dashboard filters (action_type, user_id, start_date, end_date, q)"""
+    # Import models here to avoid circular import
+    from ..models import AuditLog
+
+    logs = AuditLog.objects.select_related('user', 'related_user').order_by('-timestamp', '-id')
+
+    action_type = params.get('action_type', '')
+    user_id = params.get('user_id', '')
+    start_date = params.get('start_date', '')
+    end_date = params.get('end_date', '')
+
+    if action_type:
+        logs = logs.filter(action_type=action_type)
+    if user_id:
+        logs = logs.filter(user_id=user_id)
+    if params.get('q'):
+        logs = search_audit_logs(logs, params['q'])
+    # Plain timestamp ranges, so the (action_type, timestamp) and (user, timestamp) indexes apply
+    if start_date:
+        try:
+            logs = logs.filter(timestamp__gte=_day_start(start_date))
+        except ValueError:
+            pass
+    if end_date:
+        try:
+            logs = logs.filter(timestamp__lt=_day_start(end_date) + timedelta(days=1))
+        except ValueError:
+            pass
+    return logs
+
+
+def encode_cursor(log) -> str:
+    """Opaque position of a log entry in (timestamp, id) order"""
+    raw = f'{log.timestamp.isoformat()}|{log.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(timestamp, id) from encode_cursor; raises ValueError for anything else"""
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+    if timezone.is_naive(timestamp):
+        raise ValueError('Invalid cursor')
+    return timestamp, int(log_id)
+
+
+def page_audit_logs(params, cursor=None, page_size=AUDIT_PAGE_SIZE) -> tuple:
+    """
+    One page of filtered audit logs, newest first, and the cursor for the
+    next page (None on the last one). Pages are keyset-paginated on
+    (timestamp, id), so every page costs the same however deep it is. When
+    the database runs out and the date range reaches back into the archive,
+    the page is filled from the Parquet files with the same keyset.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    logs = filter_audit_logs(params)
+    if before is not None:
+        timestamp, log_id = before
+        logs = logs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=log_id))
+
+    # One extra row tells us whether there is a next page
+    page = list(logs[:page_size + 1])
+    if len(page) <= page_size:
+        archive_before = (page[-1].timestamp, page[-1].id) if page else before
+        page += read_audit_logs(params, limit=page_size + 1 - len(page), before=archive_before)
+
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+def audit_log_detail(log) -> str:
+    """Short description of an entry for the audit log table"""
+    if log.action_type == 'membership_change' and ' to ' in log.action:
+        return f"Changed to {log.action.split(' to ', 1)[1]}"
+    if log.action_type == 'payment':
+        return f"Payment for {log.action}"
+    if log.action_type == 'video_upload':
+        return f"Uploaded {log.action}"
+    if log.action_type == 'video_delete':
+        return f"Deleted {log.action}"
+    return log.action
+
+
+def audit_log_row(log) -> list:
+    """One export row for an AuditLog"""
+    return [
+        log.user.username if log.user else 'Anonymous',
+        log.action,
+        log.action_type,
+        log.ip_address or 'N/A',
+        log.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    ]
+
+
+def write_audit_logs_pdf(logs, output) -> None:
+    """Render audit logs as a PDF table into a file-like object"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    # Create PDF document
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    elements = []
+
+    # Add title
+    styles = getSampleStyleSheet()
+    elements.append(Paragraph('Audit Logs', styles['Title']))
+    elements.append(Spacer(1, 12))
+
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 12),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+    # One table per chunk: splitting a single huge Table across pages is quadratic
+    data = [AUDIT_LOG_HEADERS]
+    for log in logs.iterator(chunk_size=PDF_TABLE_ROWS):
+        data.append(audit_log_row(log))
+        if len(data) > PDF_TABLE_ROWS:
+            elements.append(Table(data, repeatRows=1, style=table_style))
+            data = [AUDIT_LOG_HEADERS]
+    # The last partial table, or just the header when there were no rows at all
+    if len(data) > 1 or len(elements) == 2:
+        elements.append(Table(data, repeatRows=1, style=table_style))
+
+    # Build PDF
+    doc.build(elements)
@@ -0,0 +1,80 @@
+import re
+import logging
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# Full-text search over AuditLog.action. Each database keeps its own index
+# (created by migration 0011) in step with the table, so rows written by
+# bulk_create, the admin or raw SQL are searchable as soon as they are
+# committed:
+#   PostgreSQL/CockroachDB  GIN index on to_tsvector('simple', action)
+#   SQLite                  FTS5 external-content table fed by triggers
+# Every search term must match, as a word prefix, so "fail adm" finds
+# "Failed login attempt for username: admin".
+
+AUDIT_TABLE = 'myapp_auditlog'
+
+
+def search_terms(query: str) -> list:
+    """Lower-cased words of a search box query; punctuation and operators are dropped"""
+    return re.findall(r'[^\W_]+', (query or '').lower())[:16]
+
+
+def word_prefix_pattern(term: str) -> str:
+    """
+    RE2 pattern (for pyarrow) matching `term` at the start of a word, as the
+    database search does, for text that has no index such as archived rows.
+    Match it case-insensitively.
+    """
+    return rf'(?:^|[^\pL\pN]){re.escape(term)}'
+
+
+class PostgresSearch:
+    # Must match the indexed expression for the GIN index to be used
+    VECTOR = f"to_tsvector('simple', \"{AUDIT_TABLE}\".\"action\")"
+
+    def filter(self, queryset, terms: list):
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.alias(
+            action_matches=RawSQL(f"{self.VECTOR} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        ).filter(action_matches=True)
+
+
+class SqliteSearch:
+    TABLE = 'myapp_auditlog_fts'
+
+    def filter(self, queryset, terms: list):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {self.TABLE} WHERE {self.TABLE} MATCH %s", [match])
+        )
+
+
+class ContainsSearch:
+    """Fallback for databases without a backend above: a LIKE scan per term"""
+
+    def filter(self, queryset, terms: list):
+        for term in terms:
+            queryset = queryset.filter(action__icontains=term)
+        return queryset
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SqliteSearch,
+}
+
+
+def get_search_backend(vendor: str = None):
+    return SEARCH_BACKENDS.get(vendor or connection.vendor, ContainsSearch)()
+
+
+def search_audit_logs(queryset, query: str):
+    """Narrow an AuditLog queryset to entries whose action matches every term of `query`"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    return get_search_backend().filter(queryset, terms)
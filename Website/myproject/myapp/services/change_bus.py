@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import queue
+import select
+import asyncio
+import threading
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FOLDER_CHANNEL = 'folder_changes'
+
+
+def get_change_bus_settings() -> dict:
+    """Return change notification settings merged with defaults"""
+    defaults = {
+        'BACKEND': 'auto',  # 'postgres', 'database' or 'auto'
+        'POLL_INTERVAL': 1.0,  # database backend only; one max(id) query per listening process
+        'LATENESS': 10,  # seconds a row inserted with a lower id may take to commit
+        'RETENTION': 3600,  # seconds ChangeEvent rows are kept before prune_change_events deletes them
+        'HEARTBEAT': 15,  # seconds between SSE keep-alive comments
+    }
+    defaults.update(getattr(settings, 'CHANGE_BUS', {}))
+    return defaults
+
+
+def _use_postgres() -> bool:
+    backend = get_change_bus_settings()['BACKEND']
+    if backend != 'auto':
+        return backend == 'postgres'
+    # CockroachDB speaks the postgres protocol but has no LISTEN/NOTIFY
+    host = str(connection.settings_dict.get('HOST', ''))
+    return connection.vendor == 'postgresql' and 'cockroachlabs.cloud' not in host
+
+
+class _PostgresListener:
+    """LISTEN on a dedicated autocommit connection and wake on NOTIFY"""
+
+    def __init__(self, channels):
+        self.conn = connection.get_new_connection(connection.get_connection_params())
+        self.conn.autocommit = True
+        with self.conn.cursor() as cursor:
+            for channel in channels:
+                cursor.execute(f'LISTEN "{channel}"')
+
+    def listen(self, channel):
+        with self.conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{channel}"')
+
+    def wait(self, timeout):
+        if select.select([self.conn], [], [], timeout) == ([], [], []):
+            return []
+        self.conn.poll()
+        events = []
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            events.append((notify.channel, json.loads(notify.payload)))
+        return events
+
+
+class _DatabaseListener:
+    """
+    Poll the ChangeEvent table, which every process on every host shares. Each
+    poll is a single max(id) lookup; rows are only read once it moves.
+    """
+
+    def __init__(self, channels, poll_interval, lateness):
+        from ..models import ChangeEvent
+
+        self.channels = set(channels)
+        self.poll_interval = poll_interval
+        self.lateness = timedelta(seconds=lateness)
+        self.last_id = ChangeEvent.objects.aggregate(latest=Max('id'))['latest'] or 0
+        # Ids are allocated before commit, so a row can appear below last_id.
+        # Recent rows are re-read on each change and the ones already
+        # delivered (or published before we started) are skipped.
+        self.seen = dict(
+            ChangeEvent.objects.filter(created_at__gte=timezone.now() - self.lateness).values_list('id', 'created_at')
+        )
+
+    def listen(self, channel):
+        self.channels.add(channel)
+
+    def wait(self, timeout):
+        from ..models import ChangeEvent
+
+        time.sleep(min(timeout, self.poll_interval))
+        latest = ChangeEvent.objects.aggregate(latest=Max('id'))['latest'] or 0
+        if latest == self.last_id:
+            return []
+
+        since = timezone.now() - self.lateness
+        rows = ChangeEvent.objects.filter(
+            Q(id__gt=self.last_id) | Q(created_at__gte=since),
+            channel__in=self.channels
+        ).values_list('id', 'channel', 'payload', 'created_at')
+
+        events = []
+        for event_id, channel, payload, created_at in rows.order_by('id'):
+            if event_id not in self.seen:
+                self.seen[event_id] = created_at
+                events.append((channel, payload))
+        self.seen = {event_id: created_at for event_id, created_at in self.seen.items() if created_at >= since}
+        self.last_id = max(self.last_id, latest)
+        return events
+
+
+class ChangeBus:
+    """
+    Per-process fan-out of change notifications. One listener thread waits
+    on the backend and hands each event to every local subscriber, so idle
+    SSE connections cost nothing until something actually changes.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._listener = None
+        self._pending = set()
+
+    def publish(self, channel: str, payload: dict) -> None:
+        """Announce a change once the current transaction commits"""
+        transaction.on_commit(lambda: self._send(channel, payload))
+
+    def _send(self, channel: str, payload: dict) -> None:
+        from ..models import ChangeEvent
+
+        try:
+            if _use_postgres():
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_notify(%s, %s)', [channel, json.dumps(payload)])
+                return
+
+            ChangeEvent.objects.create(channel=channel, payload=payload)
+        except Exception as e:
+            logger.error(f"Error publishing change on {channel}: {str(e)}")
+
+    def subscribe(self, channel: str, callback):
+        """Call callback(payload) for every event on channel; returns an unsubscribe function"""
+        with self._lock:
+            if channel not in self._subscribers:
+                self._subscribers[channel] = set()
+                self._pending.add(channel)
+            self._subscribers[channel].add(callback)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='change-bus-listener', daemon=True)
+                self._thread.start()
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers.get(channel, set()).discard(callback)
+        return unsubscribe
+
+    def _connect(self):
+        bus_settings = get_change_bus_settings()
+        if _use_postgres():
+            return _PostgresListener(list(self._subscribers))
+        return _DatabaseListener(list(self._subscribers), bus_settings['POLL_INTERVAL'], bus_settings['LATENESS'])
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if self._listener is None:
+                    with self._lock:
+                        self._pending.clear()
+                    self._listener = self._connect()
+
+                with self._lock:
+                    pending, self._pending = self._pending, set()
+                for channel in pending:
+                    self._listener.listen(channel)
+
+                for channel, payload in self._listener.wait(1.0):
+                    with self._lock:
+                        callbacks = list(self._subscribers.get(channel, ()))
+                    for callback in callbacks:
+                        try:
+                            callback(payload)
+                        except Exception as e:
+                            # e.g. the subscriber's event loop already closed
+                            logger.warning(f"Error delivering change on {channel}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Change bus listener error: {str(e)}")
+                self._listener = None
+                # Drop this thread's connection; a fresh one is opened on reconnect
+                connection.close()
+                time.sleep(5)
+
+
+_bus = None
+_bus_pid = None
+_bus_lock = threading.Lock()
+
+
+def get_change_bus() -> ChangeBus:
+    """Return this process's bus, rebuilding it after a fork"""
+    global _bus, _bus_pid
+    if _bus is None or _bus_pid != os.getpid():
+        with _bus_lock:
+            if _bus is None or _bus_pid != os.getpid():
+                _bus = ChangeBus()
+                _bus_pid = os.getpid()
+    return _bus
+
+
+def publish(channel: str, payload: dict) -> None:
+    get_change_bus().publish(channel, payload)
+
+
+def prune_change_events() -> int:
+    """Delete ChangeEvent rows older than RETENTION; listeners only read recent ones"""
+    from ..models import ChangeEvent
+
+    cutoff = timezone.now() - timedelta(seconds=get_change_bus_settings()['RETENTION'])
+    deleted, _ = ChangeEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def publish_folder_change(folder, event: str, folder_pk=None) -> None:
+    """Tell folder_events subscribers that a GoogleDriveFolder changed"""
+    last_synced = getattr(folder, 'last_synced', None)
+    publish(FOLDER_CHANNEL, {
+        'event': event,
+        'folder_id': folder_pk or folder.pk,
+        'video_count': getattr(folder, 'video_count', None),
+        'last_synced': last_synced.isoformat() if last_synced else None
+    })
+
+
+def listen(channel: str):
+    """
+    Blocking iterator of events for a sync streaming response. Yields None
+    every HEARTBEAT seconds without events so the caller can send a keep-alive.
+    """
+    events = queue.Queue()
+    unsubscribe = get_change_bus().subscribe(channel, events.put)
+    heartbeat = get_change_bus_settings()['HEARTBEAT']
+    try:
+        while True:
+            try:
+                yield events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield None
+    finally:
+        unsubscribe()
+
+
+async def alisten(channel: str):
+    """Async counterpart of listen() for ASGI streaming responses"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    unsubscribe = get_change_bus().subscribe(channel, lambda payload: loop.call_soon_threadsafe(events.put_nowait, payload))
+    heartbeat = get_change_bus_settings()['HEARTBEAT']
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(events.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        unsubscribe()
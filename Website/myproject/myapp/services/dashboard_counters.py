@@ -0,0 +1,169 @@
+import logging
+from collections import Counter
+from django.db.models import Count, F, Q
+
+logger = logging.getLogger(__name__)
+
+# Dashboard totals kept in DashboardCounter rows. Signal handlers apply the
+# change of every saved or deleted instance; reconcile_counters() recomputes
+# everything from the source tables to repair drift from queryset.update(),
+# bulk operations and raw SQL, which bypass signals. The stored values are
+# only read when a save can change a tracked field, so loading querysets of
+# these models costs nothing extra.
+
+# Fields whose values decide which counters an instance contributes to
+TRACKED_FIELDS = {
+    'User': ('is_active', 'is_superuser'),
+    'PaymentProof': ('status',),
+    'MegaVideo': ('membership_tier',),
+    'UserProfile': ('membership_tier',),
+}
+
+
+def _contributions(model_name: str, values: dict) -> Counter:
+    """Counters an instance with these field values adds to"""
+    counts = Counter()
+    if model_name == 'User':
+        counts['users.total'] += 1
+        if values['is_active']:
+            counts['users.active'] += 1
+        if not values['is_superuser']:
+            counts['users.members'] += 1
+    elif model_name == 'PaymentProof':
+        counts[f"payments.{values['status']}"] += 1
+    elif model_name == 'MegaVideo':
+        counts['mega_videos.total'] += 1
+        counts[f"mega_videos.{values['membership_tier']}"] += 1
+    elif model_name == 'UserProfile':
+        counts[f"members.{values['membership_tier']}"] += 1
+    return counts
+
+
+def _tracked_values(instance):
+    """Tracked field values already loaded on the instance, or None if any are deferred"""
+    fields = TRACKED_FIELDS[type(instance).__name__]
+    if any(field not in instance.__dict__ for field in fields):
+        return None
+    return {field: instance.__dict__[field] for field in fields}
+
+
+def apply_deltas(deltas: Counter) -> None:
+    """Add deltas to the counter rows in the current transaction"""
+    from ..models import DashboardCounter
+
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        if not DashboardCounter.objects.filter(name=name).update(value=F('value') + delta):
+            # First change since the counter was created; reconcile fills it properly
+            DashboardCounter.objects.get_or_create(name=name, defaults={'value': 0})
+            DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def _touches_tracked_fields(instance, update_fields) -> bool:
+    return update_fields is None or bool(set(TRACKED_FIELDS[type(instance).__name__]) & set(update_fields))
+
+
+def remember_values(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    """pre_save: read the stored tracked values to diff against in post_save"""
+    instance._counter_values = None
+    if raw or instance.pk is None or not _touches_tracked_fields(instance, update_fields):
+        return
+    instance._counter_values = sender._base_manager.using(using).filter(pk=instance.pk).values(
+        *TRACKED_FIELDS[type(instance).__name__]
+    ).first()
+
+
+def update_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """post_save: move the instance's contribution from its old values to its new ones"""
+    if raw or not _touches_tracked_fields(instance, update_fields):
+        return
+    model_name = type(instance).__name__
+    new_values = _tracked_values(instance)
+    old_values = None if created else instance.__dict__.pop('_counter_values', None)
+    if new_values is None or (not created and old_values is None):
+        # Saved with deferred fields; leave it to the reconciliation job
+        return
+
+    deltas = _contributions(model_name, new_values)
+    if old_values:
+        deltas.subtract(_contributions(model_name, old_values))
+    apply_deltas(deltas)
+
+
+def update_on_delete(sender, instance, **kwargs):
+    """post_delete: remove the instance's contribution"""
+    values = _tracked_values(instance)
+    if values is None:
+        return
+    deltas = Counter()
+    deltas.subtract(_contributions(type(instance).__name__, values))
+    apply_deltas(deltas)
+
+
+def compute_counters() -> dict:
+    """Recompute every counter from the source tables with grouped queries"""
+    from django.contrib.auth.models import User
+    from ..models import PaymentProof, MegaVideo, UserProfile
+
+    counters = {}
+
+    user_totals = User.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        members=Count('id', filter=Q(is_superuser=False))
+    )
+    counters['users.total'] = user_totals['total']
+    counters['users.active'] = user_totals['active']
+    counters['users.members'] = user_totals['members']
+
+    for status, _ in PaymentProof.PAYMENT_STATUS:
+        counters[f'payments.{status}'] = 0
+    for row in PaymentProof.objects.values('status').annotate(count=Count('id')):
+        counters[f"payments.{row['status']}"] = row['count']
+
+    counters['mega_videos.total'] = 0
+    for tier, _ in MegaVideo.MEMBERSHIP_TIERS:
+        counters[f'mega_videos.{tier}'] = 0
+    for row in MegaVideo.objects.values('membership_tier').annotate(count=Count('id')):
+        counters[f"mega_videos.{row['membership_tier']}"] = row['count']
+        counters['mega_videos.total'] += row['count']
+
+    for tier, _ in UserProfile.MEMBERSHIP_CHOICES:
+        counters[f'members.{tier}'] = 0
+    for row in UserProfile.objects.values('membership_tier').annotate(count=Count('id')):
+        counters[f"members.{row['membership_tier']}"] = row['count']
+
+    return counters
+
+
+def reconcile_counters() -> dict:
+    """Overwrite the counter rows with freshly computed values; returns the drift that was fixed"""
+    from django.db import transaction
+    from ..models import DashboardCounter
+
+    with transaction.atomic():
+        computed = compute_counters()
+        stored = dict(DashboardCounter.objects.select_for_update().values_list('name', 'value'))
+        drift = {}
+        for name, value in computed.items():
+            if stored.get(name) == value:
+                continue
+            if value != stored.get(name, 0):
+                drift[name] = value - stored.get(name, 0)
+            DashboardCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+    if drift:
+        logger.info(f"Reconciled dashboard counters: {drift}")
+    return drift
+
+
+def get_counters() -> dict:
+    """All dashboard counters in one query, filling the table on first use"""
+    from ..models import DashboardCounter
+
+    counters = dict(DashboardCounter.objects.values_list('name', 'value'))
+    if not counters:
+        reconcile_counters()
+        counters = dict(DashboardCounter.objects.values_list('name', 'value'))
+    return counters
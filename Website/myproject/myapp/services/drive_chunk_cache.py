@@ -0,0 +1,218 @@
+import os
+import re
+import threading
+import logging
+from django.conf import settings
+from .drive_client_pool import drive_client
+from .drive_metadata_cache import get_file_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def get_chunk_cache_settings() -> dict:
+    """Return Drive chunk cache settings merged with defaults"""
+    defaults = {
+        'ROOT': os.path.join(settings.BASE_DIR, 'drive_chunk_cache'),
+        'CHUNK_SIZE': 1024 * 1024,  # 1MB
+        'MAX_SIZE': 2 * 1024 * 1024 * 1024,  # 2GB
+    }
+    defaults.update(getattr(settings, 'DRIVE_CHUNK_CACHE', {}))
+    return defaults
+
+
+class DriveChunkStore:
+    """
+    Size-bounded on-disk LRU store of fixed-size byte chunks keyed by
+    (file_id, chunk_index). Recency is tracked with file mtimes so the store
+    is shared by every worker process pointing at the same directory.
+    """
+
+    # Rescan the directory after this many writes to pick up other workers' chunks
+    RESCAN_EVERY = 64
+
+    def __init__(self, root: str, chunk_size: int, max_bytes: int):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self._writes_since_scan = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def _safe_id(file_id: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_-]', '_', file_id)
+
+    def _file_dir(self, file_id: str) -> str:
+        return os.path.join(self.root, self._safe_id(file_id))
+
+    def _chunk_path(self, file_id: str, index: int) -> str:
+        return os.path.join(self._file_dir(file_id), f'{index}.chunk')
+
+    def chunk_bounds(self, index: int, size: int):
+        """Inclusive byte bounds of a chunk within a file of `size` bytes"""
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, size) - 1
+
+    def get(self, file_id: str, index: int):
+        """Return cached chunk bytes, or None on a miss"""
+        path = self._chunk_path(file_id, index)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path, None)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Error reading cached chunk {path}: {str(e)}")
+            return None
+
+    def put(self, file_id: str, index: int, data: bytes) -> None:
+        """Store a chunk atomically and evict least recently used chunks if over budget"""
+        file_dir = self._file_dir(file_id)
+        path = self._chunk_path(file_id, index)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(file_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Error caching chunk {path}: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            self._approx_bytes += len(data)
+            self._writes_since_scan += 1
+            if self._approx_bytes > self.max_bytes or self._writes_since_scan >= self.RESCAN_EVERY:
+                self._evict()
+
+    def ensure_version(self, file_id: str, version: str) -> None:
+        """Drop every cached chunk of a file whose content version changed"""
+        if not version:
+            return
+        file_dir = self._file_dir(file_id)
+        version_path = os.path.join(file_dir, 'version')
+        try:
+            with open(version_path) as f:
+                if f.read() == version:
+                    return
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Error reading chunk version for {file_id}: {str(e)}")
+
+        self.invalidate(file_id)
+        try:
+            os.makedirs(file_dir, exist_ok=True)
+            with open(version_path, 'w') as f:
+                f.write(version)
+        except OSError as e:
+            logger.warning(f"Error writing chunk version for {file_id}: {str(e)}")
+
+    def invalidate(self, file_id: str) -> None:
+        """Remove all cached chunks of a file"""
+        file_dir = self._file_dir(file_id)
+        if not os.path.isdir(file_dir):
+            return
+        for entry in os.scandir(file_dir):
+            if entry.name.endswith('.chunk'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _iter_chunks(self):
+        for file_dir in os.scandir(self.root):
+            if not file_dir.is_dir():
+                continue
+            for entry in os.scandir(file_dir.path):
+                if entry.name.endswith('.chunk'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._iter_chunks())
+
+    def _evict(self) -> None:
+        """Delete least recently used chunks until the store is under 90% of its budget"""
+        chunks = list(self._iter_chunks())
+        total = sum(size for _, size, _ in chunks)
+        target = int(self.max_bytes * 0.9)
+
+        if total > self.max_bytes:
+            chunks.sort(key=lambda chunk: chunk[2])
+            for path, size, _ in chunks:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    total -= size
+                except OSError as e:
+                    logger.warning(f"Error evicting chunk {path}: {str(e)}")
+            logger.info(f"Evicted Drive chunks, cache now {total} bytes")
+
+        self._approx_bytes = total
+        self._writes_since_scan = 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> DriveChunkStore:
+    """Return the process-wide chunk store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                chunk_settings = get_chunk_cache_settings()
+                _store = DriveChunkStore(
+                    chunk_settings['ROOT'],
+                    chunk_settings['CHUNK_SIZE'],
+                    chunk_settings['MAX_SIZE'],
+                )
+    return _store
+
+
+def get_drive_file_info(file_id: str) -> dict:
+    """Return size, mime type and content version of a Drive file"""
+    file = get_file_metadata(file_id)
+    return {
+        'size': int(file.get('size', 0)),
+        'mime_type': file.get('mimeType', 'video/mp4'),
+        'version': file.get('md5Checksum') or file.get('version', ''),
+    }
+
+
+def iter_byte_range(file_id: str, start: int, end: int, size: int, store=None):
+    """
+    Yield bytes start..end (inclusive) of a Drive file, served from cached
+    chunks and fetching only the chunks that are missing.
+    """
+    store = store or get_chunk_store()
+    first_index = start // store.chunk_size
+    last_index = end // store.chunk_size
+
+    for index in range(first_index, last_index + 1):
+        data = store.get(file_id, index)
+        if data is None:
+            chunk_start, chunk_end = store.chunk_bounds(index, size)
+            with drive_client() as drive_service:
+                data = drive_service.fetch_byte_range(file_id, chunk_start, chunk_end)
+            store.put(file_id, index, data)
+
+        chunk_offset = index * store.chunk_size
+        yield data[max(start - chunk_offset, 0):end - chunk_offset + 1]
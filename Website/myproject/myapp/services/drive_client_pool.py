@@ -0,0 +1,226 @@
+import os
+import time
+import datetime
+import threading
+import logging
+from contextlib import contextmanager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_drive_pool_settings() -> dict:
+    """Return Drive client pool settings merged with defaults"""
+    defaults = {
+        'MAX_SIZE': 8,
+        'LEASE_TIMEOUT': 10,  # seconds to wait for a free client
+        'REFRESH_MARGIN': 300,  # renew the token this many seconds before expiry
+        'REFRESH_RETRY': 30,
+        'HTTP_TIMEOUT': 60,
+    }
+    defaults.update(getattr(settings, 'DRIVE_CLIENT_POOL', {}))
+    return defaults
+
+
+class DriveClientPool:
+    """
+    Per-process pool of GoogleDriveService clients. All clients share one set
+    of service-account credentials that a background thread renews ahead of
+    expiry, so requests never pay for a token refresh. Each client keeps its
+    own keep-alive HTTP connection because httplib2 is not thread-safe.
+    """
+
+    def __init__(self, max_size: int, lease_timeout: float, refresh_margin: float,
+                 refresh_retry: float, http_timeout: float):
+        self.max_size = max_size
+        self.lease_timeout = lease_timeout
+        self.refresh_margin = refresh_margin
+        self.refresh_retry = refresh_retry
+        self.http_timeout = http_timeout
+
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        self._idle = []
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._refresher = None
+
+        self._stats = {
+            'clients_created': 0,
+            'leases': 0,
+            'lease_waits': 0,
+            'lease_timeouts': 0,
+            'total_wait_ms': 0.0,
+            'total_build_ms': 0.0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'last_refresh': None,
+        }
+
+    @property
+    def credentials(self):
+        """Shared credentials, loaded once and kept fresh by the refresher"""
+        if self._credentials is None:
+            with self._credentials_lock:
+                if self._credentials is None:
+                    from .google_drive_service import GoogleDriveService
+                    self._credentials = GoogleDriveService.get_service_account_credentials()
+                    try:
+                        self._refresh_credentials()
+                    except Exception:
+                        # Already logged; the refresher keeps retrying in the background
+                        pass
+                    self._start_refresher()
+        return self._credentials
+
+    def _refresh_credentials(self) -> None:
+        from google.auth.transport.requests import Request
+        try:
+            self._credentials.refresh(Request())
+            self._stats['refreshes'] += 1
+            self._stats['last_refresh'] = datetime.datetime.utcnow()
+        except Exception as e:
+            self._stats['refresh_failures'] += 1
+            logger.error(f"Error refreshing Google Drive credentials: {str(e)}")
+            raise
+
+    def _seconds_until_refresh(self) -> float:
+        expiry = self._credentials.expiry
+        if expiry is None:
+            return 0
+        return max((expiry - datetime.datetime.utcnow()).total_seconds() - self.refresh_margin, 0)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self._seconds_until_refresh()):
+            try:
+                with self._credentials_lock:
+                    self._refresh_credentials()
+            except Exception:
+                if self._stop.wait(self.refresh_retry):
+                    break
+
+    def _start_refresher(self) -> None:
+        self._refresher = threading.Thread(target=self._refresh_loop, name='drive-token-refresher', daemon=True)
+        self._refresher.start()
+
+    def get_access_token(self) -> str:
+        """Return the current access token for direct media requests"""
+        credentials = self.credentials
+        if not credentials.valid:
+            with self._credentials_lock:
+                if not credentials.valid:
+                    self._refresh_credentials()
+        return credentials.token
+
+    def _build_client(self):
+        import httplib2
+        from .google_drive_service import GoogleDriveService
+        started = time.monotonic()
+        client = GoogleDriveService(credentials=self.credentials, http=httplib2.Http(timeout=self.http_timeout))
+        with self._condition:
+            self._stats['total_build_ms'] += (time.monotonic() - started) * 1000
+            self._stats['clients_created'] += 1
+        return client
+
+    def _acquire(self):
+        started = time.monotonic()
+        waited = False
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                waited = True
+                remaining = self.lease_timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['lease_timeouts'] += 1
+                    raise TimeoutError("Timed out waiting for a Google Drive client")
+                self._condition.wait(remaining)
+
+            self._stats['leases'] += 1
+            if waited:
+                self._stats['lease_waits'] += 1
+                self._stats['total_wait_ms'] += (time.monotonic() - started) * 1000
+
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+
+        try:
+            return self._build_client()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, client, discard: bool = False) -> None:
+        with self._condition:
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append(client)
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self):
+        """Borrow a client for the duration of a block"""
+        client = self._acquire()
+        discard = False
+        try:
+            yield client
+        except (ConnectionError, OSError):
+            # Drop clients whose connection broke mid-request
+            discard = True
+            raise
+        finally:
+            self._release(client, discard)
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for monitoring"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'pid': os.getpid(),
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+            })
+        credentials = self._credentials
+        stats['token_expiry'] = credentials.expiry.isoformat() if credentials and credentials.expiry else None
+        stats['refresher_alive'] = bool(self._refresher and self._refresher.is_alive())
+        stats['avg_wait_ms'] = round(stats['total_wait_ms'] / stats['lease_waits'], 2) if stats['lease_waits'] else 0
+        stats['avg_build_ms'] = round(stats['total_build_ms'] / stats['clients_created'], 2) if stats['clients_created'] else 0
+        if stats['last_refresh']:
+            stats['last_refresh'] = stats['last_refresh'].isoformat()
+        return stats
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_drive_pool() -> DriveClientPool:
+    """Return this process's pool, rebuilding it after a fork"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                pool_settings = get_drive_pool_settings()
+                _pool = DriveClientPool(
+                    pool_settings['MAX_SIZE'],
+                    pool_settings['LEASE_TIMEOUT'],
+                    pool_settings['REFRESH_MARGIN'],
+                    pool_settings['REFRESH_RETRY'],
+                    pool_settings['HTTP_TIMEOUT'],
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def drive_client():
+    """Shortcut: `with drive_client() as drive_service: ...`"""
+    return get_drive_pool().lease()
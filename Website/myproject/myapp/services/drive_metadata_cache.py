@@ -0,0 +1,150 @@
+import time
+import threading
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from .drive_client_pool import drive_client
+
+logger = logging.getLogger(__name__)
+
+# Union of the file fields used by GoogleDriveService and the streaming proxy
+METADATA_FIELDS = 'id, name, mimeType, size, md5Checksum, modifiedTime, parents, webContentLink, version'
+
+
+def get_metadata_cache_settings() -> dict:
+    """Return Drive metadata cache settings merged with defaults"""
+    defaults = {
+        'FRESH_TTL': 300,  # serve without asking Drive
+        'MAX_TTL': 86400,  # keep entries for revalidation this long
+        'LOCK_TIMEOUT': 10,
+        'WAIT_FOR_LEADER': 2,  # seconds another process waits for an in-flight lookup
+    }
+    defaults.update(getattr(settings, 'DRIVE_METADATA_CACHE', {}))
+    return defaults
+
+
+_stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'coalesced': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_metadata_cache_stats() -> dict:
+    """Snapshot of this process's cache counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key: str, fetch):
+    """Run fetch() once per key at a time; concurrent callers share its result"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        _count('coalesced')
+        flight.event.wait()
+        if flight.error:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = fetch()
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.event.set()
+
+
+def _cache_key(file_id: str) -> str:
+    return f'drive_file_meta_{file_id}'
+
+
+def _execute(drive_service, file_id: str, fields: str) -> dict:
+    if drive_service is not None:
+        return drive_service.service.files().get(fileId=file_id, fields=fields).execute()
+    with drive_client() as pooled_service:
+        return pooled_service.service.files().get(fileId=file_id, fields=fields).execute()
+
+
+def _store(file_id: str, metadata: dict) -> dict:
+    cache_settings = get_metadata_cache_settings()
+    entry = {'metadata': metadata, 'validated_at': time.time()}
+    cache.set(_cache_key(file_id), entry, timeout=cache_settings['MAX_TTL'])
+    return entry
+
+
+def _lookup(file_id: str, drive_service) -> dict:
+    """Revalidate a stale entry by version, or fetch the full metadata on a miss"""
+    cache_settings = get_metadata_cache_settings()
+    entry = cache.get(_cache_key(file_id))
+    if entry and time.time() - entry['validated_at'] < cache_settings['FRESH_TTL']:
+        # Another caller refreshed it while we waited
+        return entry['metadata']
+
+    # Coalesce across processes: let one worker talk to Drive, the rest poll briefly
+    lock_key = f'{_cache_key(file_id)}_lock'
+    acquired = cache.add(lock_key, 1, timeout=cache_settings['LOCK_TIMEOUT'])
+    if not acquired:
+        last_validated = entry['validated_at'] if entry else 0
+        deadline = time.time() + cache_settings['WAIT_FOR_LEADER']
+        while time.time() < deadline:
+            time.sleep(0.05)
+            fresh = cache.get(_cache_key(file_id))
+            if fresh and fresh['validated_at'] > last_validated:
+                _count('coalesced')
+                return fresh['metadata']
+
+    try:
+        if entry and entry['metadata'].get('version'):
+            current = _execute(drive_service, file_id, 'version')
+            if current.get('version') == entry['metadata']['version']:
+                _count('revalidated')
+                return _store(file_id, entry['metadata'])['metadata']
+
+        _count('misses')
+        metadata = _execute(drive_service, file_id, METADATA_FIELDS)
+        return _store(file_id, metadata)['metadata']
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def get_file_metadata(file_id: str, drive_service=None) -> dict:
+    """
+    Return Drive metadata for a file from the shared cache. Fresh entries are
+    served as-is; stale ones are revalidated with a tiny `version` lookup and
+    only refetched in full when the file changed. Pass `drive_service` when
+    calling from inside a leased client to avoid leasing a second one.
+    """
+    entry = cache.get(_cache_key(file_id))
+    if entry and time.time() - entry['validated_at'] < get_metadata_cache_settings()['FRESH_TTL']:
+        _count('hits')
+        return entry['metadata']
+
+    return _single_flight(file_id, lambda: _lookup(file_id, drive_service))
+
+
+def invalidate_file_metadata(file_id: str) -> None:
+    """Drop a cached entry, e.g. after the file changed in Drive"""
+    cache.delete(_cache_key(file_id))
@@ -0,0 +1,227 @@
+import csv
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Streaming exports of the admin tables. Rows come from values_list()
+# iterated with a server-side cursor (QuerySet.iterator), are encoded in
+# chunks of CHUNK_SIZE rows and are never held in memory all at once,
+# whether they go to a StreamingHttpResponse (through
+# async_relay.streaming_body, so ASGI does not buffer them) or to a file
+# written by the job worker.
+
+EXPORT_FORMATS = {
+    'csv': {'content_type': 'text/csv', 'extension': 'csv'},
+    'jsonl': {'content_type': 'application/x-ndjson', 'extension': 'jsonl'},
+    'pdf': {'content_type': 'application/pdf', 'extension': 'pdf'},
+}
+
+
+def get_export_settings() -> dict:
+    """Return export settings merged with defaults"""
+    defaults = {
+        'CHUNK_SIZE': 2000,  # rows per database fetch and per streamed chunk
+        'STREAM_ROW_LIMIT': 200000,  # larger exports are written by the job worker
+    }
+    defaults.update(getattr(settings, 'EXPORTS', {}))
+    return defaults
+
+
+def _day_range(queryset, field: str, params):
+    """Filter on start_date/end_date (YYYY-MM-DD, local days) as a plain range on `field`"""
+    tz = timezone.get_current_timezone()
+    for param, lookup, days in (('start_date', 'gte', 0), ('end_date', 'lt', 1)):
+        if not params.get(param):
+            continue
+        try:
+            day = datetime.strptime(params[param], '%Y-%m-%d').date() + timedelta(days=days)
+        except ValueError:
+            continue
+        queryset = queryset.filter(**{f'{field}__{lookup}': timezone.make_aware(datetime.combine(day, time.min), tz)})
+    return queryset
+
+
+def _audit_logs(params):
+    from .audit_export import filter_audit_logs
+
+    # select_related is pointless for values_list and would only widen the query
+    return filter_audit_logs(params).select_related(None)
+
+
+def _payment_proofs(params):
+    from ..models import PaymentProof
+
+    proofs = _day_range(PaymentProof.objects.order_by('-uploaded_at', '-id'), 'uploaded_at', params)
+    if params.get('status'):
+        proofs = proofs.filter(status=params['status'])
+    return proofs
+
+
+def _users(params):
+    from django.contrib.auth.models import User
+
+    users = _day_range(User.objects.order_by('id'), 'date_joined', params)
+    if params.get('membership_tier'):
+        users = users.filter(profile__membership_tier=params['membership_tier'])
+    return users
+
+
+def _video_analytics(params):
+    from ..models import VideoAnalytics
+
+    events = _day_range(VideoAnalytics.objects.order_by('timestamp', 'id'), 'timestamp', params)
+    if params.get('video_id'):
+        events = events.filter(session__video_id=params['video_id'])
+    return events
+
+
+# name -> queryset builder, accepted filter params and columns as (key, header, lookup)
+EXPORT_TABLES = {
+    'audit_logs': {
+        'queryset': _audit_logs,
+        'filters': ['action_type', 'user_id', 'start_date', 'end_date', 'q'],
+        'formats': ['csv', 'jsonl', 'pdf'],
+        'columns': [
+            ('user', 'User', 'user__username'),
+            ('action', 'Action', 'action'),
+            ('action_type', 'Type', 'action_type'),
+            ('ip_address', 'IP Address', 'ip_address'),
+            ('timestamp', 'Timestamp', 'timestamp'),
+            ('status', 'Status', 'status'),
+            ('related_user', 'Related User', 'related_user__username'),
+        ],
+    },
+    'payment_proofs': {
+        'queryset': _payment_proofs,
+        'filters': ['status', 'start_date', 'end_date'],
+        'formats': ['csv', 'jsonl'],
+        'columns': [
+            ('id', 'ID', 'id'),
+            ('user', 'User', 'user__username'),
+            ('email', 'Email', 'user__email'),
+            ('requested_tier', 'Requested Tier', 'requested_tier'),
+            ('status', 'Status', 'status'),
+            ('uploaded_at', 'Uploaded', 'uploaded_at'),
+            ('processed_by', 'Processed By', 'processed_by__username'),
+            ('processed_at', 'Processed', 'processed_at'),
+            ('feedback', 'Feedback', 'feedback'),
+        ],
+    },
+    'users': {
+        'queryset': _users,
+        'filters': ['membership_tier', 'start_date', 'end_date'],
+        'formats': ['csv', 'jsonl'],
+        'columns': [
+            ('id', 'ID', 'id'),
+            ('username', 'Username', 'username'),
+            ('email', 'Email', 'email'),
+            ('is_active', 'Active', 'is_active'),
+            ('is_staff', 'Staff', 'is_staff'),
+            ('date_joined', 'Joined', 'date_joined'),
+            ('last_login', 'Last Login', 'last_login'),
+            ('membership_tier', 'Membership', 'profile__membership_tier'),
+            ('membership_end_date', 'Membership Ends', 'profile__membership_end_date'),
+        ],
+    },
+    'video_analytics': {
+        'queryset': _video_analytics,
+        'filters': ['video_id', 'start_date', 'end_date'],
+        'formats': ['csv', 'jsonl'],
+        'columns': [
+            ('id', 'ID', 'id'),
+            ('session_id', 'Session', 'session_id'),
+            ('video_id', 'Video', 'session__video_id'),
+            ('user_id', 'User', 'session__user_id'),
+            ('event_type', 'Event', 'event_type'),
+            ('timestamp', 'Timestamp', 'timestamp'),
+            ('position', 'Position', 'position'),
+            ('duration', 'Duration', 'duration'),
+            ('metadata', 'Metadata', 'metadata'),
+        ],
+    },
+}
+
+
+def export_filters(name: str, params) -> dict:
+    """The filter params an export accepts, as a JSON serializable dict for a job"""
+    return {key: params.get(key, '') for key in EXPORT_TABLES[name]['filters']}
+
+
+def export_queryset(name: str, params):
+    return EXPORT_TABLES[name]['queryset'](params)
+
+
+def iter_rows(name: str, params):
+    """Export rows as tuples, fetched CHUNK_SIZE at a time through a server-side cursor"""
+    lookups = [lookup for _, _, lookup in EXPORT_TABLES[name]['columns']]
+    return export_queryset(name, params).values_list(*lookups).iterator(
+        chunk_size=get_export_settings()['CHUNK_SIZE']
+    )
+
+
+def _plain(value):
+    """JSON-compatible form of a column value"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool, dict, list)):
+        return value
+    return str(value)
+
+
+class _Echo:
+    """File-like object whose write() hands back the line, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def iter_export(name: str, params, export_format: str):
+    """Encoded chunks of a CSV or JSON Lines export"""
+    columns = EXPORT_TABLES[name]['columns']
+    chunk_size = get_export_settings()['CHUNK_SIZE']
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow([header for _, header, _ in columns]).encode()
+
+        def encode(row):
+            return writer.writerow([
+                json.dumps(value) if isinstance(value, (dict, list)) else '' if value is None else _plain(value)
+                for value in row
+            ])
+    elif export_format == 'jsonl':
+        keys = [key for key, _, _ in columns]
+
+        def encode(row):
+            return json.dumps(dict(zip(keys, map(_plain, row)))) + '\n'
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    lines = []
+    for row in iter_rows(name, params):
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def export_file_name(name: str, export_format: str) -> str:
+    return f"{name}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{EXPORT_FORMATS[export_format]['extension']}"
+
+
+def write_export(name: str, params, export_format: str, output) -> None:
+    """Write a whole export into a binary file-like object"""
+    if export_format == 'pdf':
+        # Only the audit log has a PDF layout
+        from .audit_export import filter_audit_logs, write_audit_logs_pdf
+
+        write_audit_logs_pdf(filter_audit_logs(params), output)
+        return
+    for chunk in iter_export(name, params, export_format):
+        output.write(chunk)
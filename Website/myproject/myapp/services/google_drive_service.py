@@ -1,18 +1,18 @@
-from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
-from google_auth_oauthlib.flow import InstalledAppFlow, Flow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from google_auth_httplib2 import AuthorizedHttp
 from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 import os
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from googleapiclient.errors import HttpError
-from cryptography.fernet import Fernet
+from .drive_metadata_cache import get_file_metadata
+from .change_bus import publish_folder_change
 import base64
 import time
 
@@ -21,18 +21,28 @@ logger = logging.getLogger(__name__)
 # Placeholder for MEGA integration service logic
 # Use mega.py or similar library for MEGA operations
 
+class GoogleDriveService:
     """Service class for Google Drive operations"""
     
-    def __init__(self):
+    def __init__(self, credentials=None, http=None):
+        """
+        Build a Drive client. `credentials` and `http` let the client pool
+        (services/drive_client_pool.py) share refreshed credentials and keep
+        connections alive across requests.
+        """
         try:
-            self.credentials = self._get_credentials()
-            self.service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self.credentials = credentials or self._get_credentials()
+            if http is not None:
+                self.service = build('drive', 'v3', http=AuthorizedHttp(self.credentials, http=http), cache_discovery=False)
+            else:
+                self.service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
             logger.info("Successfully initialized Google Drive service")
         except Exception as e:
             logger.error(f"Failed to initialize Google Drive service: {str(e)}")
             raise
     
-    def _get_credentials(self):
+    @staticmethod
+    def get_service_account_credentials():
         """Get service account credentials"""
         try:
             credentials_path = settings.GOOGLE_DRIVE_CREDENTIALS_PATH
@@ -48,22 +58,21 @@ logger = logging.getLogger(__name__)
             logger.error(f"Error getting service account credentials: {str(e)}")
             raise Exception("Failed to initialize Google Drive service")
     
+    def _get_credentials(self):
+        return self.get_service_account_credentials()
+    
     def generate_signed_url(self, file_id, user):
         """Generate a streaming URL for a video"""
         try:
             # Get file metadata
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id, name, mimeType, webContentLink'
-            ).execute()
+            file = get_file_metadata(file_id, self)
 
             if not file.get('webContentLink'):
                 # Generate a temporary download URL
                 request = self.service.files().get_media(fileId=file_id)
                 download_url = request.uri
 
-                # Add authorization header to URL
-                auth_header = f"Bearer {self.credentials.token}"
+                # Add the access token to the URL
                 stream_url = f"{download_url}&access_token={self.credentials.token}"
 
                 return stream_url
@@ -80,10 +89,7 @@ logger = logging.getLogger(__name__)
         """Generate a secure streaming URL with encryption"""
         try:
             # Get file metadata
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id, name, mimeType, webContentLink'
-            ).execute()
+            file = get_file_metadata(file_id, self)
 
             # Create a secure token with user info and timestamp
             token_data = {
@@ -136,7 +142,7 @@ logger = logging.getLogger(__name__)
             logger.error(f"Error extracting folder ID from {folder_id_or_url}: {str(e)}")
             raise ValueError("Could not extract folder ID from URL")
     
-    def process_video(self, video_data: Dict, folder_id: str) -> None:
+    def process_video(self, video_data: Dict, folder_id: str, folder=None) -> None:
         """Process a single video from Google Drive with improved metadata handling"""
         try:
             # Import models here to avoid circular import
@@ -144,8 +150,9 @@ logger = logging.getLogger(__name__)
             GoogleDriveFolder = apps.get_model('myapp', 'GoogleDriveFolder')
             GoogleDriveVideo = apps.get_model('myapp', 'GoogleDriveVideo')
             
-            # Get the GoogleDriveFolder instance first
-            folder = GoogleDriveFolder.objects.get(folder_id=folder_id)
+            # Get the GoogleDriveFolder instance first, unless the caller already has it
+            if folder is None:
+                folder = GoogleDriveFolder.objects.get(folder_id=folder_id)
             
             # Get video metadata with detailed error handling
             video_metadata = video_data.get('videoMediaMetadata', {})
@@ -202,6 +209,15 @@ logger = logging.getLogger(__name__)
             logger.error(error_msg)
             raise Exception(error_msg)
     
+    def process_videos(self, videos: List[Dict], folder_id: str) -> Tuple[int, int]:
+        """
+        Batched process_video: looks the folder up once and writes all
+        videos in one transaction. Returns (created, updated) counts.
+        """
+        from ..models import GoogleDriveFolder
+        folder = GoogleDriveFolder.objects.get(folder_id=folder_id)
+        return self._upsert_videos(folder, videos)
+    
     @staticmethod
     def format_duration(duration_millis: Optional[int]) -> str:
         """Format duration from milliseconds to human-readable string"""
@@ -226,140 +242,287 @@ logger = logging.getLogger(__name__)
             logger.warning(f"Invalid duration value: {duration_millis}")
             return "Unknown"
     
-    def sync_folder(self, folder_id: str) -> Dict[str, Any]:
+    # Fields needed to create or update a GoogleDriveVideo from a Drive file
+    VIDEO_FILE_FIELDS = 'id, name, mimeType, parents, trashed, thumbnailLink, videoMediaMetadata, description, modifiedTime'
+
+    @staticmethod
+    def _video_defaults(item: Dict) -> Dict[str, Any]:
+        """Map a Drive file resource onto GoogleDriveVideo fields"""
+        video_metadata = item.get('videoMediaMetadata', {})
+        duration_millis = video_metadata.get('durationMillis')
+        if isinstance(duration_millis, str):
+            # One bad value must not abort the whole batch
+            try:
+                duration_millis = int(duration_millis)
+            except ValueError:
+                logger.warning(f"Invalid duration value for {item.get('id')}: {duration_millis}")
+                duration_millis = None
+        
+        return {
+            'title': item.get('name', ''),
+            'description': item.get('description', ''),
+            'thumbnail_url': item.get('thumbnailLink', ''),
+            'duration_ms': duration_millis,
+            'last_modified': item.get('modifiedTime'),
+            'mime_type': item.get('mimeType', ''),
+            'is_deleted': False,
+            'deleted_at': None
+        }
+    
+    def _upsert_videos(self, folder, items: List[Dict]) -> Tuple[int, int]:
         """
-        Sync folder contents with database, handling pagination and maintaining state.
+        Create or update the records for a batch of Drive files in one
+        transaction, so a page costs one commit rather than one per file.
+        Rows are written with update_or_create: a single INSERT ... ON CONFLICT
+        needs a unique constraint on (drive_file_id, folder), which
+        GoogleDriveVideo does not have yet.
+        Returns (created, updated) counts.
+        """
+        from ..models import GoogleDriveVideo
+        
+        # The last entry wins when a file is listed twice
+        rows = {}
+        for item in items:
+            rows[item['id']] = self._video_defaults(item)
+        
+        created_count = 0
+        with transaction.atomic():
+            for file_id, defaults in rows.items():
+                _, created = GoogleDriveVideo.objects.update_or_create(
+                    drive_file_id=file_id,
+                    folder=folder,
+                    defaults=defaults
+                )
+                created_count += created
+        return created_count, len(rows) - created_count
+    
+    def sync_folder(self, folder_id: str, full: bool = False) -> Dict[str, Any]:
+        """
+        Sync folder contents with database.
+        Uses the Drive Changes API from the folder's stored start page token and
+        falls back to a full relisting when there is no token, the token was
+        rejected, or `full` is requested.
         Returns a dictionary with sync results.
         """
         try:
-            start_time = time.time()
-            page_token = None
-            all_files = []
-            processed_count = 0
-            updated_count = 0
-            deleted_count = 0
-            errors = []
-
-            # Get existing video IDs in database for this folder
-            from ..models import GoogleDriveVideo, GoogleDriveFolder
+            from ..models import GoogleDriveFolder, DriveFolderSyncState
             folder = GoogleDriveFolder.objects.get(folder_id=folder_id)
-            existing_video_ids = set(GoogleDriveVideo.objects.filter(
-                folder=folder
-            ).values_list('drive_file_id', flat=True))
+            state, _ = DriveFolderSyncState.objects.get_or_create(folder_id=folder_id)
             
-            # Track which files we find in Drive
-            found_video_ids = set()
-
-            while True:
+            if not full and state.start_page_token:
                 try:
-                    # List all video files in the folder with pagination
-                    results = self.service.files().list(
-                        q=f"'{folder_id}' in parents and mimeType contains 'video/'",
-                        spaces='drive',
-                        fields='nextPageToken, files(id, name, mimeType, thumbnailLink, videoMediaMetadata, description, modifiedTime)',
-                        pageToken=page_token,
-                        pageSize=100,
-                        orderBy='name'
-                    ).execute()
-
-                    items = results.get('files', [])
-                    
-                    # Process each video in the current page
-                    for item in items:
-                        try:
-                            video_id = item['id']
-                            found_video_ids.add(video_id)
-                            
-                            # Get video metadata
-                            video_metadata = item.get('videoMediaMetadata', {})
-                            duration_millis = video_metadata.get('durationMillis')
-                            if isinstance(duration_millis, str):
-                                duration_millis = int(duration_millis)
-                            
-                            # Update or create video record
-                            video, created = GoogleDriveVideo.objects.update_or_create(
-                                drive_file_id=video_id,
-                                folder=folder,
-                                defaults={
-                                    'title': item.get('name', ''),
-                                    'description': item.get('description', ''),
-                                    'thumbnail_url': item.get('thumbnailLink', ''),
-                                    'duration_ms': duration_millis,
-                                    'last_modified': item.get('modifiedTime'),
-                                    'mime_type': item.get('mimeType', '')
-                                }
-                            )
-                            
-                            if created:
-                                processed_count += 1
-                            else:
-                                updated_count += 1
-                                
-                        except Exception as video_error:
-                            error_msg = f"Error processing video {item.get('name', 'unknown')}: {str(video_error)}"
-                            logger.error(error_msg)
-                            errors.append(error_msg)
-                            continue
-
-                    # Get the next page token
-                    page_token = results.get('nextPageToken')
-                    if not page_token:
-                        break
-
+                    return self._incremental_sync(folder, state)
                 except HttpError as error:
-                    error_msg = f"Error fetching videos page: {str(error)}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
-                    break
+                    # Expired or invalid page tokens come back as 4xx; relist everything
+                    if error.resp.status not in (400, 403, 404, 410):
+                        raise
+                    logger.warning(f"Incremental sync for {folder_id} failed ({error.resp.status}), running full sync")
+            
+            return self._full_sync(folder, state)
+        
+        except Exception as e:
+            error_msg = f"Error syncing folder {folder_id}: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+    
+    def _incremental_sync(self, folder, state) -> Dict[str, Any]:
+        """Apply only the adds, updates and removals since the stored page token"""
+        from ..models import GoogleDriveVideo
+        from .drive_metadata_cache import invalidate_file_metadata
+        
+        start_time = time.time()
+        page_token = state.start_page_token
+        new_start_page_token = None
+        processed_count = 0
+        updated_count = 0
+        removed_ids = set()
+        errors = []
+        
+        while page_token:
+            results = self.service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                includeRemoved=True,
+                pageSize=1000,
+                fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({self.VIDEO_FILE_FIELDS}))'
+            ).execute()
+            
+            changed_items = []
+            for change in results.get('changes', []):
+                file_id = change.get('fileId')
+                item = change.get('file') or {}
+                invalidate_file_metadata(file_id)
+                
+                # Removed, trashed or moved out of this folder
+                if change.get('removed') or item.get('trashed') or folder.folder_id not in item.get('parents', []):
+                    removed_ids.add(file_id)
+                    continue
+                
+                if not item.get('mimeType', '').startswith('video/'):
+                    continue
+                
+                removed_ids.discard(file_id)
+                changed_items.append(item)
+            
+            try:
+                created, updated = self._upsert_videos(folder, changed_items)
+                processed_count += created
+                updated_count += updated
+            except Exception as video_error:
+                error_msg = f"Error saving {len(changed_items)} changed videos: {str(video_error)}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+            
+            new_start_page_token = results.get('newStartPageToken', new_start_page_token)
+            page_token = results.get('nextPageToken')
+        
+        deleted_count = 0
+        if removed_ids:
+            deleted_count = GoogleDriveVideo.objects.filter(
+                folder=folder,
+                drive_file_id__in=removed_ids,
+                is_deleted=False
+            ).update(
+                is_deleted=True,
+                deleted_at=timezone.now()
+            )
+        
+        total_videos = GoogleDriveVideo.objects.filter(folder=folder, is_deleted=False).count()
+        folder.last_synced = timezone.now()
+        folder.video_count = total_videos
+        folder.save()
+        publish_folder_change(folder, 'synced')
+        
+        # Keep the old token if some items failed so they are retried next time
+        if not errors and new_start_page_token:
+            state.start_page_token = new_start_page_token
+        state.last_incremental_sync = timezone.now()
+        state.save()
+        
+        sync_report = {
+            'status': 'success' if not errors else 'partial_success',
+            'mode': 'incremental',
+            'total_videos': total_videos,
+            'new_videos': processed_count,
+            'updated_videos': updated_count,
+            'deleted_videos': deleted_count,
+            'errors': errors,
+            'sync_duration': time.time() - start_time,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+        logger.info(f"Incremental folder sync completed for {folder.folder_id}: {json.dumps(sync_report)}")
+        
+        return sync_report
+    
+    def _full_sync(self, folder, state) -> Dict[str, Any]:
+        """Relist every video in the folder and record a fresh start page token"""
+        start_time = time.time()
+        page_token = None
+        processed_count = 0
+        updated_count = 0
+        deleted_count = 0
+        errors = []
+        folder_id = folder.folder_id
+        
+        # Take the token before listing so changes made during the sync are not missed
+        start_page_token = self.service.changes().getStartPageToken().execute().get('startPageToken')
 
-            # Handle deleted videos
-            deleted_videos = existing_video_ids - found_video_ids
-            if deleted_videos:
-                # Mark videos as deleted instead of actually deleting them
-                deleted_count = GoogleDriveVideo.objects.filter(
-                    drive_file_id__in=deleted_videos
-                ).update(
-                    is_deleted=True,
-                    deleted_at=timezone.now()
-                )
+        # Get existing video IDs in database for this folder
+        from ..models import GoogleDriveVideo
+        existing_video_ids = set(GoogleDriveVideo.objects.filter(
+            folder=folder
+        ).values_list('drive_file_id', flat=True))
+        
+        # Track which files we find in Drive
+        found_video_ids = set()
 
-            # Update folder metadata
-            folder.last_synced = timezone.now()
-            folder.video_count = len(found_video_ids)
-            folder.save()
-
-            # Calculate sync duration
-            sync_duration = time.time() - start_time
-
-            # Create detailed sync report
-            sync_report = {
-                'status': 'success' if not errors else 'partial_success',
-                'total_videos': len(found_video_ids),
-                'new_videos': processed_count,
-                'updated_videos': updated_count,
-                'deleted_videos': deleted_count,
-                'errors': errors,
-                'sync_duration': sync_duration,
-                'timestamp': timezone.now().isoformat()
-            }
+        while True:
+            try:
+                # List all video files in the folder with pagination
+                results = self.service.files().list(
+                    q=f"'{folder_id}' in parents and mimeType contains 'video/' and trashed = false",
+                    spaces='drive',
+                    fields=f'nextPageToken, files({self.VIDEO_FILE_FIELDS})',
+                    pageToken=page_token,
+                    pageSize=100,
+                    orderBy='name'
+                ).execute()
+
+                items = results.get('files', [])
+                found_video_ids.update(item['id'] for item in items)
+                
+                # Write the whole page in one transaction
+                try:
+                    created, updated = self._upsert_videos(folder, items)
+                    processed_count += created
+                    updated_count += updated
+                except Exception as video_error:
+                    error_msg = f"Error saving videos page: {str(video_error)}"
+                    logger.error(error_msg)
+                    errors.append(error_msg)
 
-            # Log sync results
-            logger.info(f"Folder sync completed for {folder_id}: {json.dumps(sync_report)}")
+                # Get the next page token
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
 
-            return sync_report
+            except HttpError as error:
+                error_msg = f"Error fetching videos page: {str(error)}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+                break
+
+        # Handle deleted videos
+        deleted_videos = existing_video_ids - found_video_ids
+        if deleted_videos and not errors:
+            # Mark videos as deleted instead of actually deleting them
+            deleted_count = GoogleDriveVideo.objects.filter(
+                folder=folder,
+                drive_file_id__in=deleted_videos,
+                is_deleted=False
+            ).update(
+                is_deleted=True,
+                deleted_at=timezone.now()
+            )
 
-        except Exception as e:
-            error_msg = f"Error syncing folder {folder_id}: {str(e)}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
+        # Update folder metadata
+        folder.last_synced = timezone.now()
+        folder.video_count = len(found_video_ids)
+        folder.save()
+        publish_folder_change(folder, 'synced')
+
+        # Only trust the token once the whole listing succeeded
+        if not errors:
+            state.start_page_token = start_page_token
+            state.last_full_sync = timezone.now()
+            state.save()
+
+        # Calculate sync duration
+        sync_duration = time.time() - start_time
+
+        # Create detailed sync report
+        sync_report = {
+            'status': 'success' if not errors else 'partial_success',
+            'mode': 'full',
+            'total_videos': len(found_video_ids),
+            'new_videos': processed_count,
+            'updated_videos': updated_count,
+            'deleted_videos': deleted_count,
+            'errors': errors,
+            'sync_duration': sync_duration,
+            'timestamp': timezone.now().isoformat()
+        }
+
+        # Log sync results
+        logger.info(f"Folder sync completed for {folder_id}: {json.dumps(sync_report)}")
+
+        return sync_report
     
     def get_video_metadata(self, file_id: str) -> Dict[str, Any]:
         """Get video metadata from Google Drive"""
         try:
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id,name,mimeType,size,modifiedTime,webContentLink'
-            ).execute()
+            file = get_file_metadata(file_id, self)
             
             return {
                 'file_id': file.get('id'),
@@ -454,12 +617,6 @@ logger = logging.getLogger(__name__)
     def get_direct_stream_url(self, file_id):
         """Get direct streaming URL for a video file"""
         try:
-            # Get file metadata
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id, name, mimeType, webContentLink'
-            ).execute()
-
             # Generate a direct streaming URL
             access_token = self.credentials.token
             base_url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
@@ -481,10 +638,7 @@ logger = logging.getLogger(__name__)
             
         try:
             # Verify file exists and user has access
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id, name, mimeType, webContentLink, size, md5Checksum'
-            ).execute()
+            file = get_file_metadata(file_id, self)
 
             if not file:
                 raise Exception("Video file not found")
@@ -528,10 +682,7 @@ logger = logging.getLogger(__name__)
         """Verify if user has access to the video"""
         try:
             # Get video metadata
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id, parents'
-            ).execute()
+            file = get_file_metadata(file_id, self)
 
             if not file:
                 return False
@@ -562,11 +713,8 @@ logger = logging.getLogger(__name__)
             if not self.verify_video_access(file_id, user):
                 raise Exception("Access denied")
 
-            # Get file metadata
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='id, name, mimeType, size'
-            ).execute()
+            # Get file metadata (shared with verify_video_access above)
+            file = get_file_metadata(file_id, self)
 
             if not file:
                 raise Exception("Video not found")
@@ -604,4 +752,20 @@ logger = logging.getLogger(__name__)
 
         except Exception as e:
             logger.error(f"Error getting video stream for file {file_id}: {str(e)}")
-            raise 
\ No newline at end of file
+            raise 
+
+    def fetch_byte_range(self, file_id: str, start: int, end: int) -> bytes:
+        """Download bytes start..end (inclusive) of a file"""
+        try:
+            request = self.service.files().get_media(fileId=file_id)
+            request.headers['Range'] = f'bytes={start}-{end}'
+            return request.execute()
+        except Exception as e:
+            logger.error(f"Error fetching bytes {start}-{end} of file {file_id}: {str(e)}")
+            raise
+
+    def get_access_token(self) -> str:
+        """Return a valid access token, refreshing the credentials if needed"""
+        if not self.credentials.valid:
+            self.credentials.refresh(Request())
+        return self.credentials.token
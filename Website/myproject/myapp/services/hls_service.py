@@ -0,0 +1,137 @@
+import os
+import re
+import shutil
+import uuid
+import logging
+from django.conf import settings
+from django.utils import timezone
+import ffmpeg_streaming
+from ffmpeg_streaming import Formats, Representation, Size, Bitrate
+
+logger = logging.getLogger(__name__)
+
+# Adaptive bitrate ladder: (width, height, video kbps, audio kbps)
+HLS_LADDER = [
+    (426, 240, 400, 64),
+    (854, 480, 1000, 96),
+    (1280, 720, 2500, 128),
+    (1920, 1080, 5000, 192),
+]
+
+MASTER_PLAYLIST_NAME = 'master.m3u8'
+
+
+def get_hls_settings() -> dict:
+    """Return HLS packaging settings merged with defaults"""
+    defaults = {
+        'OUTPUT_DIR': 'hls',
+        'SEGMENT_SECONDS': 6,
+        'FFMPEG_BIN': 'ffmpeg',
+        'PROCESSING_TIMEOUT': 6 * 3600,
+    }
+    defaults.update(getattr(settings, 'HLS_STREAMING', {}))
+    return defaults
+
+
+def get_output_dir(video_id) -> str:
+    """Relative (to MEDIA_ROOT) directory holding the renditions of a video"""
+    return os.path.join(get_hls_settings()['OUTPUT_DIR'], f'video_{video_id}')
+
+
+def hls_video_id(relative_path: str):
+    """MegaVideo id owning a playlist or segment path (relative to MEDIA_ROOT), or None"""
+    output_dir = re.escape(get_hls_settings()['OUTPUT_DIR'].strip('/'))
+    match = re.match(rf'^{output_dir}/video_(\d+)/[^/]+$', relative_path)
+    return int(match.group(1)) if match else None
+
+
+def build_representations():
+    """Build the ffmpeg_streaming representations for the ladder"""
+    return [
+        Representation(Size(width, height), Bitrate(video_kbps * 1024, audio_kbps * 1024))
+        for width, height, video_kbps, audio_kbps in HLS_LADDER
+    ]
+
+
+def package_hls(source: str, video_id) -> str:
+    """
+    Package a source file or URL into an HLS ladder with a master playlist.
+    Output is written to a staging directory and swapped in place once ffmpeg
+    succeeds, so players never see a half-written ladder.
+    Returns the master playlist path relative to MEDIA_ROOT.
+    """
+    hls_settings = get_hls_settings()
+    relative_dir = get_output_dir(video_id)
+    final_dir = os.path.join(settings.MEDIA_ROOT, relative_dir)
+    staging_dir = f"{final_dir}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(staging_dir, exist_ok=True)
+
+    try:
+        video = ffmpeg_streaming.input(source)
+        hls = video.hls(Formats.h264(), hls_time=hls_settings['SEGMENT_SECONDS'], hls_list_size=0)
+        hls.representations(*build_representations())
+        hls.output(
+            os.path.join(staging_dir, MASTER_PLAYLIST_NAME),
+            ffmpeg_bin=hls_settings['FFMPEG_BIN'],
+        )
+    except Exception as e:
+        logger.error(f"Error packaging HLS for video {video_id}: {str(e)}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    if os.path.isdir(final_dir):
+        shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(staging_dir, final_dir)
+
+    return os.path.join(relative_dir, MASTER_PLAYLIST_NAME).replace(os.sep, '/')
+
+
+def package_mega_video(video, source: str = None) -> str:
+    """
+    Package a MegaVideo and record the master playlist on the model.
+    `source` defaults to the video's own link, which must be directly
+    readable by ffmpeg (a local path or a plain HTTP(S) URL).
+    """
+    source = source or video.mega_file_link
+    video.hls_status = 'processing'
+    # updated_at marks when processing started, for expire_stale_processing
+    video.save(update_fields=['hls_status', 'updated_at'])
+
+    try:
+        playlist = package_hls(source, video.id)
+    except BaseException:
+        # Also on KeyboardInterrupt/SystemExit, so a stopped run does not leave 'processing' behind
+        video.hls_status = 'failed'
+        video.save(update_fields=['hls_status'])
+        raise
+
+    video.hls_playlist = playlist
+    video.hls_status = 'ready'
+    video.hls_packaged_at = timezone.now()
+    video.save(update_fields=['hls_playlist', 'hls_status', 'hls_packaged_at'])
+    logger.info(f"Packaged HLS ladder for video {video.id}: {playlist}")
+    return playlist
+
+
+def expire_stale_processing() -> int:
+    """
+    Mark videos stuck in 'processing' for longer than PROCESSING_TIMEOUT as
+    failed, so a killed packaging run does not block the video forever.
+    Returns the number of videos reset.
+    """
+    from ..models import MegaVideo
+
+    cutoff = timezone.now() - timezone.timedelta(seconds=get_hls_settings()['PROCESSING_TIMEOUT'])
+    expired = MegaVideo.objects.filter(hls_status='processing', updated_at__lt=cutoff).update(hls_status='failed')
+    if expired:
+        logger.warning(f"Reset {expired} video(s) stuck in HLS processing since before {cutoff}")
+    return expired
+
+
+def remove_hls(video) -> None:
+    """Delete packaged renditions for a video"""
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, get_output_dir(video.id)), ignore_errors=True)
+    video.hls_playlist = ''
+    video.hls_status = 'none'
+    video.hls_packaged_at = None
+    video.save(update_fields=['hls_playlist', 'hls_status', 'hls_packaged_at'])
@@ -0,0 +1,195 @@
+import os
+import mimetypes
+import logging
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse, Http404
+from ..utils import parse_range_header
+from .async_relay import get_async_streaming_settings, streaming_body
+
+logger = logging.getLogger(__name__)
+
+# HLS playlists and segments; mimetypes does not know .ts as MPEG-TS
+HLS_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+def get_protected_media_settings() -> dict:
+    """Return protected media settings merged with defaults"""
+    defaults = {
+        'BACKEND': 'python',
+        'INTERNAL_URL': '/protected-media/',
+    }
+    defaults.update(getattr(settings, 'PROTECTED_MEDIA', {}))
+    return defaults
+
+
+def resolve_media_path(relative_path: str) -> str:
+    """Absolute path of a file under MEDIA_ROOT, refusing anything that escapes it"""
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    full_path = os.path.realpath(os.path.join(media_root, relative_path))
+    if os.path.commonpath([media_root, full_path]) != media_root or not os.path.isfile(full_path):
+        raise Http404("File not found")
+    return full_path
+
+
+class FileRange:
+    """
+    File-like view of bytes start..start+length of an open file. It keeps
+    fileno() so a WSGI file_wrapper (gunicorn sync workers) can still hand
+    the range to os.sendfile, and bounds read() for servers that iterate
+    the body.
+    """
+
+    def __init__(self, file, start: int, length: int):
+        file.seek(start)
+        self._file = file
+        self._remaining = length
+        self.name = file.name
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+def _iter_file(file, chunk_size: int):
+    try:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        file.close()
+
+
+def _sendfile_response(request, full_path: str, content_type: str):
+    """
+    Serve a file from Python, honouring Range requests. Under WSGI this is a
+    FileResponse the server can sendfile(); under ASGI, which has no
+    file_wrapper and would read a FileResponse into memory whole, the file is
+    streamed in RELAY_CHUNK_SIZE reads off the event loop.
+    """
+    size = os.path.getsize(full_path)
+    try:
+        byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    file = FileRange(open(full_path, 'rb'), start, end - start + 1)
+    streaming_settings = get_async_streaming_settings()
+    if streaming_settings['ENABLED']:
+        response = StreamingHttpResponse(
+            streaming_body(_iter_file(file, streaming_settings['RELAY_CHUNK_SIZE'])),
+            content_type=content_type,
+            status=206 if byte_range else 200
+        )
+    else:
+        response = FileResponse(file, content_type=content_type, status=206 if byte_range else 200)
+    response['Content-Length'] = end - start + 1
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_protected_file(request, relative_path: str):
+    """
+    Deliver a file under MEDIA_ROOT once access has been checked. With the
+    nginx or sendfile backends Django only sets a header and the front-end
+    server streams the file itself (including Range handling).
+    """
+    full_path = resolve_media_path(relative_path)
+    content_type = (
+        HLS_CONTENT_TYPES.get(os.path.splitext(full_path)[1].lower())
+        or mimetypes.guess_type(full_path)[0]
+        or 'application/octet-stream'
+    )
+    media_settings = get_protected_media_settings()
+    backend = media_settings['BACKEND']
+
+    if backend == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = media_settings['INTERNAL_URL'] + quote(relative_path)
+    elif backend == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = _sendfile_response(request, full_path, content_type)
+
+    response['Cache-Control'] = 'private, no-store'
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _tier_allows(user, required_tier: str) -> bool:
+    tier_levels = {
+        'regular': 0,
+        'vip': 1,
+        'diamond': 2
+    }
+    try:
+        profile = user.profile
+    except Exception:
+        return False
+    if required_tier != 'regular' and not profile.is_membership_active():
+        return False
+    return tier_levels.get(profile.membership_tier, -1) >= tier_levels.get(required_tier, 0)
+
+
+def can_access_media(user, relative_path: str) -> bool:
+    """Check whether a user may download a protected media file"""
+    # Import models here to avoid circular import
+    from ..models import Video, MegaVideo, PaymentProof, MembershipUpgradeRequest
+    from .hls_service import hls_video_id
+
+    if user.is_staff or user.is_superuser:
+        return True
+
+    # Packaged HLS renditions carry the tier of the MegaVideo they belong to
+    video_id = hls_video_id(relative_path)
+    if video_id is not None:
+        video = MegaVideo.objects.filter(id=video_id).only('is_free', 'membership_tier').first()
+        if not video:
+            return False
+        if video.is_free:
+            return True
+        return _tier_allows(user, video.membership_tier)
+
+    if relative_path.startswith('payment_proofs/'):
+        return PaymentProof.objects.filter(image=relative_path, user=user).exists()
+
+    if relative_path.startswith('upgrade_proofs/'):
+        return MembershipUpgradeRequest.objects.filter(screenshot=relative_path, user=user).exists()
+
+    if relative_path.startswith('videos/'):
+        video = Video.objects.select_related('tier').filter(
+            url=settings.MEDIA_URL + relative_path,
+            is_active=True
+        ).first()
+        if not video:
+            return False
+        if video.is_free:
+            return True
+        return _tier_allows(user, video.tier.tier if video.tier else 'regular')
+
+    return False
@@ -290,21 +290,23 @@ class MegaService:
         
         return False
     
+    @staticmethod
+    def extract_gdrive_file_id(url: str) -> Optional[str]:
+        """Extract the file ID from various Google Drive URL formats"""
+        if not url:
+            return None
+        if '/file/d/' in url:
+            return url.split('/file/d/')[1].split('/')[0].split('?')[0]
+        if 'id=' in url:
+            query_params = parse_qs(urlparse(url).query)
+            return query_params.get('id', [None])[0]
+        return None
+    
     @staticmethod
     def convert_gdrive_to_embed(url: str) -> str:
         """Convert Google Drive URL to embeddable format"""
         try:
-            # Extract file ID from various Google Drive URL formats
-            if '/file/d/' in url:
-                file_id = url.split('/file/d/')[1].split('/')[0]
-            elif 'id=' in url:
-                parsed_url = urlparse(url)
-                query_params = parse_qs(parsed_url.query)
-                file_id = query_params.get('id', [None])[0]
-            else:
-                # Assume the URL is already in embed format or direct link
-                return url
-            
+            file_id = MegaService.extract_gdrive_file_id(url)
             if file_id:
                 # Return embed URL
                 return f"https://drive.google.com/file/d/{file_id}/preview"
@@ -1,116 +1,278 @@
-import os
+import re
+import time
 import tempfile
+import threading
 import subprocess
 import logging
 import requests
-from django.core.files import File
 from django.conf import settings
 import ffmpeg
-import json
-import base64
 
 logger = logging.getLogger(__name__)
 
-def download_mega_file(mega_link: str) -> str:
+def get_thumbnail_settings() -> dict:
+    """Return thumbnail extraction settings merged with defaults"""
+    defaults = {
+        'SEEK_SECONDS': 2,
+        'MAX_LEADING_BYTES': 32 * 1024 * 1024,  # cap for sources that must be read front to back
+        'TAIL_BYTES': 16 * 1024 * 1024,  # read from the end when the index is not in the leading bytes
+        'READ_CHUNK_SIZE': 256 * 1024,
+        'TIMEOUT': 120,
+        'FFMPEG_BIN': 'ffmpeg',
+    }
+    defaults.update(getattr(settings, 'VIDEO_THUMBNAILS', {}))
+    return defaults
+
+def _frame_args(source: str, **input_args) -> list:
+    """ffmpeg command that writes one JPEG frame at SEEK_SECONDS to stdout"""
+    thumb_settings = get_thumbnail_settings()
+    stream = ffmpeg.input(source, ss=thumb_settings['SEEK_SECONDS'], loglevel='error', **input_args)
+    stream = ffmpeg.output(stream, 'pipe:', vframes=1, format='image2', vcodec='mjpeg', q=2)
+    return ffmpeg.compile(stream, cmd=thumb_settings['FFMPEG_BIN'])
+
+class LeadingBytesExhausted(RuntimeError):
+    """ffmpeg found no frame in MAX_LEADING_BYTES; the container index may be at the end"""
+
+
+def extract_frame_from_url(url: str) -> bytes:
+    """
+    Grab one JPEG frame from a public, seekable HTTP source. ffmpeg reads the
+    file itself with Range requests, so only the container index and the
+    bytes around the seek point are transferred.
+    """
+    result = subprocess.run(
+        _frame_args(url),
+        capture_output=True,
+        timeout=get_thumbnail_settings()['TIMEOUT']
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg could not extract a frame: {result.stderr.decode(errors='replace')[-500:]}")
+    return result.stdout
+
+def extract_frame_from_stream(url: str, headers: dict = None, decrypt=None) -> bytes:
     """
-    Download a file from MEGA using direct download
-    Returns the path to the downloaded file
+    Grab one JPEG frame from the leading bytes of a source. At most
+    MAX_LEADING_BYTES are requested and piped straight into ffmpeg, passed
+    through `decrypt` first if given; the download stops as soon as ffmpeg
+    has written its frame. Request headers never reach ffmpeg's command line.
     """
+    thumb_settings = get_thumbnail_settings()
+    max_bytes = thumb_settings['MAX_LEADING_BYTES']
+    request_headers = dict(headers or {})
+    request_headers['Range'] = f'bytes=0-{max_bytes - 1}'
+
+    process = subprocess.Popen(
+        _frame_args('pipe:'),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    # Drain ffmpeg's output concurrently so neither side blocks on a full pipe
+    output = {}
+    readers = [
+        threading.Thread(target=lambda name=name, pipe=pipe: output.__setitem__(name, pipe.read()), daemon=True)
+        for name, pipe in (('stdout', process.stdout), ('stderr', process.stderr))
+    ]
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + thumb_settings['TIMEOUT']
+    sent = 0
     try:
-        # Create a temporary directory
-        temp_dir = tempfile.mkdtemp()
-        temp_file = os.path.join(temp_dir, 'temp_video.mp4')
-        
-        # Extract file ID and key from the MEGA link
-        if '/file/' in mega_link and '#' in mega_link:
-            file_id = mega_link.split('/file/')[1].split('#')[0]
-            key = mega_link.split('#')[1]
-            
-            # Construct direct download URL with key
-            download_url = f"https://mega.nz/file/{file_id}/download#{key}"
-            
-            # Download the file
-            response = requests.get(download_url, stream=True)
+        with requests.get(url, headers=request_headers, stream=True, timeout=(10, 30)) as response:
             response.raise_for_status()
-            
-            with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            return temp_file
-        else:
-            raise ValueError("Invalid MEGA link format")
-            
-    except Exception as e:
-        logger.error(f"Error downloading MEGA file: {str(e)}")
-        raise
+            for chunk in response.iter_content(chunk_size=thumb_settings['READ_CHUNK_SIZE']):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    break
+                if decrypt:
+                    chunk = decrypt(chunk)
+                try:
+                    process.stdin.write(chunk)
+                except (BrokenPipeError, OSError):
+                    # ffmpeg already has its frame and exited
+                    break
+                sent += len(chunk)
+                if sent >= max_bytes:
+                    # Servers that ignore Range still stop here
+                    break
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    try:
+        process.wait(timeout=max(deadline - time.monotonic(), 1))
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    for reader in readers:
+        reader.join()
 
-def generate_thumbnail(video_path: str) -> str:
+    logger.info(f"Read {sent} leading bytes for thumbnail extraction")
+    if process.returncode != 0 or not output.get('stdout'):
+        message = f"ffmpeg could not extract a frame: {output.get('stderr', b'').decode(errors='replace')[-500:]}"
+        raise LeadingBytesExhausted(message) if sent >= max_bytes else RuntimeError(message)
+    return output['stdout']
+
+
+def _write_range(url: str, headers: dict, file, first: int, last: int = None, decrypt_from=None, deadline=None):
     """
-    Generate a thumbnail from a video file using ffmpeg
-    Returns the path to the generated thumbnail
+    Download bytes first..last of a source into `file` at the same offset; a
+    negative `first` asks for the last -first bytes. Returns (start, size)
+    as reported by the server's Content-Range.
     """
+    request_headers = dict(headers or {})
+    request_headers['Range'] = f'bytes={first}' if first < 0 else f'bytes={first}-{last}'
+    with requests.get(url, headers=request_headers, stream=True, timeout=(10, 30)) as response:
+        response.raise_for_status()
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+)', response.headers.get('Content-Range', ''))
+        if response.status_code != 206 or not match:
+            raise RuntimeError("Source does not support range requests")
+        start, end, size = (int(value) for value in match.groups())
+
+        decrypt = decrypt_from(start) if decrypt_from else None
+        remaining = end - start + 1
+        file.seek(start)
+        for chunk in response.iter_content(chunk_size=get_thumbnail_settings()['READ_CHUNK_SIZE']):
+            if deadline and time.monotonic() > deadline:
+                raise RuntimeError("Timed out reading the source for a thumbnail")
+            chunk = chunk[:remaining]
+            file.write(decrypt(chunk) if decrypt else chunk)
+            remaining -= len(chunk)
+            if remaining <= 0:
+                break
+    return start, size
+
+
+def extract_frame_from_ranges(url: str, headers: dict = None, decrypt_from=None, size: int = None) -> bytes:
+    """
+    Second try for files whose index (an MP4 moov atom written without
+    faststart) follows the media data, so a front-to-back read cannot reach
+    it. The last TAIL_BYTES and the first MAX_LEADING_BYTES are written at
+    their offsets into a sparse temporary file, which ffmpeg can seek in,
+    unlike a pipe. `decrypt_from(offset)` returns a decrypt function for
+    bytes starting at that offset.
+    """
+    thumb_settings = get_thumbnail_settings()
+    deadline = time.monotonic() + thumb_settings['TIMEOUT']
+    tail_bytes = thumb_settings['TAIL_BYTES']
+
+    with tempfile.NamedTemporaryFile(suffix='.video') as file:
+        if size:
+            tail_start, size = _write_range(url, headers, file, max(size - tail_bytes, 0), size - 1, decrypt_from, deadline)
+        else:
+            tail_start, size = _write_range(url, headers, file, -tail_bytes, None, decrypt_from, deadline)
+        head_end = min(thumb_settings['MAX_LEADING_BYTES'], tail_start)
+        if head_end > 0:
+            _write_range(url, headers, file, 0, head_end - 1, decrypt_from, deadline)
+        file.flush()
+        logger.info(f"Read {head_end} leading and {size - tail_start} trailing bytes for thumbnail extraction")
+
+        result = subprocess.run(
+            _frame_args(file.name),
+            capture_output=True,
+            timeout=max(deadline - time.monotonic(), 1)
+        )
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg could not extract a frame: {result.stderr.decode(errors='replace')[-500:]}")
+    return result.stdout
+
+
+def _extract_frame(url: str, headers: dict = None, decrypt_from=None, size: int = None) -> bytes:
+    """Leading bytes first; the leading and trailing ranges if ffmpeg needed more than that"""
     try:
-        # Create a temporary directory for the thumbnail
-        temp_dir = tempfile.mkdtemp()
-        thumbnail_path = os.path.join(temp_dir, 'thumbnail.jpg')
-        
-        # Use ffmpeg-python to extract a frame at 2 seconds
-        stream = ffmpeg.input(video_path, ss='00:00:02')
-        stream = ffmpeg.output(stream, thumbnail_path, vframes=1, q=2)
-        ffmpeg.run(stream, capture_stdout=True, capture_stderr=True)
-        
-        return thumbnail_path
-        
-    except Exception as e:
-        logger.error(f"Error generating thumbnail: {str(e)}")
-        raise
-
-def cleanup_temp_files(*file_paths):
-    """Clean up temporary files and directories"""
-    for path in file_paths:
-        try:
-            if os.path.isfile(path):
-                os.remove(path)
-            elif os.path.isdir(path):
-                # Remove all files in directory first
-                for root, dirs, files in os.walk(path, topdown=False):
-                    for name in files:
-                        os.remove(os.path.join(root, name))
-                    for name in dirs:
-                        os.rmdir(os.path.join(root, name))
-                os.rmdir(path)
-        except Exception as e:
-            logger.error(f"Error cleaning up temporary file {path}: {str(e)}")
-
-def generate_video_thumbnail(mega_link: str) -> str:
+        return extract_frame_from_stream(url, headers, decrypt_from(0) if decrypt_from else None)
+    except LeadingBytesExhausted as e:
+        logger.info(f"No frame in the leading bytes, retrying with the end of the file: {str(e)[-200:]}")
+    return extract_frame_from_ranges(url, headers, decrypt_from, size)
+
+
+def _mega_file_info(file_handle: str) -> dict:
     """
-    Main function to generate a thumbnail from a MEGA video link
-    Returns the path to the generated thumbnail
+    MEGA's 'g' command for a public file: its download URL ('g') and size
+    ('s'). mega.py has no public method that returns the URL without
+    downloading the whole file, so this goes through the private
+    Mega._api_request of the version pinned in requirements.txt, and turns
+    anything unexpected into a ValueError.
     """
-    video_path = None
-    thumbnail_path = None
-    temp_dirs = []
-    
+    from mega import Mega
+    from mega.errors import RequestError
+
+    api_request = getattr(Mega(), '_api_request', None)
+    if api_request is None:
+        raise ValueError("Installed mega.py has no _api_request; use the version pinned in requirements.txt")
     try:
-        # Download the video
-        video_path = download_mega_file(mega_link)
-        temp_dirs.append(os.path.dirname(video_path))
-        
-        # Generate thumbnail
-        thumbnail_path = generate_thumbnail(video_path)
-        temp_dirs.append(os.path.dirname(thumbnail_path))
-        
-        return thumbnail_path
-        
-    except Exception as e:
-        logger.error(f"Error in generate_video_thumbnail: {str(e)}")
-        raise
-        
-    finally:
-        # Clean up all temporary files and directories
-        if video_path:
-            cleanup_temp_files(video_path)
-        for temp_dir in temp_dirs:
-            cleanup_temp_files(temp_dir) 
\ No newline at end of file
+        file_data = api_request({'a': 'g', 'g': 1, 'p': file_handle})
+    except (RequestError, RuntimeError, ValueError) as e:
+        raise ValueError(f"MEGA refused the file request: {e}")
+    if not isinstance(file_data, dict) or 'g' not in file_data:
+        raise ValueError("MEGA file is not accessible")
+    return file_data
+
+def mega_download_source(mega_link: str):
+    """
+    Resolve a public MEGA file link to (download URL, size, decrypt_from).
+    MEGA files are AES-128-CTR encrypted with the key in the link fragment,
+    which is never sent to a server, so the bytes from the storage host must
+    be decrypted here; decrypt_from(offset) returns a decrypt function that
+    takes consecutive chunks starting at that offset.
+    """
+    from Crypto.Cipher import AES
+    from Crypto.Util import Counter
+    from mega.crypto import a32_to_str, base64_to_a32
+
+    if '/file/' in mega_link and '#' in mega_link:
+        file_handle, file_key = mega_link.split('/file/')[1].split('#', 1)
+    elif '#!' in mega_link:
+        # Legacy https://mega.nz/#!<handle>!<key> links
+        file_handle, file_key = mega_link.split('#!')[1].split('!', 1)
+    else:
+        raise ValueError("Invalid MEGA link format")
+
+    file_data = _mega_file_info(file_handle.split('?')[0])
+
+    key = base64_to_a32(file_key)
+    aes_key = a32_to_str((key[0] ^ key[4], key[1] ^ key[5], key[2] ^ key[6], key[3] ^ key[7]))
+    nonce = ((key[4] << 32) + key[5]) << 64
+
+    def decrypt_from(offset: int = 0):
+        # The CTR counter advances once per 16-byte block
+        cipher = AES.new(aes_key, AES.MODE_CTR, counter=Counter.new(128, initial_value=nonce + offset // 16))
+        cipher.decrypt(bytes(offset % 16))
+        return cipher.decrypt
+
+    return file_data['g'], file_data.get('s'), decrypt_from
+
+def extract_video_thumbnail(video) -> bytes:
+    """
+    Return JPEG bytes of a frame from a MegaVideo without downloading the
+    whole file. Direct pCloud links are seekable over HTTP, so ffmpeg reads
+    them itself; Drive (which needs a bearer token) and MEGA (which must be
+    decrypted) are read front to back up to MAX_LEADING_BYTES, then from
+    their leading and trailing ranges if the index is at the end. Raises
+    if no frame could be extracted, which fails the thumbnail job.
+    """
+    # Import here to avoid circular import
+    from .mega_service import MegaService
+
+    if video.video_source == 'gdrive':
+        from .drive_client_pool import get_drive_pool
+        file_id = video.drive_file_id
+        if not file_id:
+            raise ValueError("Invalid Google Drive link format")
+        # Piped in rather than passed to ffmpeg as -headers, where ps would show the token
+        return _extract_frame(
+            f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media",
+            {'Authorization': f'Bearer {get_drive_pool().get_access_token()}'}
+        )
+
+    if video.video_source == 'pcloud':
+        direct_url = MegaService.convert_pcloud_to_direct(video.mega_file_link)
+        if 'filedn.com' not in direct_url.lower() and 'p-def.pcloud.com' not in direct_url.lower():
+            raise ValueError("pCloud share pages cannot be read directly")
+        return extract_frame_from_url(direct_url)
+
+    download_url, size, decrypt_from = mega_download_source(video.mega_file_link)
+    return _extract_frame(download_url, decrypt_from=decrypt_from, size=size)
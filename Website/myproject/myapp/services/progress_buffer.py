@@ -0,0 +1,235 @@
+import os
+import time
+import atexit
+import threading
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Write-behind storage for VideoProgress. The player reports its position on
+# every timeupdate; each report only replaces the cached entry for (user,
+# video) and marks it dirty. A background thread upserts the dirty entries in
+# one bulk statement every FLUSH_INTERVAL seconds, and reads prefer the cache,
+# so resume positions are never older than the last report.
+
+
+def get_progress_settings() -> dict:
+    """Return video progress buffering settings merged with defaults"""
+    defaults = {
+        'FLUSH_INTERVAL': 30,  # seconds between bulk writes
+        'CACHE_TIMEOUT': 24 * 3600,
+        'COMPLETE_AT': 95,  # percent watched that marks a video completed
+        'BATCH_SIZE': 500,
+    }
+    defaults.update(getattr(settings, 'VIDEO_PROGRESS', {}))
+    return defaults
+
+
+def _cache_key(user_id, video_id) -> str:
+    return f'video_progress:{user_id}:{video_id}'
+
+
+def _db_entry(user_id, video_id):
+    from ..models import VideoProgress
+
+    row = VideoProgress.objects.filter(user_id=user_id, video_id=video_id).values(
+        'current_time', 'progress', 'completed'
+    ).first()
+    if row is None:
+        return None
+    row['updated_at'] = 0
+    return row
+
+
+class ProgressBuffer:
+    """Per-process set of dirty progress entries and the thread that flushes them"""
+
+    def __init__(self, flush_interval: float, batch_size: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'reports': 0, 'written': 0, 'flushes': 0, 'flush_failures': 0}
+
+    def mark_dirty(self, user_id, video_id, entry: dict) -> None:
+        with self._lock:
+            self._dirty[(user_id, video_id)] = entry
+            self._stats['reports'] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='video-progress-writer', daemon=True)
+                self._thread.start()
+
+    def _upsert(self, rows) -> None:
+        from ..models import VideoProgress
+
+        VideoProgress.objects.bulk_create(
+            rows,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=['user', 'video'],
+            update_fields=['progress', 'current_time', 'completed', 'last_watched']
+        )
+
+    def flush(self) -> int:
+        """Write every dirty entry now; returns the number of rows written"""
+        from django.contrib.auth.models import User
+        from ..models import Video, VideoProgress
+
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+
+            # Another worker may have cached a newer report for the same video
+            cached = cache.get_many([_cache_key(*key) for key in dirty])
+            entries = {}
+            for key, entry in dirty.items():
+                latest = cached.get(_cache_key(*key))
+                entries[key] = latest if latest and latest['updated_at'] > entry['updated_at'] else entry
+
+            def build(keys):
+                return [
+                    VideoProgress(
+                        user_id=user_id,
+                        video_id=video_id,
+                        current_time=entries[(user_id, video_id)]['current_time'],
+                        progress=entries[(user_id, video_id)]['progress'],
+                        completed=entries[(user_id, video_id)]['completed']
+                    )
+                    for user_id, video_id in keys
+                ]
+
+            try:
+                try:
+                    self._upsert(build(entries))
+                except IntegrityError:
+                    # A user or video was deleted since it was reported; drop those entries
+                    videos = set(Video.objects.filter(id__in={key[1] for key in entries}).values_list('id', flat=True))
+                    users = set(User.objects.filter(id__in={key[0] for key in entries}).values_list('id', flat=True))
+                    entries = {key: entry for key, entry in entries.items() if key[0] in users and key[1] in videos}
+                    self._upsert(build(entries))
+            except Exception as e:
+                with self._lock:
+                    for key, entry in dirty.items():
+                        # Keep it for the next flush unless a newer report arrived meanwhile
+                        self._dirty.setdefault(key, entry)
+                    self._stats['flush_failures'] += 1
+                logger.error(f"Error writing {len(dirty)} video progress rows: {str(e)}")
+                return 0
+
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['written'] += len(entries)
+            return len(entries)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def close(self) -> None:
+        """Stop the writer thread and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['dirty'] = len(self._dirty)
+        stats['pid'] = os.getpid()
+        stats['writer_alive'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def get_progress_buffer() -> ProgressBuffer:
+    """Return this process's progress buffer, rebuilding it after a fork"""
+    global _buffer, _buffer_pid
+    if _buffer is None or _buffer_pid != os.getpid():
+        with _buffer_lock:
+            if _buffer is None or _buffer_pid != os.getpid():
+                progress_settings = get_progress_settings()
+                _buffer = ProgressBuffer(progress_settings['FLUSH_INTERVAL'], progress_settings['BATCH_SIZE'])
+                _buffer_pid = os.getpid()
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def record_progress(user_id, video_id, current_time, duration=0, completed=False) -> dict:
+    """
+    Store the player's latest position for (user, video) and queue it for
+    the next bulk write. Returns the merged progress entry.
+    """
+    progress_settings = get_progress_settings()
+    key = _cache_key(user_id, video_id)
+    previous = cache.get(key) or _db_entry(user_id, video_id) or {'progress': 0, 'completed': False}
+
+    current_time = float(current_time or 0)
+    duration = float(duration or 0)
+    progress = min(100, (current_time / duration) * 100) if duration > 0 else previous['progress']
+    entry = {
+        'current_time': current_time,
+        'progress': progress,
+        # Completion sticks, like VideoProgress.update_progress
+        'completed': bool(previous['completed'] or completed or progress >= progress_settings['COMPLETE_AT']),
+        'updated_at': time.time(),
+    }
+    cache.set(key, entry, timeout=progress_settings['CACHE_TIMEOUT'])
+    get_progress_buffer().mark_dirty(user_id, video_id, entry)
+    return entry
+
+
+def get_progress(user_id, video_id):
+    """Latest progress entry for (user, video), cached or stored, or None"""
+    entry = cache.get(_cache_key(user_id, video_id))
+    if entry is None:
+        entry = _db_entry(user_id, video_id)
+    return entry
+
+
+def get_progress_map(user_id, video_ids) -> dict:
+    """Latest progress entries for several videos of one user, keyed by video id"""
+    from ..models import VideoProgress
+
+    video_ids = list(video_ids)
+    entries = {
+        row['video_id']: row
+        for row in VideoProgress.objects.filter(user_id=user_id, video_id__in=video_ids).values(
+            'video_id', 'current_time', 'progress', 'completed'
+        )
+    }
+    # Cached reports are never older than the stored row
+    cached = cache.get_many([_cache_key(user_id, video_id) for video_id in video_ids])
+    for video_id in video_ids:
+        entry = cached.get(_cache_key(user_id, video_id))
+        if entry is not None:
+            entries[video_id] = dict(entry, video_id=video_id)
+    return entries
+
+
+def progress_instance(user, video):
+    """Unsaved VideoProgress holding the merged state, for templates and callers expecting the model"""
+    from ..models import VideoProgress
+
+    entry = get_progress(user.id, video.id) or {}
+    return VideoProgress(
+        user=user,
+        video=video,
+        current_time=entry.get('current_time', 0),
+        progress=entry.get('progress', 0),
+        completed=entry.get('completed', False)
+    )
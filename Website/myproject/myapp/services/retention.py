@@ -0,0 +1,214 @@
+import math
+import logging
+import numpy as np
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .analytics_rollup import PLAYING_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# Audience retention for one video: the fraction of stream sessions that
+# watched each second of it. Events are loaded once into NumPy arrays and
+# every step after that is vectorized; there is no per-event Python loop.
+
+
+def get_retention_settings() -> dict:
+    """Return retention curve settings merged with defaults"""
+    defaults = {
+        'BIN_SECONDS': 1,
+        'MAX_BINS': 1000,  # long videos get wider bins instead of more of them
+        'CACHE_TIMEOUT': 900,
+    }
+    defaults.update(getattr(settings, 'VIDEO_RETENTION', {}))
+    return defaults
+
+
+def _load_archived(video_id, start, end):
+    """The same columns from the Parquet archive, when the range reaches back into it"""
+    from .archive import archived_before, read_archive
+
+    boundary = archived_before('video_analytics')
+    if boundary is None or (start is not None and start >= boundary):
+        return None
+    table = read_archive(
+        'video_analytics', start, min(end, boundary) if end else boundary,
+        filters={'video_id': video_id},
+        columns=['session_id', 'event_type', 'position', 'duration', 'timestamp']
+    )
+    if not table.num_rows:
+        return None
+    return {
+        'session_id': table['session_id'].to_numpy(zero_copy_only=False).astype(str),
+        'event_type': table['event_type'].to_numpy(zero_copy_only=False).astype(str),
+        'position': table['position'].to_numpy(),
+        'duration': table['duration'].to_numpy(),
+        # Microseconds since the epoch
+        'timestamp': table['timestamp'].cast('int64').to_numpy() / 1e6,
+    }
+
+
+def load_events(video_id, start=None, end=None) -> dict:
+    """
+    Load a video's analytics events, from the database and the archive, as
+    column arrays ordered by session and time. Sessions become integer codes
+    so they can be grouped with NumPy.
+    """
+    from ..models import VideoAnalytics
+
+    events = VideoAnalytics.objects.filter(session__video_id=video_id)
+    if start is not None:
+        events = events.filter(timestamp__gte=start)
+    if end is not None:
+        events = events.filter(timestamp__lt=end)
+    rows = list(
+        events.order_by('session_id', 'timestamp', 'id')
+        .values_list('session_id', 'event_type', 'position', 'duration', 'timestamp')
+    )
+
+    columns = {
+        'session_id': np.empty(0, dtype=str),
+        'event_type': np.empty(0, dtype=str),
+        'position': np.empty(0),
+        'duration': np.empty(0),
+        'timestamp': np.empty(0),
+    }
+    if rows:
+        sessions, event_types, positions, durations, timestamps = zip(*rows)
+        columns = {
+            'session_id': np.array([str(session) for session in sessions]),
+            'event_type': np.array(event_types),
+            'position': np.asarray(positions, dtype=np.float64),
+            'duration': np.asarray(durations, dtype=np.float64),
+            'timestamp': np.fromiter((ts.timestamp() for ts in timestamps), dtype=np.float64, count=len(rows)),
+        }
+
+    archived = _load_archived(video_id, start, end)
+    if archived is not None:
+        # Archived events are older, so a stable sort keeps each source's order on ties
+        columns = {name: np.concatenate((archived[name], columns[name])) for name in columns}
+        order = np.lexsort((columns['timestamp'], columns['session_id']))
+        columns = {name: values[order] for name, values in columns.items()}
+
+    session_ids = columns['session_id']
+    # Rows are sorted by session, so a new code starts wherever the id changes
+    session = np.concatenate(([0], np.cumsum(session_ids[1:] != session_ids[:-1]))) if len(session_ids) else np.empty(0, dtype=np.int64)
+    return {
+        'session': session.astype(np.int64),
+        'playing': np.isin(columns['event_type'], list(PLAYING_EVENTS)),
+        'position': columns['position'],
+        'duration': columns['duration'],
+        'timestamp': columns['timestamp'],
+    }
+
+
+def watched_intervals(events: dict):
+    """
+    Intervals each session actually played: from a playing event to the next
+    event of the same session, where the position moved forward no faster
+    than wall-clock time allows. Returns (session, start, end) arrays.
+    """
+    session = events['session']
+    if len(session) < 2:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty
+
+    position = events['position']
+    advanced = position[1:] - position[:-1]
+    elapsed = events['timestamp'][1:] - events['timestamp'][:-1]
+    keep = (session[1:] == session[:-1]) & events['playing'][:-1] & (advanced > 0)
+
+    start = position[:-1][keep]
+    # A forward seek shows up as a jump much larger than the time that passed
+    end = start + np.minimum(advanced[keep], elapsed[keep] + 1)
+    return session[:-1][keep], start, end
+
+
+def merge_intervals(session, start, end):
+    """Union of each session's intervals, so rewatching a part counts once"""
+    if not len(start):
+        return session, start, end
+
+    order = np.lexsort((start, session))
+    session, start, end = session[order], start[order], end[order]
+
+    # Shift each session into its own range so one running maximum covers all groups
+    span = float(max(end.max(), 0)) + 1
+    offset = session * span
+    reach = np.maximum.accumulate(end + offset) - offset
+    new_block = np.ones(len(start), dtype=bool)
+    new_block[1:] = (session[1:] != session[:-1]) | (start[1:] > reach[:-1])
+
+    block_starts = np.flatnonzero(new_block)
+    block_ends = np.append(block_starts[1:], len(start)) - 1
+    return session[block_starts], start[block_starts], reach[block_ends]
+
+
+def _coverage(start, end, n_bins: int, bin_seconds: float):
+    """How many intervals cover each bin, by a difference array and cumsum"""
+    first = np.clip(np.floor(start / bin_seconds).astype(np.int64), 0, n_bins)
+    last = np.clip(np.ceil(end / bin_seconds).astype(np.int64), 0, n_bins)
+    diff = np.zeros(n_bins + 1, dtype=np.int64)
+    np.add.at(diff, first, 1)
+    np.add.at(diff, last, -1)
+    return np.cumsum(diff[:-1])
+
+
+def compute_retention(video_id, start=None, end=None) -> dict:
+    """Retention curve, rewatch heatmap and drop-off for one video"""
+    retention_settings = get_retention_settings()
+    events = load_events(video_id, start, end)
+
+    durations = events['duration'][events['duration'] > 0]
+    duration = float(np.median(durations)) if len(durations) else float(events['position'].max(initial=0))
+    n_sessions = int(events['session'][-1]) + 1 if len(events['session']) else 0
+
+    result = {
+        'video_id': video_id,
+        'duration': duration,
+        'sessions': n_sessions,
+        'events': int(len(events['session'])),
+        'bin_seconds': 0,
+        'retention': [],
+        'views': [],
+        'drop_off': [],
+    }
+    if not n_sessions or duration <= 0:
+        return result
+
+    bin_seconds = max(retention_settings['BIN_SECONDS'], math.ceil(duration / retention_settings['MAX_BINS']))
+    n_bins = math.ceil(duration / bin_seconds)
+
+    session, starts, ends = watched_intervals(events)
+    starts, ends = np.clip(starts, 0, duration), np.clip(ends, 0, duration)
+
+    # Every pass over a second, rewatches included, for the heatmap
+    views = _coverage(starts, ends, n_bins, bin_seconds)
+    # Sessions that saw each second at least once, for the retention curve
+    _, merged_starts, merged_ends = merge_intervals(session, starts, ends)
+    retention = _coverage(merged_starts, merged_ends, n_bins, bin_seconds) / n_sessions
+    drop_off = np.maximum(-np.diff(retention, prepend=1.0), 0)
+
+    result.update({
+        'bin_seconds': bin_seconds,
+        'retention': np.round(retention, 4).tolist(),
+        'views': views.tolist(),
+        'drop_off': np.round(drop_off, 4).tolist(),
+    })
+    return result
+
+
+def get_retention(video_id, start_day=None, end_day=None) -> dict:
+    """Cached retention for a video over start_day..end_day inclusive"""
+    cache_key = f'video_retention:{video_id}:{start_day}:{end_day}'
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_day, time.min), tz) if start_day else None
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min), tz) if end_day else None
+    result = compute_retention(video_id, start, end)
+    cache.set(cache_key, result, timeout=get_retention_settings()['CACHE_TIMEOUT'])
+    return result
@@ -0,0 +1,80 @@
+import logging
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Revenue ledger. Every approval writes one RevenueEntry holding the amount,
+# tier and membership period as they were at that moment; every revenue
+# figure on the dashboard is a SQL aggregate over these rows.
+
+
+def record_revenue(source: str, source_id, user, tier: str, amount, period_start, period_end, recorded_by=None):
+    """
+    Add a ledger entry for an approval and return it. Recording the same
+    source twice returns the first entry instead, so re-approving, or two
+    approval paths running for one proof, never counts a payment twice.
+    """
+    from ..models import RevenueEntry
+
+    existing = RevenueEntry.objects.filter(source=source, source_id=source_id).first()
+    if existing:
+        return existing
+    try:
+        # Savepoint, so a lost race does not break the caller's transaction
+        with transaction.atomic():
+            return RevenueEntry.objects.create(
+                source=source,
+                source_id=source_id,
+                user=user,
+                tier=tier,
+                amount=Decimal(amount),
+                period_start=period_start,
+                period_end=period_end,
+                recorded_by=recorded_by
+            )
+    except IntegrityError:
+        return RevenueEntry.objects.get(source=source, source_id=source_id)
+
+
+def record_payment_proof(proof, admin_user, period_start=None, period_end=None):
+    """Ledger entry for an approved PaymentProof, priced from its requested tier"""
+    period_start = period_start or proof.processed_at or timezone.now()
+    period_end = period_end or period_start + timezone.timedelta(days=proof.get_duration())
+    return record_revenue(
+        'payment_proof', proof.pk, proof.user, proof.requested_tier, proof.get_amount(),
+        period_start, period_end, recorded_by=admin_user
+    )
+
+
+def record_upgrade_request(upgrade_request, admin_user, period_start, period_end):
+    """Ledger entry for an approved MembershipUpgradeRequest, priced from its desired tier"""
+    from ..models import PaymentProof
+
+    return record_revenue(
+        'upgrade_request', upgrade_request.pk, upgrade_request.user, upgrade_request.desired_tier,
+        PaymentProof.TIER_PRICING.get(upgrade_request.desired_tier, 0),
+        period_start, period_end, recorded_by=admin_user
+    )
+
+
+def total_revenue(start=None, end=None) -> Decimal:
+    """Sum of ledger amounts recorded in [start, end)"""
+    from ..models import RevenueEntry
+
+    entries = RevenueEntry.objects.all()
+    if start is not None:
+        entries = entries.filter(recorded_at__gte=start)
+    if end is not None:
+        entries = entries.filter(recorded_at__lt=end)
+    return entries.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+
+def revenue_by_month(months: int = 6) -> list:
+    """(month start, revenue) for the last `months` calendar months, oldest first"""
+    from .time_series import bucket_starts, metric_series
+
+    starts = bucket_starts('month', months)
+    return list(zip(starts, metric_series('revenue', 'month', starts)))
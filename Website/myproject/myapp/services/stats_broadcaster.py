@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_KEY = 'dashboard_stats_snapshot'
+
+ACTIVITY_BADGES = {
+    'login': 'info',
+    'logout': 'secondary',
+    'register': 'success',
+    'profile_update': 'primary',
+    'payment': 'warning',
+    'video_upload': 'info',
+    'video_delete': 'danger',
+    'membership_change': 'primary',
+    'settings_update': 'info',
+    'user_activation': 'success',
+    'user_deactivation': 'danger',
+}
+
+
+def get_dashboard_events_settings() -> dict:
+    """Return admin dashboard event stream settings merged with defaults"""
+    defaults = {
+        'INTERVAL': 5,  # seconds between snapshots
+        'LOCK_TIMEOUT': 30,
+    }
+    defaults.update(getattr(settings, 'DASHBOARD_EVENTS', {}))
+    return defaults
+
+
+def compute_dashboard_snapshot() -> dict:
+    """Run the dashboard statistics queries once"""
+    # Import models here to avoid circular import
+    from ..models import AuditLog
+    from .dashboard_counters import get_counters
+    from .revenue import total_revenue
+
+    counters = get_counters()
+    stats = {
+        'total_users': counters.get('users.total', 0),
+        'active_users': counters.get('users.active', 0),
+        'pending_payments': counters.get('payments.pending', 0),
+        'total_revenue': float(total_revenue())
+    }
+
+    # Get latest activities
+    activities = AuditLog.objects.select_related('user').order_by('-timestamp')[:5]
+    activity_data = [{
+        'user': activity.user.username if activity.user else 'System',
+        'action': activity.action,
+        'action_type': activity.action_type,
+        'badge_color': ACTIVITY_BADGES.get(activity.action_type, 'secondary')
+    } for activity in activities]
+
+    return {
+        'stats': stats,
+        'activities': activity_data
+    }
+
+
+def get_dashboard_snapshot() -> dict:
+    """
+    Return the current snapshot, recomputing it at most once per INTERVAL
+    for every process sharing the cache. Workers that lose the race for the
+    compute lock keep serving the previous snapshot.
+    """
+    events_settings = get_dashboard_events_settings()
+    entry = cache.get(SNAPSHOT_CACHE_KEY)
+    if entry and time.time() - entry['computed_at'] < events_settings['INTERVAL']:
+        return entry['data']
+
+    lock_key = f'{SNAPSHOT_CACHE_KEY}_lock'
+    if entry and not cache.add(lock_key, 1, timeout=events_settings['LOCK_TIMEOUT']):
+        return entry['data']
+
+    try:
+        data = compute_dashboard_snapshot()
+        cache.set(SNAPSHOT_CACHE_KEY, {'data': data, 'computed_at': time.time()}, timeout=events_settings['INTERVAL'] * 10)
+        return data
+    finally:
+        if entry:
+            cache.delete(lock_key)
+
+
+class StatsBroadcaster:
+    """
+    Fan-out of dashboard snapshots to every SSE subscriber on one event loop.
+    A single producer task fetches the snapshot each interval and hands it to
+    per-subscriber queues; it stops when the last subscriber disconnects.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.latest = None
+        self._subscribers = set()
+        self._task = None
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            try:
+                self.latest = await sync_to_async(get_dashboard_snapshot)()
+                for queue in list(self._subscribers):
+                    # Slow readers skip to the newest snapshot
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(self.latest)
+            except Exception as e:
+                logger.error(f"Error computing dashboard snapshot: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def subscribe(self):
+        """Async iterator of snapshots for one connection"""
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        self._ensure_running()
+        try:
+            if self.latest is not None:
+                yield self.latest
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+# One broadcaster per event loop; uvicorn workers run a single loop each
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster() -> StatsBroadcaster:
+    """Return the broadcaster for the running event loop"""
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = StatsBroadcaster(get_dashboard_events_settings()['INTERVAL'])
+        _broadcasters[loop] = broadcaster
+    return broadcaster
@@ -0,0 +1,141 @@
+import logging
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Bucketed series for the admin dashboard charts. Each metric is one
+# GROUP BY over a Trunc* of its date column, gaps are filled with zeros in
+# Python, and buckets that have already ended are cached, so most requests
+# only query the current bucket.
+
+TIMEFRAMES = {
+    'week': {'unit': 'day', 'buckets': 7, 'label': '%A'},
+    'month': {'unit': 'day', 'buckets': 30, 'label': '%b %d'},
+    'quarter': {'unit': 'week', 'buckets': 13, 'label': '%b %d'},
+    'year': {'unit': 'month', 'buckets': 12, 'label': '%B'},
+}
+
+TRUNC = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def get_time_series_settings() -> dict:
+    """Return dashboard time series settings merged with defaults"""
+    defaults = {
+        # Closed buckets rarely change; this bounds how long a late approval goes unseen
+        'CACHE_TIMEOUT': 6 * 3600,
+    }
+    defaults.update(getattr(settings, 'DASHBOARD_TIME_SERIES', {}))
+    return defaults
+
+
+def _bucket_start(moment, unit: str):
+    """Start of the bucket containing `moment`, in the current timezone"""
+    local = timezone.localtime(moment)
+    day = local.date()
+    if unit == 'week':
+        day -= timedelta(days=day.weekday())
+    elif unit == 'month':
+        day = day.replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def _next_bucket(start, unit: str):
+    day = timezone.localtime(start).date()
+    if unit == 'day':
+        day += timedelta(days=1)
+    elif unit == 'week':
+        day += timedelta(days=7)
+    else:
+        day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def bucket_starts(unit: str, count: int, now=None) -> list:
+    """The last `count` bucket starts, oldest first, ending with the current bucket"""
+    start = _bucket_start(now or timezone.now(), unit)
+    starts = [start]
+    for _ in range(count - 1):
+        # Step into the previous bucket, then snap to its start
+        start = _bucket_start(start - timedelta(seconds=1), unit)
+        starts.append(start)
+    return starts[::-1]
+
+
+def _signups(since, unit: str) -> dict:
+    from django.contrib.auth.models import User
+
+    rows = (
+        User.objects.filter(date_joined__gte=since)
+        .annotate(bucket=TRUNC[unit]('date_joined'))
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return {row['bucket']: row['count'] for row in rows}
+
+
+def _revenue(since, unit: str) -> dict:
+    from ..models import RevenueEntry
+
+    rows = (
+        RevenueEntry.objects.filter(recorded_at__gte=since)
+        .annotate(bucket=TRUNC[unit]('recorded_at'))
+        .values('bucket')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    return {row['bucket']: row['total'] for row in rows}
+
+
+METRICS = {
+    'users': _signups,
+    'revenue': _revenue,
+}
+
+
+def _cache_key(metric: str, unit: str, start) -> str:
+    return f'time_series:{metric}:{unit}:{start.isoformat()}'
+
+
+def metric_series(metric: str, unit: str, starts: list, now=None) -> list:
+    """
+    Values of one metric for each bucket in `starts`. Cached closed buckets
+    are reused; everything from the oldest uncached bucket on is read in a
+    single grouped query.
+    """
+    now = now or timezone.now()
+    closed = [start for start in starts if _next_bucket(start, unit) <= now]
+    cached = cache.get_many([_cache_key(metric, unit, start) for start in closed])
+    values = {start: cached[_cache_key(metric, unit, start)] for start in closed if _cache_key(metric, unit, start) in cached}
+
+    missing = [start for start in starts if start not in values]
+    if missing:
+        counted = METRICS[metric](missing[0], unit)
+        fresh = {start: counted.get(start, 0) for start in missing}
+        values.update(fresh)
+        cache.set_many(
+            {_cache_key(metric, unit, start): value for start, value in fresh.items() if start in closed},
+            timeout=get_time_series_settings()['CACHE_TIMEOUT']
+        )
+    return [values[start] for start in starts]
+
+
+def dashboard_series(timeframe: str) -> dict:
+    """Labels plus signups and revenue per bucket for a dashboard chart timeframe"""
+    spec = TIMEFRAMES.get(timeframe, TIMEFRAMES['year'])
+    now = timezone.now()
+    starts = bucket_starts(spec['unit'], spec['buckets'], now)
+    return {
+        'labels': [timezone.localtime(start).strftime(spec['label']) for start in starts],
+        'users': metric_series('users', spec['unit'], starts, now),
+        'revenue': [float(value) for value in metric_series('revenue', spec['unit'], starts, now)],
+    }
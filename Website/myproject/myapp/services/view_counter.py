@@ -0,0 +1,179 @@
+import os
+import atexit
+import threading
+import logging
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Buffered view counts for Video and MegaVideo. A play adds to a per-process
+# delta; a background thread periodically adds each pending delta with
+# UPDATE ... SET views = views + n, grouping rows that share the same delta
+# into one statement. The deltas live in process memory rather than the
+# default cache, which is a LocMemCache that culls entries when full and
+# would drop plays. Setting CACHE to a shared, non-evicting cache (Redis)
+# pools the deltas across processes instead; flushers in different
+# processes may then see the same key, so a delta is only claimed through
+# the value an atomic decrement returns (see _claim).
+
+
+def get_view_counter_settings() -> dict:
+    """Return view counter settings merged with defaults"""
+    defaults = {
+        'FLUSH_INTERVAL': 10,  # seconds between database writes
+        'CACHE': None,  # alias of a shared cache for pending deltas; None keeps them in process
+        'CACHE_TIMEOUT': 7 * 24 * 3600,  # pending deltas outlive any realistic outage
+    }
+    defaults.update(getattr(settings, 'VIEW_COUNTERS', {}))
+    return defaults
+
+
+def _cache_key(model, pk) -> str:
+    return f'view_count:{model._meta.label_lower}:{pk}'
+
+
+class ViewCounter:
+    """Per-process pending deltas (or, with a shared cache, the keys holding them) and their flusher"""
+
+    def __init__(self, flush_interval: float, cache_alias: str = None):
+        self.flush_interval = flush_interval
+        self.cache_alias = cache_alias
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def increment(self, model, pk, amount: int = 1) -> None:
+        if self.cache_alias:
+            cache = caches[self.cache_alias]
+            key = _cache_key(model, pk)
+            timeout = get_view_counter_settings()['CACHE_TIMEOUT']
+            # add() is a no-op when the key exists, so concurrent first plays both count
+            cache.add(key, 0, timeout=timeout)
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.set(key, amount, timeout=timeout)
+        with self._lock:
+            self._pending[(model, pk)] += amount
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='view-counter-writer', daemon=True)
+                self._thread.start()
+
+    def _claim(self, key) -> int:
+        """
+        Take the pending delta out of a shared counter and return how much of
+        it this flusher owns. Two flushers can read the same value; whoever's
+        decrement drives the counter below zero only owns what was left
+        before it, and gives back the overshoot, so every play is written
+        exactly once.
+        """
+        cache = caches[self.cache_alias]
+        delta = cache.get(key) or 0
+        if delta <= 0:
+            return 0
+        try:
+            remaining = cache.decr(key, delta)
+        except ValueError:
+            # Expired since the read; nothing left to claim
+            return 0
+        if remaining >= 0:
+            return delta
+        overshoot = min(delta, -remaining)
+        cache.incr(key, overshoot)
+        return delta - overshoot
+
+    def flush(self) -> int:
+        """Add every pending delta to the database; returns the total views written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+            if not pending:
+                return 0
+
+            # model -> delta -> ids
+            grouped = defaultdict(lambda: defaultdict(list))
+            for (model, pk), delta in pending.items():
+                if self.cache_alias:
+                    # The shared counter also holds other processes' plays; take what we can claim
+                    delta = self._claim(_cache_key(model, pk))
+                if delta > 0:
+                    grouped[model][delta].append(pk)
+
+            written = 0
+            for model, by_delta in grouped.items():
+                for delta, ids in by_delta.items():
+                    try:
+                        model.objects.filter(pk__in=ids).update(views=F('views') + delta)
+                        written += delta * len(ids)
+                    except Exception as e:
+                        logger.error(f"Error adding {delta} views to {len(ids)} {model.__name__} rows: {str(e)}")
+                        for pk in ids:
+                            # Give the delta back for the next flush
+                            self.increment(model, pk, delta)
+            return written
+
+    def pending(self, model, pks) -> dict:
+        """Views counted but not yet written, keyed by primary key"""
+        if self.cache_alias:
+            keys = {_cache_key(model, pk): pk for pk in pks}
+            # A counter is briefly negative while a flusher gives back an overshoot
+            cached = caches[self.cache_alias].get_many(list(keys))
+            return {keys[key]: value for key, value in cached.items() if value and value > 0}
+        with self._lock:
+            return {pk: self._pending[(model, pk)] for pk in pks if self._pending.get((model, pk))}
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def close(self) -> None:
+        """Stop the writer thread and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+        self.flush()
+
+
+_counter = None
+_counter_pid = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter() -> ViewCounter:
+    """Return this process's view counter, rebuilding it after a fork"""
+    global _counter, _counter_pid
+    if _counter is None or _counter_pid != os.getpid():
+        with _counter_lock:
+            if _counter is None or _counter_pid != os.getpid():
+                counter_settings = get_view_counter_settings()
+                _counter = ViewCounter(counter_settings['FLUSH_INTERVAL'], counter_settings['CACHE'])
+                _counter_pid = os.getpid()
+                atexit.register(_counter.close)
+    return _counter
+
+
+def count_view(obj) -> None:
+    """Record one view of a Video or MegaVideo"""
+    get_view_counter().increment(type(obj), obj.pk)
+
+
+def pending_views(model, pks) -> dict:
+    """
+    Views counted but not yet written, keyed by primary key. Without a
+    shared cache this only sees plays counted by this process.
+    """
+    return get_view_counter().pending(model, pks)
+
+
+def current_views(obj) -> int:
+    """Stored views plus the pending delta"""
+    return obj.views + pending_views(type(obj), [obj.pk]).get(obj.pk, 0)
@@ -0,0 +1,223 @@
+import os
+import atexit
+import threading
+import logging
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def get_analytics_settings() -> dict:
+    """Return video analytics ingestion settings merged with defaults"""
+    defaults = {
+        'BATCH_SIZE': 500,  # flush as soon as this many events are waiting
+        'FLUSH_INTERVAL': 5,  # seconds; otherwise flush at least this often
+        'MAX_PENDING': 20000,  # oldest events are dropped past this if the DB is down
+        'MAX_EVENTS_PER_REQUEST': 200,
+    }
+    defaults.update(getattr(settings, 'VIDEO_ANALYTICS', {}))
+    return defaults
+
+
+class BulkWriteBuffer:
+    """
+    Per-process buffer of unsaved model instances written with bulk_create.
+    A background thread flushes when BATCH_SIZE rows are waiting or every
+    FLUSH_INTERVAL seconds, and an atexit hook drains what is left when the
+    worker shuts down. Rows are lost only if the process is killed outright,
+    or if the database rejects that row itself (see _write).
+    """
+
+    def __init__(self, model, batch_size: int, flush_interval: float, max_pending: int):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._stats = {
+            'added': 0,
+            'written': 0,
+            'dropped': 0,
+            'rejected': 0,
+            'flushes': 0,
+            'flush_failures': 0,
+        }
+
+    def add(self, objs) -> None:
+        """Queue instances for the next bulk write"""
+        with self._lock:
+            self._pending.extend(objs)
+            self._stats['added'] += len(objs)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self._stats['dropped'] += overflow
+                logger.warning(f"{self.model.__name__} buffer full, dropped {overflow} rows")
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f'{self.model.__name__.lower()}-writer',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _write(self, batch, written: list, rejected: list) -> None:
+        """
+        Bulk-insert a batch, collecting the rows saved into `written` and the
+        rows discarded into `rejected`. When the database refuses the data
+        itself (a row pointing at a deleted user or session, a constraint
+        violation) the batch is split in halves and retried, so only the
+        offending rows are discarded and one bad row cannot block every later
+        flush. Any other error propagates.
+        """
+        try:
+            # A savepoint when flushed inside a transaction, so a rejected batch only rolls back itself
+            with transaction.atomic():
+                self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            written.extend(batch)
+            return
+        except (IntegrityError, DataError) as e:
+            # Nothing from this batch was kept
+            for obj in batch:
+                obj.pk = None
+                obj._state.adding = True
+            if len(batch) == 1:
+                logger.warning(f"Discarding {self.model.__name__} row rejected by the database: {str(e)}")
+                rejected.extend(batch)
+                return
+        middle = len(batch) // 2
+        self._write(batch[:middle], written, rejected)
+        self._write(batch[middle:], written, rejected)
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            written, rejected = [], []
+            try:
+                self._write(batch, written, rejected)
+            except Exception as e:
+                done = {id(obj) for obj in written + rejected}
+                unsaved = [obj for obj in batch if id(obj) not in done]
+                with self._lock:
+                    # The database is unreachable; keep the unsaved rows for the next attempt, still within the cap
+                    self._pending[:0] = unsaved[-self.max_pending:]
+                    self._stats['written'] += len(written)
+                    self._stats['rejected'] += len(rejected)
+                    self._stats['flush_failures'] += 1
+                logger.error(f"Error writing {len(unsaved)} {self.model.__name__} rows: {str(e)}")
+                return len(written)
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['written'] += len(written)
+                self._stats['rejected'] += len(rejected)
+            return len(written)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def close(self) -> None:
+        """Stop the writer thread and drain the buffer"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['pid'] = os.getpid()
+        stats['writer_alive'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+
+_buffers = {}
+_buffers_pid = None
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(model, buffer_settings: dict) -> BulkWriteBuffer:
+    """Return this process's buffer for a model, rebuilding them all after a fork"""
+    global _buffers, _buffers_pid
+    if _buffers_pid != os.getpid() or model not in _buffers:
+        with _buffers_lock:
+            if _buffers_pid != os.getpid():
+                _buffers = {}
+                _buffers_pid = os.getpid()
+            if model not in _buffers:
+                _buffers[model] = BulkWriteBuffer(
+                    model,
+                    batch_size=buffer_settings['BATCH_SIZE'],
+                    flush_interval=buffer_settings['FLUSH_INTERVAL'],
+                    max_pending=buffer_settings['MAX_PENDING']
+                )
+                atexit.register(_buffers[model].close)
+    return _buffers[model]
+
+
+def get_analytics_buffer() -> BulkWriteBuffer:
+    """Return this process's VideoAnalytics buffer"""
+    from ..models import VideoAnalytics
+    return get_buffer(VideoAnalytics, get_analytics_settings())
+
+
+def get_audit_log_settings() -> dict:
+    """Return audit log writer settings merged with defaults"""
+    defaults = {
+        'BATCH_SIZE': 200,
+        'FLUSH_INTERVAL': 2,  # seconds
+        'MAX_PENDING': 50000,
+        # Written immediately: losing one of these to a crash is not acceptable
+        'SYNC_ACTION_TYPES': [
+            'payment', 'membership_change', 'user_activation', 'user_deactivation',
+            'settings_update', 'video_delete', 'mega_video_delete',
+        ],
+    }
+    defaults.update(getattr(settings, 'AUDIT_LOG_WRITER', {}))
+    return defaults
+
+
+def get_audit_buffer() -> BulkWriteBuffer:
+    """Return this process's AuditLog buffer"""
+    from ..models import AuditLog
+    return get_buffer(AuditLog, get_audit_log_settings())
+
+
+def record_audit(sync=None, **fields):
+    """
+    Add an AuditLog entry. Routine entries are buffered and bulk-written by a
+    background thread; action types in SYNC_ACTION_TYPES, or sync=True, are
+    saved before returning. Returns the (possibly not yet saved) entry.
+    """
+    from django.utils import timezone
+    from ..models import AuditLog
+
+    fields.setdefault('timestamp', timezone.now())
+    entry = AuditLog(**fields)
+    if sync is None:
+        sync = entry.action_type in get_audit_log_settings()['SYNC_ACTION_TYPES']
+    if sync:
+        entry.save()
+    else:
+        get_audit_buffer().add([entry])
+    return entry
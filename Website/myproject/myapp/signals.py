@@ -0,0 +1,10 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from .models import PaymentProof, MegaVideo, UserProfile
+from .services.dashboard_counters import remember_values, update_on_save, update_on_delete
+
+# Keep DashboardCounter rows current as the counted models change
+for model in (User, PaymentProof, MegaVideo, UserProfile):
+    pre_save.connect(remember_values, sender=model, dispatch_uid=f'counters_presave_{model.__name__}')
+    post_save.connect(update_on_save, sender=model, dispatch_uid=f'counters_save_{model.__name__}')
+    post_delete.connect(update_on_delete, sender=model, dispatch_uid=f'counters_delete_{model.__name__}')
@@ -0,0 +1,106 @@
+import logging
+import tempfile
+from django.core.files import File
+from django.core.files.storage import default_storage
+from .jobs import task
+from .models import MegaVideo, UserProfile
+from .services.write_buffer import record_audit
+
+logger = logging.getLogger(__name__)
+
+# Background tasks run by `manage.py runworker`. Arguments must be JSON
+# serializable and return values are stored on the BackgroundJob.
+
+
+@task(priority=5)
+def sync_drive_folder(folder_id, folder_name='', full=False, user_id=None, ip_address=None):
+    """Sync a Google Drive folder and record the outcome in the audit log"""
+    from .services.drive_client_pool import drive_client
+
+    with drive_client() as drive_service:
+        sync_result = drive_service.sync_folder(folder_id, full=full)
+
+    record_audit(
+        user_id=user_id,
+        action_type='folder_sync',
+        action=f'Synced folder: {folder_name or folder_id}',
+        ip_address=ip_address,
+        status=sync_result['status']
+    )
+    return sync_result
+
+
+@task(max_attempts=2, queue='media')
+def generate_mega_thumbnail(video_id):
+    """Generate a thumbnail for a MegaVideo that has none"""
+    video = MegaVideo.objects.filter(pk=video_id).first()
+    if not video or video.thumbnail or video.thumbnail_url:
+        return {'skipped': True}
+
+    if not video.generate_thumbnail():
+        raise RuntimeError(f"No thumbnail could be generated for video {video_id}")
+    video.save(update_fields=['thumbnail', 'thumbnail_url'])
+    return {'thumbnail_url': video.thumbnail_url}
+
+
+@task(priority=1, queue='media')
+def generate_profile_thumbnail(profile_id):
+    """Resize an uploaded profile picture into its thumbnail"""
+    profile = UserProfile.objects.select_related('user').filter(pk=profile_id).first()
+    if not profile or not profile.profile_picture or profile.profile_picture_thumbnail:
+        return {'skipped': True}
+
+    if not profile.generate_thumbnail():
+        raise RuntimeError(f"No thumbnail could be generated for profile {profile_id}")
+    profile.save(update_fields=['profile_picture_thumbnail'])
+    return {'thumbnail': profile.profile_picture_thumbnail.name}
+
+
+@task(priority=3, queue='media')
+def export_table(name, filters=None, export_format='csv'):
+    """Write an export to MEDIA_ROOT/exports/ without holding it in memory"""
+    from .services.exports import export_file_name, write_export
+
+    with tempfile.TemporaryFile() as output:
+        write_export(name, filters or {}, export_format, output)
+        output.seek(0)
+        file_name = default_storage.save(f"exports/{export_file_name(name, export_format)}", File(output))
+    return {'file': file_name, 'url': default_storage.url(file_name)}
+
+
+@task(priority=3, queue='media')
+def export_audit_logs_pdf(filters=None):
+    """Render filtered audit logs to a PDF under MEDIA_ROOT/exports/"""
+    return export_table('audit_logs', filters, 'pdf')
+
+
+@task(priority=2)
+def reconcile_dashboard_counters():
+    """Recompute dashboard counters from the source tables and fix any drift"""
+    from .services.dashboard_counters import reconcile_counters
+
+    return {'drift': reconcile_counters()}
+
+
+@task(priority=2)
+def roll_up_video_analytics(rebuild=False):
+    """Advance the per-day video analytics rollups from their high-water mark"""
+    from .services.analytics_rollup import roll_up_analytics, rebuild_rollups
+
+    return rebuild_rollups() if rebuild else roll_up_analytics()
+
+
+@task(priority=1)
+def prune_change_events():
+    """Delete change bus events every listener has already read"""
+    from .services.change_bus import prune_change_events
+
+    return {'deleted': prune_change_events()}
+
+
+@task(priority=0)
+def archive_old_rows():
+    """Move old AuditLog and VideoAnalytics rows into the Parquet archive"""
+    from .services.archive import ARCHIVES, archive_table
+
+    return {name: archive_table(name) for name in ARCHIVES}
@@ -3,6 +3,7 @@ Dashboard-specific template filters for the admin interface.
 These filters support the dashboard's data display functionality.
 """
 from django import template
+from ..services.audit_export import AUDIT_BADGE_COLORS, audit_log_detail
 
 register = template.Library()
 
@@ -15,3 +16,13 @@ def get_item(dictionary, key):
     if isinstance(dictionary, dict):
         return dictionary.get(key, '')
     return ''
+
+@register.filter(name='audit_badge')
+def audit_badge(log):
+    """Bootstrap badge colour for an audit log entry's action type."""
+    return AUDIT_BADGE_COLORS.get(log.action_type, 'secondary')
+
+@register.filter(name='audit_detail')
+def audit_detail(log):
+    """Short description of an audit log entry, formatted only for the rows shown."""
+    return audit_log_detail(log)
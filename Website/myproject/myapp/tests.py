@@ -1,3 +1,1206 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache, caches
+from django.db import OperationalError
+from django.http import Http404
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import jobs, views
+from .models import (
+    AuditLog, BackgroundJob, ChangeEvent, MegaVideo, MembershipUpgradeRequest, PaymentProof, RevenueEntry,
+    RollupCheckpoint, UserProfile, Video, VideoAnalytics, VideoDailyStats, VideoDailyViewer, VideoProgress,
+    VideoStreamSession
+)
+from .services import mega_thumbnail_service
+from .services.analytics_rollup import rebuild_rollups, roll_up_analytics
+from .services.archive import archive_table, archived_before, read_archive
+from .services.audit_export import page_audit_logs
+from .services.audit_search import PostgresSearch, search_audit_logs, word_prefix_pattern
+from .services.change_bus import ChangeBus, _DatabaseListener, prune_change_events
+from .services.dashboard_counters import get_counters, reconcile_counters
+from .services.drive_chunk_cache import DriveChunkStore, iter_byte_range
+from .services.hls_service import HLS_LADDER, expire_stale_processing, hls_video_id, package_mega_video
+from .services.media_delivery import FileRange, can_access_media, serve_protected_file
+from .services.mega_thumbnail_service import LeadingBytesExhausted, extract_frame_from_ranges
+from .services.progress_buffer import ProgressBuffer, _cache_key, get_progress, get_progress_map, record_progress
+from .services.retention import compute_retention, merge_intervals
+from .services.revenue import record_payment_proof
+from .services.time_series import bucket_starts, metric_series
+from .services.view_counter import ViewCounter
+from .services.write_buffer import BulkWriteBuffer
+from .utils import parse_range_header
+
+
+@jobs.task(name='tests.add')
+def add_numbers(a, b):
+    return {'sum': a + b}
+
+
+@jobs.task(name='tests.media', queue='media')
+def write_media_file():
+    return {}
+
+
+@jobs.task(name='tests.fail')
+def always_fail():
+    raise RuntimeError('boom')
+
+
+@jobs.task(name='tests.slow')
+def slow_task(seconds):
+    job = BackgroundJob.objects.get(task='tests.slow')
+    leased_until = job.locked_until
+    time.sleep(seconds)
+    job.refresh_from_db()
+    return {'extended': job.locked_until > leased_until}
+
+
+class ParseRangeHeaderTests(TestCase):
+    def test_absent_or_malformed_headers_serve_everything(self):
+        for header in (None, '', 'items=0-10', 'bytes=abc-def', 'bytes=10', 'bytes=-', 'bytes=20-10'):
+            self.assertIsNone(parse_range_header(header, 1000), header)
+
+    def test_closed_and_open_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range_header('bytes=100-', 1000), (100, 999))
+        self.assertEqual(parse_range_header('bytes=900-5000', 1000), (900, 999))
+
+    def test_suffix_ranges(self):
+        self.assertEqual(parse_range_header('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=-5000', 1000), (0, 999))
+
+    def test_only_first_of_multiple_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-1, 5-6', 1000), (0, 1))
+
+    def test_unsatisfiable_ranges(self):
+        with self.assertRaises(ValueError):
+            parse_range_header('bytes=1000-', 1000)
+        with self.assertRaises(ValueError):
+            parse_range_header('bytes=-0', 1000)
+
+
+class DriveChunkCacheTests(TestCase):
+    DATA = bytes(range(40))
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.store = DriveChunkStore(self.root, chunk_size=8, max_bytes=1000)
+        self.fetched = []
+
+        data, fetched = self.DATA, self.fetched
+
+        class FakeDrive:
+            def fetch_byte_range(self, file_id, start, end):
+                fetched.append((start, end))
+                return data[start:end + 1]
+
+        @contextmanager
+        def fake_client():
+            yield FakeDrive()
+
+        patcher = mock.patch('myapp.services.drive_chunk_cache.drive_client', fake_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, start, end):
+        return b''.join(iter_byte_range('file-1', start, end, len(self.DATA), store=self.store))
+
+    def test_ranges_are_served_from_fetched_chunks(self):
+        self.assertEqual(self.read(3, 20), self.DATA[3:21])
+        self.assertEqual(self.fetched, [(0, 7), (8, 15), (16, 23)])
+
+        # Fully cached now, and a range inside one chunk is sliced from it
+        self.assertEqual(self.read(9, 12), self.DATA[9:13])
+        self.assertEqual(self.read(0, 23), self.DATA[:24])
+        self.assertEqual(len(self.fetched), 3)
+
+    def test_last_chunk_is_short(self):
+        self.assertEqual(self.read(30, 39), self.DATA[30:])
+        self.assertEqual(self.fetched, [(24, 31), (32, 39)])
+
+    def test_new_version_drops_cached_chunks(self):
+        self.store.ensure_version('file-1', 'v1')
+        self.read(0, 7)
+        self.store.ensure_version('file-1', 'v1')
+        self.assertIsNotNone(self.store.get('file-1', 0))
+
+        self.store.ensure_version('file-1', 'v2')
+        self.assertIsNone(self.store.get('file-1', 0))
+
+    def test_least_recently_used_chunks_are_evicted(self):
+        store = DriveChunkStore(self.root, chunk_size=4, max_bytes=10)
+        now = time.time()
+        store.put('file-2', 0, b'aaaa')
+        store.put('file-2', 1, b'bbbb')
+        # Chunk 0 was read last, so chunk 1 is the least recently used
+        os.utime(store._chunk_path('file-2', 1), (now - 100, now - 100))
+        os.utime(store._chunk_path('file-2', 0), (now - 50, now - 50))
+
+        store.put('file-2', 2, b'cccc')
+
+        self.assertIsNone(store.get('file-2', 1))
+        self.assertEqual(store.get('file-2', 0), b'aaaa')
+        self.assertEqual(store.get('file-2', 2), b'cccc')
+
+
+@override_settings(BACKGROUND_JOBS={'PERIODIC': {}})
+class BackgroundJobTests(TestCase):
+    def test_claims_by_priority_then_run_at(self):
+        low = jobs.enqueue('tests.add', {'a': 1, 'b': 2}, priority=0)
+        high = jobs.enqueue('tests.add', {'a': 1, 'b': 2}, priority=5)
+        jobs.enqueue('tests.add', {'a': 1, 'b': 2}, priority=9, delay=3600)
+
+        self.assertEqual(jobs.claim_job('worker-1').pk, high.pk)
+        self.assertEqual(jobs.claim_job('worker-2').pk, low.pk)
+        self.assertIsNone(jobs.claim_job('worker-3'))
+
+    def test_workers_claim_only_their_queues(self):
+        media = jobs.enqueue('tests.media', priority=9)
+        default = jobs.enqueue('tests.add', {'a': 1, 'b': 2})
+        self.assertEqual(media.queue, 'media')
+
+        self.assertEqual(jobs.claim_job('worker-1', ['default']).pk, default.pk)
+        self.assertIsNone(jobs.claim_job('worker-1', ['default']))
+        self.assertEqual(jobs.claim_job('web-1', ['media']).pk, media.pk)
+
+    def test_claim_takes_a_lease(self):
+        queued = jobs.enqueue('tests.add', {'a': 1, 'b': 2})
+        job = jobs.claim_job('worker-1')
+
+        self.assertEqual(job.pk, queued.pk)
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.locked_by, 'worker-1')
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.locked_until, timezone.now())
+
+    def test_expired_lease_is_reclaimed(self):
+        jobs.enqueue('tests.add', {'a': 1, 'b': 2})
+        job = jobs.claim_job('worker-1')
+        self.assertIsNone(jobs.claim_job('worker-2'))
+
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = jobs.claim_job('worker-2')
+
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.locked_by, 'worker-2')
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_unique_key_does_not_queue_twice(self):
+        first = jobs.enqueue('tests.add', {'a': 1, 'b': 2}, unique_key='sum')
+        second = jobs.enqueue('tests.add', {'a': 3, 'b': 4}, unique_key='sum')
+        self.assertEqual(first.pk, second.pk)
+
+    def test_successful_run_records_result(self):
+        jobs.enqueue('tests.add', {'a': 1, 'b': 2})
+        job = jobs.claim_job('worker-1')
+
+        self.assertTrue(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result, {'sum': 3})
+        self.assertIsNone(job.locked_until)
+
+    def test_failures_are_retried_then_given_up(self):
+        jobs.enqueue('tests.fail')
+        BackgroundJob.objects.update(max_attempts=2)
+
+        self.assertFalse(jobs.run_job(jobs.claim_job('worker-1')))
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        BackgroundJob.objects.update(run_at=timezone.now())
+        self.assertFalse(jobs.run_job(jobs.claim_job('worker-1')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+    def test_lost_lease_does_not_overwrite_new_owner(self):
+        jobs.enqueue('tests.add', {'a': 1, 'b': 2})
+        job = jobs.claim_job('worker-1')
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_by='worker-2')
+
+        jobs.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.locked_by, 'worker-2')
+
+
+@override_settings(BACKGROUND_JOBS={'PERIODIC': {}, 'LEASE_SECONDS': 1, 'HEARTBEAT_SECONDS': 0.2})
+class JobHeartbeatTests(TransactionTestCase):
+    # The heartbeat writes from its own thread and connection, so the job must be committed
+
+    def test_lease_is_extended_while_the_task_runs(self):
+        jobs.enqueue('tests.slow', {'seconds': 1})
+        job = jobs.claim_job('worker-1')
+
+        self.assertTrue(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result, {'extended': True})
+        self.assertIsNone(job.locked_until)
+
+
+class BulkWriteBufferTests(TestCase):
+    def make_buffer(self, **kwargs):
+        options = {'batch_size': 100, 'flush_interval': 3600, 'max_pending': 1000}
+        options.update(kwargs)
+        buffer = BulkWriteBuffer(AuditLog, **options)
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def entries(self, count, prefix='entry'):
+        return [AuditLog(action_type='login', action=f'{prefix} {i}') for i in range(count)]
+
+    def test_flush_writes_pending_rows(self):
+        buffer = self.make_buffer()
+        buffer.add(self.entries(5))
+
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(AuditLog.objects.count(), 5)
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    def test_rejected_row_does_not_block_the_batch(self):
+        buffer = self.make_buffer()
+        entries = self.entries(10)
+        # NOT NULL violation
+        entries.insert(4, AuditLog(action_type='login', action=None))
+        buffer.add(entries)
+
+        self.assertEqual(buffer.flush(), 10)
+        stats = buffer.stats()
+        self.assertEqual((stats['written'], stats['rejected'], stats['pending']), (10, 1, 0))
+        self.assertEqual(AuditLog.objects.count(), 10)
+        self.assertFalse(AuditLog.objects.filter(action__isnull=True).exists())
+
+    def test_rows_are_kept_when_the_database_is_down(self):
+        buffer = self.make_buffer()
+        buffer.add(self.entries(5))
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=OperationalError('down')):
+            self.assertEqual(buffer.flush(), 0)
+        stats = buffer.stats()
+        self.assertEqual((stats['pending'], stats['flush_failures']), (5, 1))
+
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_rows_written_before_a_failure_are_not_requeued(self):
+        buffer = self.make_buffer()
+        entries = self.entries(8)
+        entries.insert(2, AuditLog(action_type='login', action=None))
+        buffer.add(entries)
+
+        bulk_create = AuditLog.objects.bulk_create
+        calls = []
+
+        def fail_after_first_write(batch, **kwargs):
+            calls.append(len(batch))
+            if len(calls) > 3:
+                raise OperationalError('down')
+            return bulk_create(batch, **kwargs)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=fail_after_first_write):
+            written = buffer.flush()
+
+        # Nothing is written twice once the database is back
+        pending = buffer.stats()['pending']
+        self.assertEqual(AuditLog.objects.count(), written)
+        self.assertEqual(written + pending + buffer.stats()['rejected'], 9)
+        buffer.flush()
+        self.assertEqual(AuditLog.objects.count(), 8)
+
+    def test_oldest_rows_are_dropped_past_max_pending(self):
+        buffer = self.make_buffer(max_pending=3)
+        buffer.add(self.entries(5))
+
+        self.assertEqual(buffer.stats()['dropped'], 2)
+        buffer.flush()
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list('action', flat=True)),
+            ['entry 2', 'entry 3', 'entry 4']
+        )
+
+
+class AnalyticsTestMixin:
+    """A video, a VIP viewer and helpers to record their analytics events"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('viewer', password='pass')
+        UserProfile.objects.create(user=self.user, membership_tier='vip')
+        self.video = Video.objects.create(title='Lesson', url='https://example.com/lesson.mp4')
+        self.start = timezone.make_aware(
+            datetime.combine(timezone.localdate() - timedelta(days=1), datetime.min.time())
+        ) + timedelta(hours=12)
+
+    def new_session(self, user=None):
+        return VideoStreamSession.objects.create(
+            user=user or self.user,
+            video=self.video,
+            signed_url='https://example.com/signed',
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+
+    def record(self, session, events):
+        """events: (event_type, seconds after self.start, position)"""
+        VideoAnalytics.objects.bulk_create([
+            VideoAnalytics(
+                session=session,
+                event_type=event_type,
+                timestamp=self.start + timedelta(seconds=offset),
+                position=position,
+                duration=100
+            )
+            for event_type, offset, position in events
+        ])
+
+
+@override_settings(ANALYTICS_ROLLUP={'LAG': 0})
+class AnalyticsRollupTests(AnalyticsTestMixin, TestCase):
+    def stats(self):
+        row = VideoDailyStats.objects.get(video=self.video)
+        return {
+            'plays': row.plays,
+            'unique_viewers': row.unique_viewers,
+            'watch_seconds': row.watch_seconds,
+            'completions': row.completions,
+        }
+
+    def test_plays_watch_time_and_completions(self):
+        session = self.new_session()
+        self.record(session, [('play', 0, 0), ('progress', 10, 10), ('progress', 20, 20), ('ended', 30, 30)])
+        # A forward seek is capped by the wall-clock time that passed
+        self.record(self.new_session(), [('play', 0, 0), ('seek', 5, 5), ('progress', 6, 60)])
+
+        result = roll_up_analytics()
+
+        self.assertEqual(result['events'], 7)
+        self.assertEqual(self.stats(), {'plays': 2, 'unique_viewers': 1, 'watch_seconds': 35, 'completions': 1})
+        self.assertEqual(VideoDailyViewer.objects.get().tier, 'vip')
+
+    def test_events_are_counted_once(self):
+        self.record(self.new_session(), [('play', 0, 0), ('progress', 10, 10)])
+        roll_up_analytics()
+
+        self.assertEqual(roll_up_analytics()['events'], 0)
+        self.assertEqual(self.stats()['watch_seconds'], 10)
+        self.assertEqual(self.stats()['plays'], 1)
+
+    def test_late_rows_are_rolled_up_into_their_session(self):
+        session = self.new_session()
+        self.record(session, [('play', 0, 0), ('progress', 10, 10), ('progress', 20, 20)])
+        roll_up_analytics()
+        mark = RollupCheckpoint.objects.get(name='video_analytics').high_water_mark
+
+        # Written after the mark, but timestamped inside the session: the
+        # pause takes 15..20 out of the watch time
+        self.record(session, [('pause', 15, 15)])
+        self.assertGreaterEqual(VideoAnalytics.objects.get(event_type='pause').created_at, mark)
+        roll_up_analytics()
+        incremental = self.stats()
+
+        rebuild_rollups()
+        self.assertEqual(incremental, self.stats())
+        self.assertEqual(incremental['watch_seconds'], 15)
+        self.assertEqual(incremental['plays'], 1)
+
+    def test_windows_follow_insert_time(self):
+        self.record(self.new_session(), [('play', 0, 0), ('progress', 10, 10)])
+        with override_settings(ANALYTICS_ROLLUP={'LAG': 3600}):
+            self.assertEqual(roll_up_analytics()['events'], 0)
+
+        self.assertEqual(roll_up_analytics()['events'], 2)
+
+
+@override_settings(VIDEO_RETENTION={'BIN_SECONDS': 1, 'MAX_BINS': 1000, 'CACHE_TIMEOUT': 0})
+class RetentionTests(AnalyticsTestMixin, TestCase):
+    def test_merge_intervals_per_session(self):
+        session = np.array([1, 0, 0, 0, 1])
+        start = np.array([0.0, 20.0, 0.0, 5.0, 2.0])
+        end = np.array([4.0, 30.0, 10.0, 8.0, 3.0])
+
+        merged_session, merged_start, merged_end = merge_intervals(session, start, end)
+
+        self.assertEqual(merged_session.tolist(), [0, 0, 1])
+        self.assertEqual(merged_start.tolist(), [0.0, 20.0, 0.0])
+        self.assertEqual(merged_end.tolist(), [10.0, 30.0, 4.0])
+
+    def test_touching_intervals_merge(self):
+        _, start, end = merge_intervals(np.array([0, 0]), np.array([0.0, 5.0]), np.array([5.0, 9.0]))
+        self.assertEqual((start.tolist(), end.tolist()), ([0.0], [9.0]))
+
+    def test_merge_intervals_empty(self):
+        session, start, end = merge_intervals(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        self.assertEqual(len(start), 0)
+
+    def test_rewatches_count_once_for_retention(self):
+        # Watches all 10 seconds
+        self.record(self.new_session(), [('play', 0, 0), ('progress', 10, 10), ('ended', 11, 10)])
+        # Watches the first 5 seconds twice
+        self.record(self.new_session(), [('play', 0, 0), ('pause', 5, 5), ('play', 6, 0), ('pause', 11, 5)])
+        VideoAnalytics.objects.update(duration=10)
+
+        result = compute_retention(self.video.id)
+
+        self.assertEqual(result['sessions'], 2)
+        self.assertEqual(result['retention'], [1.0] * 5 + [0.5] * 5)
+        self.assertEqual(result['views'], [3] * 5 + [1] * 5)
+        self.assertEqual(result['drop_off'][5], 0.5)
+
+    def test_no_events(self):
+        result = compute_retention(self.video.id)
+        self.assertEqual((result['sessions'], result['retention']), (0, []))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.settings_override = override_settings(ARCHIVE={
+            'STORAGE': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': root}},
+            'AUDIT_LOG_DAYS': 30,
+            'VIDEO_ANALYTICS_DAYS': 30,
+        })
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.user = User.objects.create_user('admin', password='pass')
+        now = timezone.now()
+        ages = [1, 2, 3, 40, 41, 41, 42, 45]
+        self.logs = []
+        for i, days in enumerate(ages):
+            log = AuditLog.objects.create(user=self.user, action_type='login', action=f'entry {i}')
+            # Two archived entries share a timestamp, so the id tie-break matters
+            timestamp = now - timedelta(days=days) if i != 5 else self.logs[4].timestamp
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=timestamp)
+            log.timestamp = timestamp
+            self.logs.append(log)
+        # Newest first, as the audit log page lists them
+        self.expected = [log.pk for log in sorted(self.logs, key=lambda log: (log.timestamp, log.pk), reverse=True)]
+
+    def test_old_rows_move_to_parquet(self):
+        result = archive_table('audit_logs')
+
+        self.assertEqual(result['archived'], 5)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertIsNotNone(archived_before('audit_logs'))
+        self.assertEqual(sorted(read_archive('audit_logs').column('id').to_pylist()), sorted(self.expected[3:]))
+
+    def test_archiving_again_is_a_no_op(self):
+        archive_table('audit_logs')
+        self.assertEqual(archive_table('audit_logs')['archived'], 0)
+        self.assertEqual(read_archive('audit_logs').num_rows, 5)
+
+    def test_pages_cross_from_database_into_archive(self):
+        archive_table('audit_logs')
+        params = {'start_date': (timezone.localdate() - timedelta(days=60)).isoformat()}
+
+        seen, archived, cursor = [], [], None
+        for _ in range(10):
+            page, cursor = page_audit_logs(params, cursor, page_size=3)
+            seen += [log.pk for log in page]
+            archived += [log.pk for log in page if getattr(log, 'archived', False)]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(archived, self.expected[3:])
+
+    def test_recent_ranges_do_not_read_the_archive(self):
+        archive_table('audit_logs')
+
+        page, cursor = page_audit_logs({}, page_size=10)
+        self.assertEqual([log.pk for log in page], self.expected[:3])
+        self.assertIsNone(cursor)
+
+    def test_analytics_wait_for_the_rollup(self):
+        self.assertEqual(archive_table('video_analytics')['archived'], 0)
+        self.assertIsNone(archived_before('video_analytics'))
+
+    def test_nothing_is_archived_without_storage(self):
+        with override_settings(ARCHIVE={'STORAGE': None, 'AUDIT_LOG_DAYS': 30}):
+            self.assertEqual(archive_table('audit_logs')['archived'], 0)
+            self.assertEqual(read_archive('audit_logs').num_rows, 0)
+        self.assertEqual(AuditLog.objects.count(), 8)
+
+    def test_rows_stay_when_the_file_does_not_read_back(self):
+        with mock.patch('pyarrow.parquet.read_table', side_effect=OSError('unreadable')):
+            with self.assertRaises(OSError):
+                archive_table('audit_logs')
+        self.assertEqual(AuditLog.objects.count(), 8)
+
+
+@override_settings(AUDIT_LOG_WRITER={'SYNC_ACTION_TYPES': ['payment', 'payment_proof', 'membership_change']})
+class RevenueLedgerTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.customer = User.objects.create_user('customer', password='pass', email='customer@example.com')
+        self.profile = UserProfile.objects.create(user=self.customer)
+        self.proof = PaymentProof.objects.create(user=self.customer, image='payment_proofs/proof.png', requested_tier='vip')
+        self.factory = RequestFactory()
+
+    def post(self, path, data=None):
+        request = self.factory.post(path, data or {})
+        request.user = self.admin
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
+
+    def assertBooked(self, source, source_id, amount, tier):
+        entry = RevenueEntry.objects.get()
+        self.profile.refresh_from_db()
+        self.assertEqual((entry.source, entry.source_id), (source, source_id))
+        self.assertEqual((entry.amount, entry.tier), (amount, tier))
+        self.assertEqual(entry.user, self.customer)
+        self.assertEqual(entry.recorded_by, self.admin)
+        self.assertEqual((entry.period_start, entry.period_end), (self.profile.membership_start_date, self.profile.membership_end_date))
+
+    def test_payment_proof_approve(self):
+        self.proof.approve(self.admin, feedback='')
+        self.assertBooked('payment_proof', self.proof.pk, 25, 'vip')
+
+    def test_payment_proof_reject_books_nothing(self):
+        self.proof.reject(self.admin, feedback='blurry')
+        self.assertFalse(RevenueEntry.objects.exists())
+
+    def test_handle_payment_proof_view(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('handle_payment_proof', args=[self.proof.pk, 'approve']))
+
+        self.assertEqual(response.json()['status'], 'approved')
+        self.assertBooked('payment_proof', self.proof.pk, 25, 'vip')
+
+        # Already processed: refused, and not booked again
+        response = self.client.post(reverse('handle_payment_proof', args=[self.proof.pk, 'approve']))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RevenueEntry.objects.count(), 1)
+
+    def test_handle_payment_proof_view_reject(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('handle_payment_proof', args=[self.proof.pk, 'reject']))
+
+        self.assertEqual(response.json()['status'], 'rejected')
+        self.proof.refresh_from_db()
+        self.assertEqual(self.proof.status, 'rejected')
+        self.assertFalse(RevenueEntry.objects.exists())
+
+    def test_process_payment_proof_view(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('process_payment_proof', args=[self.proof.pk]), {'action': 'approve'})
+
+        self.assertTrue(response.json()['success'])
+        self.assertBooked('payment_proof', self.proof.pk, 25, 'vip')
+
+    def test_verify_payment_view(self):
+        response = views.verify_payment(self.post('/verify/', {'membership_tier': 'vip'}), self.proof.pk, 'approve')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertBooked('payment_proof', self.proof.pk, 25, 'vip')
+
+    def test_verify_payment_view_refuses_another_tier(self):
+        response = views.verify_payment(self.post('/verify/', {'membership_tier': 'diamond'}), self.proof.pk, 'approve')
+
+        self.assertFalse(json.loads(response.content)['success'])
+        self.proof.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual((self.proof.status, self.profile.membership_tier), ('pending', 'regular'))
+        self.assertFalse(RevenueEntry.objects.exists())
+
+        # Without a tier, the requested one is granted
+        views.verify_payment(self.post('/verify/'), self.proof.pk, 'approve')
+        self.assertBooked('payment_proof', self.proof.pk, 25, 'vip')
+        self.assertEqual(self.profile.membership_tier, 'vip')
+
+    def test_approve_payment_view(self):
+        response = views.approve_payment(self.post('/approve/'), self.proof.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertBooked('payment_proof', self.proof.pk, 25, 'vip')
+
+    def test_upgrade_request_approve(self):
+        upgrade = MembershipUpgradeRequest.objects.create(
+            user=self.customer, desired_tier='diamond', reason='More lessons', screenshot='upgrade_proofs/shot.png'
+        )
+        upgrade.approve(self.admin)
+        self.assertBooked('upgrade_request', upgrade.pk, 50, 'diamond')
+
+    def test_upgrade_request_admin(self):
+        upgrade = MembershipUpgradeRequest.objects.create(
+            user=self.customer, desired_tier='diamond', reason='More lessons', screenshot='upgrade_proofs/shot.png'
+        )
+        upgrade.status = 'approved'
+        model_admin = admin.site._registry[MembershipUpgradeRequest]
+        model_admin.save_model(self.post('/admin/'), upgrade, mock.Mock(changed_data=['status']), change=True)
+
+        self.assertBooked('upgrade_request', upgrade.pk, 50, 'diamond')
+        # Same membership length as MembershipUpgradeRequest.approve and the ledger backfill
+        period = self.profile.membership_end_date - self.profile.membership_start_date
+        self.assertEqual(round(period.total_seconds() / 86400), MembershipUpgradeRequest.MEMBERSHIP_DAYS)
+
+    def test_second_approval_path_does_not_book_twice(self):
+        self.proof.approve(self.admin, feedback='')
+        record_payment_proof(self.proof, self.admin)
+
+        self.assertEqual(RevenueEntry.objects.count(), 1)
+
+
+class FakeHLS:
+    """Stands in for ffmpeg_streaming's HLS output; writes a playlist or fails"""
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.ladder = None
+
+    def representations(self, *representations):
+        self.ladder = representations
+
+    def output(self, path, **kwargs):
+        if self.fail:
+            raise RuntimeError('ffmpeg exited with 1')
+        with open(path, 'w') as playlist:
+            playlist.write('#EXTM3U\n')
+
+
+class HLSPackagingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.media_root = media_root
+        self.video = MegaVideo.objects.create(
+            title='Clip', mega_file_link='https://example.com/clip.mp4', thumbnail_url='https://example.com/clip.jpg'
+        )
+
+    @contextmanager
+    def packager(self, hls):
+        source = mock.Mock()
+        source.hls.return_value = hls
+        with mock.patch('myapp.services.hls_service.ffmpeg_streaming.input', return_value=source):
+            yield
+
+    def video_dir(self):
+        return os.path.join(self.media_root, 'hls', f'video_{self.video.id}')
+
+    def test_packaging_swaps_in_the_full_ladder(self):
+        os.makedirs(self.video_dir())
+        with open(os.path.join(self.video_dir(), 'stale.ts'), 'w'):
+            pass
+        hls = FakeHLS()
+        with self.packager(hls):
+            playlist = package_mega_video(self.video)
+
+        self.assertEqual(playlist, f'hls/video_{self.video.id}/master.m3u8')
+        self.assertEqual(len(hls.ladder), len(HLS_LADDER))
+        self.assertEqual(os.listdir(self.video_dir()), ['master.m3u8'])
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'hls')), [f'video_{self.video.id}'])
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_status, 'ready')
+        self.assertEqual(self.video.get_hls_url(), f'{settings.MEDIA_URL}{playlist}')
+
+    def test_failed_packaging_keeps_the_previous_ladder(self):
+        os.makedirs(self.video_dir())
+        with open(os.path.join(self.video_dir(), 'master.m3u8'), 'w'):
+            pass
+        with self.packager(FakeHLS(fail=True)), self.assertRaises(RuntimeError):
+            package_mega_video(self.video)
+
+        self.assertEqual(os.listdir(self.video_dir()), ['master.m3u8'])
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'hls')), [f'video_{self.video.id}'])
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_status, 'failed')
+
+    def test_stale_processing_expires(self):
+        MegaVideo.objects.filter(pk=self.video.pk).update(
+            hls_status='processing', updated_at=timezone.now() - timedelta(hours=7)
+        )
+        fresh = MegaVideo.objects.create(
+            title='Fresh', mega_file_link='https://example.com/fresh.mp4', thumbnail_url='https://example.com/fresh.jpg',
+            hls_status='processing'
+        )
+
+        self.assertEqual(expire_stale_processing(), 1)
+        self.video.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((self.video.hls_status, fresh.hls_status), ('failed', 'processing'))
+
+
+class HLSAccessTests(TestCase):
+    def setUp(self):
+        self.video = MegaVideo.objects.create(
+            title='VIP clip', mega_file_link='https://example.com/vip.mp4', thumbnail_url='https://example.com/vip.jpg',
+            membership_tier='vip'
+        )
+        self.playlist = f'hls/video_{self.video.id}/master.m3u8'
+
+    def member(self, username, tier, days_left):
+        user = User.objects.create_user(username, password='pass')
+        UserProfile.objects.create(
+            user=user, membership_tier=tier, membership_end_date=timezone.now() + timedelta(days=days_left)
+        )
+        return user
+
+    def test_hls_video_id(self):
+        self.assertEqual(hls_video_id('hls/video_12/master.m3u8'), 12)
+        self.assertEqual(hls_video_id('hls/video_12/720p_0003.ts'), 12)
+        for path in ('hls/video_12/nested/master.m3u8', 'hls/video_x/master.m3u8', 'videos/video_12/master.m3u8', 'hls/video_12'):
+            self.assertIsNone(hls_video_id(path), path)
+
+    def test_renditions_follow_the_video_tier(self):
+        self.assertTrue(can_access_media(self.member('vip', 'vip', 30), self.playlist))
+        self.assertTrue(can_access_media(self.member('diamond', 'diamond', 30), self.playlist))
+        self.assertFalse(can_access_media(self.member('regular', 'regular', 30), self.playlist))
+        self.assertFalse(can_access_media(self.member('lapsed', 'vip', -1), self.playlist))
+        self.assertFalse(can_access_media(User.objects.create_user('plain', password='pass'), self.playlist))
+        self.assertTrue(can_access_media(User.objects.create_user('staff', password='pass', is_staff=True), self.playlist))
+
+    def test_free_and_missing_videos(self):
+        regular = self.member('regular', 'regular', 30)
+        MegaVideo.objects.filter(pk=self.video.pk).update(is_free=True)
+        self.assertTrue(can_access_media(regular, self.playlist))
+        self.assertFalse(can_access_media(regular, f'hls/video_{self.video.id + 1}/master.m3u8'))
+
+
+class ProtectedMediaDeliveryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root, ASYNC_STREAMING={'ENABLED': False})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        os.makedirs(os.path.join(media_root, 'videos'))
+        self.full_path = os.path.join(media_root, 'videos', 'my clip.mp4')
+        with open(self.full_path, 'wb') as file:
+            file.write(bytes(range(256)) * 4)
+        self.factory = RequestFactory()
+
+    def serve(self, backend='python', **headers):
+        with override_settings(PROTECTED_MEDIA={'BACKEND': backend, 'INTERNAL_URL': '/protected-media/'}):
+            return serve_protected_file(self.factory.get('/media/videos/my clip.mp4', **headers), 'videos/my clip.mp4')
+
+    def test_file_range_bounds_reads(self):
+        file_range = FileRange(open(self.full_path, 'rb'), 10, 5)
+        self.addCleanup(file_range.close)
+        self.assertEqual(file_range.read(3), bytes([10, 11, 12]))
+        self.assertEqual(file_range.read(), bytes([13, 14]))
+        self.assertEqual(file_range.read(), b'')
+        self.assertEqual(file_range.tell(), 15)
+        self.assertIsInstance(file_range.fileno(), int)
+
+    def test_python_backend_serves_ranges(self):
+        response = self.serve(HTTP_RANGE='bytes=1020-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1020-1023/1024')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(b''.join(response.streaming_content), bytes([252, 253, 254, 255]))
+        response.close()
+
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+        response.close()
+
+        response = self.serve(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_front_end_backends_only_set_headers(self):
+        response = self.serve('nginx', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/my%20clip.mp4')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+
+        response = self.serve('sendfile')
+        self.assertEqual(response['X-Sendfile'], os.path.realpath(self.full_path))
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    def test_paths_outside_media_root_are_refused(self):
+        for path in ('../secret.txt', 'videos/missing.mp4', 'videos'):
+            with self.assertRaises(Http404):
+                serve_protected_file(self.factory.get('/'), path)
+
+
+class ProgressBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('viewer', password='pass')
+        self.video = Video.objects.create(title='Lesson', url='https://example.com/lesson.mp4')
+        self.buffer = ProgressBuffer(flush_interval=3600, batch_size=100)
+        self.addCleanup(self.buffer._stop.set)
+        patcher = mock.patch('myapp.services.progress_buffer.get_progress_buffer', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reports_merge_and_reads_see_them_before_a_flush(self):
+        record_progress(self.user.id, self.video.id, 30, 100)
+        entry = record_progress(self.user.id, self.video.id, 96, 100)
+        self.assertTrue(entry['completed'])
+        # Seeking back keeps completion, and a report without a duration keeps the last percentage
+        entry = record_progress(self.user.id, self.video.id, 10, 0)
+        self.assertEqual((entry['current_time'], entry['progress'], entry['completed']), (10.0, 96.0, True))
+
+        self.assertFalse(VideoProgress.objects.exists())
+        self.assertEqual(get_progress(self.user.id, self.video.id)['current_time'], 10.0)
+        self.assertEqual(get_progress_map(self.user.id, [self.video.id])[self.video.id]['progress'], 96.0)
+
+    def test_flush_writes_the_latest_entry_once(self):
+        VideoProgress.objects.create(user=self.user, video=self.video, current_time=5, progress=5)
+        record_progress(self.user.id, self.video.id, 20, 100)
+        record_progress(self.user.id, self.video.id, 40, 100)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.flush(), 0)
+        row = VideoProgress.objects.get(user=self.user, video=self.video)
+        self.assertEqual((row.current_time, row.progress, row.completed), (40.0, 40.0, False))
+
+        # After the cache expires, reads fall back to the stored row
+        cache.clear()
+        self.assertEqual(get_progress(self.user.id, self.video.id)['current_time'], 40.0)
+
+    def test_flush_prefers_a_newer_report_from_another_process(self):
+        stale = record_progress(self.user.id, self.video.id, 20, 100)
+        newer = dict(stale, current_time=70, progress=70, updated_at=stale['updated_at'] + 1)
+        cache.set(_cache_key(self.user.id, self.video.id), newer)
+
+        self.buffer.flush()
+        self.assertEqual(VideoProgress.objects.get(user=self.user, video=self.video).current_time, 70.0)
+
+    def test_failed_flush_keeps_entries_for_the_next_one(self):
+        record_progress(self.user.id, self.video.id, 20, 100)
+        with mock.patch.object(self.buffer, '_upsert', side_effect=OperationalError('database is locked')):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.stats()['dirty'], 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertTrue(VideoProgress.objects.filter(user=self.user, video=self.video).exists())
+
+
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.videos = [
+            Video.objects.create(title=f'Lesson {i}', url=f'https://example.com/lesson{i}.mp4') for i in range(3)
+        ]
+        self.counter = ViewCounter(flush_interval=3600)
+        self.addCleanup(self.counter._stop.set)
+
+    def views(self):
+        return list(Video.objects.order_by('pk').values_list('views', flat=True))
+
+    def test_plays_are_held_in_process_until_flushed(self):
+        for video, plays in zip(self.videos, (2, 2, 1)):
+            for _ in range(plays):
+                self.counter.increment(Video, video.pk)
+        self.assertEqual(self.counter.pending(Video, [video.pk for video in self.videos]), {
+            self.videos[0].pk: 2, self.videos[1].pk: 2, self.videos[2].pk: 1
+        })
+
+        # One UPDATE per distinct delta
+        with self.assertNumQueries(2):
+            self.assertEqual(self.counter.flush(), 5)
+        self.assertEqual(self.views(), [2, 2, 1])
+        self.assertEqual(self.counter.pending(Video, [video.pk for video in self.videos]), {})
+        self.assertEqual(self.counter.flush(), 0)
+
+    def test_failed_update_keeps_the_delta(self):
+        self.counter.increment(Video, self.videos[0].pk, 3)
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=OperationalError('database is locked')):
+            self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.counter.pending(Video, [self.videos[0].pk]), {self.videos[0].pk: 3})
+
+        self.counter.flush()
+        self.assertEqual(self.views(), [3, 0, 0])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'views': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'view-counter-tests'},
+})
+class SharedViewCounterTests(TestCase):
+    def setUp(self):
+        self.video = Video.objects.create(title='Lesson', url='https://example.com/lesson.mp4')
+        self.counter = ViewCounter(flush_interval=3600, cache_alias='views')
+        self.addCleanup(self.counter._stop.set)
+        self.cache = caches['views']
+        self.cache.clear()
+        self.key = f'view_count:myapp.video:{self.video.pk}'
+
+    def test_flush_writes_plays_counted_by_other_processes(self):
+        self.counter.increment(Video, self.video.pk)
+        self.cache.incr(self.key, 4)
+
+        self.assertEqual(self.counter.flush(), 5)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.views, 5)
+        self.assertEqual(self.cache.get(self.key), 0)
+
+    def test_claim_gives_back_the_overshoot_of_a_stale_read(self):
+        self.cache.set(self.key, 5)
+        self.assertEqual(self.counter._claim(self.key), 5)
+
+        # A second flusher read 5 before the first decrement; only plays counted since are its own
+        self.cache.incr(self.key, 2)
+        with mock.patch.object(self.cache, 'get', return_value=5):
+            self.assertEqual(self.counter._claim(self.key), 2)
+        self.assertEqual(self.cache.get(self.key), 0)
+
+        with mock.patch.object(self.cache, 'get', return_value=5):
+            self.assertEqual(self.counter._claim(self.key), 0)
+        self.assertEqual(self.cache.get(self.key), 0)
+        self.assertEqual(self.counter.pending(Video, [self.video.pk]), {})
+
+
+class AuditLogSearchTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('admin', password='pass')
+        self.failed = AuditLog.objects.create(user=user, action_type='login', action='Failed login attempt for username: admin')
+        self.approved = AuditLog.objects.create(user=user, action_type='payment', action='Approved VIP payment_proof #12')
+
+    def search(self, query):
+        return set(search_audit_logs(AuditLog.objects.all(), query).values_list('pk', flat=True))
+
+    def test_every_term_must_match_a_word_prefix(self):
+        self.assertEqual(self.search('fail ADM'), {self.failed.pk})
+        self.assertEqual(self.search('vip proof'), {self.approved.pk})
+        self.assertEqual(self.search('ail'), set())
+        self.assertEqual(self.search('failed payment'), set())
+        self.assertEqual(self.search('  '), {self.failed.pk, self.approved.pk})
+
+    def test_index_follows_updates_and_deletes(self):
+        AuditLog.objects.filter(pk=self.failed.pk).update(action='Password reset for username: admin')
+        self.assertEqual(self.search('fail'), set())
+        self.assertEqual(self.search('reset'), {self.failed.pk})
+        self.approved.delete()
+        self.assertEqual(self.search('approved'), set())
+
+    def test_postgres_query_uses_the_indexed_expression(self):
+        sql, params = PostgresSearch().filter(AuditLog.objects.all(), ['fail', 'adm']).query.sql_with_params()
+        self.assertIn(PostgresSearch.VECTOR + " @@ to_tsquery('simple', %s)", sql)
+        self.assertIn('fail:* & adm:*', params)
+
+    def test_archived_rows_match_word_prefixes_too(self):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        actions = pa.array([self.failed.action, self.approved.action, 'Unfailing'])
+        matches = {
+            term: pc.match_substring_regex(actions, word_prefix_pattern(term), ignore_case=True).to_pylist()
+            for term in ('fail', 'adm', 'proof', 'ail')
+        }
+        self.assertEqual(matches, {
+            'fail': [True, False, False],
+            'adm': [True, False, False],
+            'proof': [False, True, False],
+            'ail': [False, False, False],
+        })
+
+
+@override_settings(TIME_ZONE='America/New_York')
+class TimeSeriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.tz = timezone.get_current_timezone()
+        # Wednesday afternoon in New York, already Thursday in UTC
+        self.now = timezone.make_aware(datetime(2025, 3, 12, 22, 30), self.tz)
+
+    def local(self, *args):
+        return timezone.make_aware(datetime(*args), self.tz)
+
+    def test_buckets_align_to_local_days_weeks_and_months(self):
+        self.assertEqual(bucket_starts('day', 2, self.now), [self.local(2025, 3, 11), self.local(2025, 3, 12)])
+        self.assertEqual(bucket_starts('week', 2, self.now), [self.local(2025, 3, 3), self.local(2025, 3, 10)])
+        self.assertEqual(
+            bucket_starts('month', 3, self.now),
+            [self.local(2025, 1, 1), self.local(2025, 2, 1), self.local(2025, 3, 1)]
+        )
+
+    def test_gaps_are_zero_and_closed_buckets_are_cached(self):
+        for username, joined in (('a', (2025, 3, 10, 23, 59)), ('b', (2025, 3, 12, 0, 1)), ('c', (2025, 3, 12, 21))):
+            User.objects.create_user(username, password='pass', date_joined=self.local(*joined))
+        starts = bucket_starts('day', 3, self.now)
+
+        self.assertEqual(metric_series('users', 'day', starts, self.now), [1, 0, 2])
+        # Only the current bucket is read again
+        User.objects.create_user('late', password='pass', date_joined=self.local(2025, 3, 11, 12))
+        User.objects.create_user('d', password='pass', date_joined=self.local(2025, 3, 12, 22))
+        with self.assertNumQueries(1):
+            self.assertEqual(metric_series('users', 'day', starts, self.now), [1, 0, 3])
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pass')
+        reconcile_counters()
+
+    def counters(self, *names):
+        return [get_counters().get(name, 0) for name in names]
+
+    def test_saves_and_deletes_move_counts(self):
+        proof = PaymentProof.objects.create(user=self.user, image='payment_proofs/proof.png', requested_tier='vip')
+        self.assertEqual(self.counters('payments.pending', 'payments.approved'), [1, 0])
+
+        proof = PaymentProof.objects.get(pk=proof.pk)
+        proof.status = 'approved'
+        proof.save()
+        self.assertEqual(self.counters('payments.pending', 'payments.approved'), [0, 1])
+
+        proof.delete()
+        self.assertEqual(self.counters('payments.pending', 'payments.approved'), [0, 0])
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_stale_instances_diff_against_the_stored_row(self):
+        stale = User.objects.get(pk=self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        reconcile_counters()
+
+        stale.is_active = True
+        stale.save()
+        self.assertEqual(self.counters('users.total', 'users.active'), [1, 1])
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_loading_and_untracked_saves_cost_nothing(self):
+        with self.assertNumQueries(1):
+            user = User.objects.get(pk=self.user.pk)
+        self.assertNotIn('_counter_values', user.__dict__)
+
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+
+class FakeRangeResponse:
+    """A requests response serving the Range header of a request from bytes in memory"""
+    def __init__(self, data, range_header):
+        first, last = range_header[len('bytes='):].split('-')
+        if not first:
+            start, end = len(data) - int(last), len(data) - 1
+        else:
+            start, end = int(first), min(int(last), len(data) - 1)
+        self.body = data[start:end + 1]
+        self.status_code = 206
+        self.headers = {'Content-Range': f'bytes {start}-{end}/{len(data)}'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.body), chunk_size):
+            yield self.body[offset:offset + chunk_size]
+
+
+@override_settings(VIDEO_THUMBNAILS={'MAX_LEADING_BYTES': 4096, 'TAIL_BYTES': 1024, 'READ_CHUNK_SIZE': 300})
+class ThumbnailRangeTests(TestCase):
+    def setUp(self):
+        self.data = bytes(range(256)) * 40
+        self.requests = []
+
+        def get(url, headers=None, **kwargs):
+            self.requests.append(headers['Range'])
+            return FakeRangeResponse(self.data, headers['Range'])
+
+        patcher = mock.patch('myapp.services.mega_thumbnail_service.requests.get', side_effect=get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_ffmpeg(self, args, **kwargs):
+        """Stands in for ffmpeg: checks the sparse file and returns a frame"""
+        with open(args[args.index('-i') + 1], 'rb') as file:
+            written = file.read()
+        self.assertEqual(len(written), len(self.data))
+        self.assertEqual(written[:4096], self.data[:4096])
+        self.assertEqual(written[-1024:], self.data[-1024:])
+        self.assertEqual(written[4096:-1024], bytes(len(self.data) - 5120))
+        return subprocess.CompletedProcess(args, 0, stdout=b'jpeg', stderr=b'')
+
+    def test_index_at_the_end_is_read_from_the_tail(self):
+        with mock.patch('myapp.services.mega_thumbnail_service.extract_frame_from_stream',
+                        side_effect=LeadingBytesExhausted('moov atom not found')), \
+                mock.patch('myapp.services.mega_thumbnail_service.subprocess.run', side_effect=self.run_ffmpeg):
+            self.assertEqual(mega_thumbnail_service._extract_frame('https://example.com/clip.mp4'), b'jpeg')
+        self.assertEqual(self.requests, ['bytes=-1024', 'bytes=0-4095'])
+
+    def test_known_size_and_decryption_offsets(self):
+        offsets = []
+
+        def decrypt_from(offset):
+            offsets.append(offset)
+            return lambda chunk: chunk
+
+        with mock.patch('myapp.services.mega_thumbnail_service.subprocess.run', side_effect=self.run_ffmpeg):
+            extract_frame_from_ranges('https://example.com/clip.mp4', decrypt_from=decrypt_from, size=len(self.data))
+        self.assertEqual(self.requests, [f'bytes={len(self.data) - 1024}-{len(self.data) - 1}', 'bytes=0-4095'])
+        self.assertEqual(offsets, [len(self.data) - 1024, 0])
+
+    def test_other_failures_are_not_retried(self):
+        with mock.patch('myapp.services.mega_thumbnail_service.extract_frame_from_stream',
+                        side_effect=RuntimeError('Invalid data found when processing input')):
+            with self.assertRaises(RuntimeError):
+                mega_thumbnail_service._extract_frame('https://example.com/clip.mp4')
+        self.assertEqual(self.requests, [])
+
+
+@override_settings(CHANGE_BUS={'BACKEND': 'database', 'POLL_INTERVAL': 0, 'LATENESS': 10, 'RETENTION': 3600})
+class ChangeBusTests(TestCase):
+    def setUp(self):
+        ChangeEvent.objects.create(channel='folder_changes', payload={'event': 'before'})
+        self.listener = _DatabaseListener(['folder_changes'], poll_interval=0, lateness=10)
+
+    def test_events_are_published_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ChangeBus().publish('folder_changes', {'event': 'synced', 'folder_id': 1})
+            self.assertEqual(self.listener.wait(0), [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.listener.wait(0), [('folder_changes', {'event': 'synced', 'folder_id': 1})])
+        self.assertEqual(self.listener.wait(0), [])
+
+    def test_only_listened_channels_are_delivered(self):
+        ChangeEvent.objects.create(channel='other', payload={'event': 'ignored'})
+        self.assertEqual(self.listener.wait(0), [])
+
+        self.listener.listen('other')
+        ChangeEvent.objects.create(channel='other', payload={'event': 'wanted'})
+        self.assertEqual([payload['event'] for _, payload in self.listener.wait(0)], ['ignored', 'wanted'])
+
+    def test_late_commits_below_the_high_water_mark_arrive_once(self):
+        first = ChangeEvent.objects.create(channel='folder_changes', payload={'event': 'first'})
+        late = ChangeEvent.objects.create(channel='folder_changes', payload={'event': 'late'})
+        # The listener saw the max id move past `late` before its row was visible
+        self.listener.last_id = late.pk
+        self.listener.seen[first.pk] = first.created_at
+        ChangeEvent.objects.create(channel='folder_changes', payload={'event': 'next'})
+
+        self.assertEqual([payload['event'] for _, payload in self.listener.wait(0)], ['late', 'next'])
+        self.assertEqual(self.listener.wait(0), [])
+
+    def test_prune_deletes_old_events(self):
+        ChangeEvent.objects.create(channel='folder_changes', created_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(prune_change_events(), 1)
+        self.assertEqual(ChangeEvent.objects.count(), 1)
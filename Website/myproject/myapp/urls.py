@@ -1,9 +1,13 @@
 # myapp/urls.py
 from django.urls import path
-from . import views
+from django.conf import settings
+from . import views, views_async
 from .views import add_video_form
 from django.contrib.auth import views as auth_views
 
+# Streaming views run as coroutines when served through myproject/asgi.py
+streaming_views = views_async if settings.ASYNC_STREAMING['ENABLED'] else views
+
 urlpatterns = [
     path('', views.index, name='index'),  
     path('terms/', views.terms_and_conditions, name='terms'),
@@ -37,7 +41,7 @@ urlpatterns = [
     # Admin URLs - Changed from admin/dashboard to dashboard to avoid conflict
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('dashboard/stats/<str:timeframe>/', views.dashboard_stats, name='dashboard_stats'),
-    path('dashboard/events/', views.dashboard_events, name='dashboard_events'),
+    path('dashboard/events/', streaming_views.dashboard_events, name='dashboard_events'),
     path('dashboard/users/', views.user_management, name='user_management'),
     path('dashboard/users/<int:user_id>/membership/', views.update_membership, name='update_membership'),
     path('dashboard/users/<int:user_id>/', views.user_details, name='user_details'),
@@ -59,13 +63,19 @@ urlpatterns = [
     # Other dashboard sections
     path('dashboard/payments/', views.payment_management, name='payment_management'),
     path('dashboard/reports/', views.reports, name='reports'),
+    path('dashboard/reports/video-analytics/', views.video_analytics_report, name='video_analytics_report'),
+    path('dashboard/reports/video-analytics/<int:video_id>/retention/', views.video_retention_report, name='video_retention_report'),
     path('dashboard/settings/', views.admin_settings, name='admin_settings'),
     path('dashboard/profile/', views.admin_profile, name='admin_profile'),
     path('dashboard/profile/update/', views.update_profile, name='update_profile'),  # Added update profile endpoint
     path('dashboard/audit-logs/', views.audit_logs, name='audit_logs'),
+    path('dashboard/audit-logs/data/', views.audit_logs_api, name='audit_logs_api'),
+    path('dashboard/audit-logs/export/', views.export_audit_logs, name='export_audit_logs'),
+    path('dashboard/exports/<str:name>/', views.export_table, name='export_table'),
     
     # Video streaming and analytics
     path('videos/<int:video_id>/analytics/', views.track_video_analytics, name='track_video_analytics'),
+    path('videos/<int:video_id>/analytics/batch/', views.track_video_analytics_batch, name='track_video_analytics_batch'),
     
     # MEGA Video management
     path('dashboard/mega-videos/<int:video_id>/delete/', views.delete_mega_video, name='delete_mega_video'),
@@ -80,11 +90,11 @@ urlpatterns = [
     path('dashboard/folders/list/', views.folder_videos_list, name='folder_videos_list'),
     path('dashboard/folders/<int:folder_id>/videos/', views.folder_videos_detail, name='folder_videos_detail'),
     path('dashboard/folders/<int:folder_id>/access/', views.manage_folder_access, name='manage_folder_access'),
-    path('dashboard/folders/events/', views.folder_events, name='folder_events'),
+    path('dashboard/folders/events/', streaming_views.folder_events, name='folder_events'),
     path('api/folders/<int:folder_id>/videos/', views.get_folder_videos, name='get_folder_videos'),
     
     # Video streaming
-    path('videos/<int:video_id>/stream/', views.video_streaming, name='video_streaming'),
+    path('videos/<int:video_id>/stream/', streaming_views.video_streaming, name='video_streaming'),
     path('videos/<int:video_id>/progress/', views.update_video_progress, name='update_video_progress'),
     path('membership/', views.membership_page, name='membership_page'),
     path('membership/upgrade/', views.upgrade_membership, name='upgrade_membership'),
@@ -92,3 +102,9 @@ urlpatterns = [
     path('upload-payment-proof/', views.upload_payment_proof, name='upload_payment_proof'),
     path('membership/upgrade/', views.membership_upgrade, name='membership_upgrade'),
 ]
+
+# Under ASGI the byte relay is served by a non-blocking view
+if settings.ASYNC_STREAMING['ENABLED']:
+    urlpatterns.append(
+        path('videos/<int:video_id>/relay/', views_async.relay_video_source, name='relay_video_source')
+    )
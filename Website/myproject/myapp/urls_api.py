@@ -4,4 +4,6 @@ from . import views_api
 urlpatterns = [
     path('api/video-progress/<int:video_id>/', views_api.video_progress_api, name='video_progress_api'),
     path('api/mega-videos/<int:video_id>/delete/', views_api.delete_mega_video_api, name='delete_mega_video_api'),
+    path('api/drive/pool-stats/', views_api.drive_pool_stats_api, name='drive_pool_stats_api'),
+    path('api/jobs/<int:job_id>/', views_api.job_status_api, name='job_status_api'),
 ]
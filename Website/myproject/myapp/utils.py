@@ -1,6 +1,7 @@
 import re
 
 
+def extract_folder_id(url_or_id):
     """Extract folder ID from Google Drive URL or return the ID if already clean"""
     # If it's already just an ID, return it
     if not any(x in url_or_id for x in ['/', '?']):
@@ -19,4 +20,44 @@ import re
             return match.group(1)
     
     # If no patterns match, return the original string
-    return url_or_id 
\ No newline at end of file
+    return url_or_id 
+
+
+def parse_range_header(range_header, size):
+    """
+    Parse an HTTP Range header against a resource of `size` bytes.
+    Returns (start, end) inclusive, None when the header is absent or
+    malformed (serve the whole resource), or raises ValueError when the
+    range cannot be satisfied (respond 416).
+    Only the first range of a multi-range request is honoured.
+    """
+    if not range_header or not range_header.strip().lower().startswith('bytes='):
+        return None
+
+    first_range = range_header.strip()[6:].split(',')[0].strip()
+    start_str, sep, end_str = first_range.partition('-')
+    if not sep:
+        return None
+
+    try:
+        start = int(start_str) if start_str else None
+        end = int(end_str) if end_str else None
+    except ValueError:
+        return None
+
+    if start is None:
+        if end is None:
+            return None
+        # Suffix range: last N bytes
+        if end == 0:
+            raise ValueError("Unsatisfiable suffix range")
+        return max(size - end, 0), size - 1
+
+    if end is None:
+        end = size - 1
+    if start >= size:
+        raise ValueError("Range start beyond end of resource")
+    if start > end:
+        return None
+
+    return start, min(end, size - 1)
@@ -4,13 +4,14 @@ import json
 import time
 from datetime import datetime, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import AuthenticationForm
 from .forms import CustomUserCreationForm, PaymentProofForm, MembershipUpgradeRequestForm
 from django.contrib.auth.models import User
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse, HttpResponseForbidden
-from django.db.models import Prefetch, Count, Sum, Value
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse, HttpResponseForbidden, Http404
+from django.db.models import Prefetch, Count, Sum, Value, Exists, OuterRef
 from django.db import models, transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError, PermissionDenied
@@ -23,7 +24,26 @@ from django.views.decorators.http import require_http_methods
 from django.db import IntegrityError
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from .models import UserProfile, PaymentProof, AuditLog, Video, Course, VideoProgress, VideoStreamSession, VideoAnalytics, AccessRequest, MembershipAccess, MegaVideo, MembershipUpgradeRequest
+from .services.drive_client_pool import drive_client
+from .services.audit_export import (
+    AUDIT_MAX_PAGE_SIZE, AUDIT_PAGE_SIZE, AUDIT_BADGE_COLORS, audit_log_detail, page_audit_logs
+)
+from .services.stats_broadcaster import get_dashboard_snapshot, get_dashboard_events_settings
+from .services.change_bus import FOLDER_CHANNEL, listen, publish_folder_change
+from .services.dashboard_counters import get_counters
+from .services.async_relay import streaming_body
+from .services.exports import (
+    EXPORT_FORMATS, EXPORT_TABLES, export_file_name, export_filters, export_queryset, get_export_settings, iter_export
+)
+from .services.write_buffer import get_analytics_settings, record_audit
+from .services.analytics_rollup import video_totals, daily_series, tier_totals
+from .services.time_series import dashboard_series
+from .services.revenue import record_payment_proof, total_revenue, revenue_by_month
+from .services.retention import get_retention
+from .services.progress_buffer import record_progress, get_progress, get_progress_map
+from .services.view_counter import current_views
+from .jobs import enqueue
+from .models import UserProfile, PaymentProof, AuditLog, Video, Course, VideoStreamSession, AccessRequest, MembershipAccess, MegaVideo, MembershipUpgradeRequest
 import logging
 logger = logging.getLogger(__name__)
 
@@ -159,7 +179,7 @@ def login_view(request):
                 login(request, user)
                 
                 # Log the successful login
-                AuditLog.objects.create(
+                record_audit(
                     user=user,
                     action_type='login',
                     action=f'User {username} logged in successfully',
@@ -173,7 +193,7 @@ def login_view(request):
         
         # Log failed login attempt (either invalid form or failed authentication)
         username = request.POST.get('username', '')
-        AuditLog.objects.create(
+        record_audit(
             user=None,  # No user since login failed
             action_type='login',
             action=f'Failed login attempt for username: {username}',
@@ -205,7 +225,7 @@ def logout_view(request):
             ip_address = request.META.get('REMOTE_ADDR')
         
         # Log the logout
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action_type='logout',
             action=f'User {username} logged out',
@@ -269,12 +289,12 @@ def admin_dashboard(request):
     ).order_by('tier__tier')
     
     # Get MEGA video counts
-    from .models import MegaVideo
+    counters = get_counters()
     mega_video_counts = {
-        'total': MegaVideo.objects.count(),
-        'regular': MegaVideo.objects.filter(membership_tier='regular').count(),
-        'vip': MegaVideo.objects.filter(membership_tier='vip').count(),
-        'diamond': MegaVideo.objects.filter(membership_tier='diamond').count()
+        'total': counters.get('mega_videos.total', 0),
+        'regular': counters.get('mega_videos.regular', 0),
+        'vip': counters.get('mega_videos.vip', 0),
+        'diamond': counters.get('mega_videos.diamond', 0)
     }
     
     context = {
@@ -309,7 +329,13 @@ def verify_payment(request, proof_id, action):
         return JsonResponse({'success': False, 'message': 'Invalid action'})
     
     feedback = request.POST.get('feedback', '')
-    membership_tier = request.POST.get('membership_tier', 'vip')  # Default to VIP if not specified
+    # The proof pays for its requested tier; granting another would book the wrong tier and price
+    membership_tier = request.POST.get('membership_tier') or proof.requested_tier
+    if action == 'approve' and membership_tier != proof.requested_tier:
+        return JsonResponse({
+            'success': False,
+            'message': f'This payment is for the {proof.requested_tier} tier; it cannot be approved as {membership_tier}'
+        })
     
     try:
         with transaction.atomic():
@@ -336,6 +362,8 @@ def verify_payment(request, proof_id, action):
                 profile.membership_start_date = timezone.now()
                 profile.membership_end_date = timezone.now() + timezone.timedelta(days=365)
                 profile.save()
+
+                record_payment_proof(proof, request.user, profile.membership_start_date, profile.membership_end_date)
                 
                 # Clear cache
                 try:
@@ -503,7 +531,7 @@ def update_membership(request, user_id):
             logger.warning(f"Failed to clear cache: {str(cache_error)}")
             
         # Log the change
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='membership_change',
             action=f'Updated membership from {old_tier} to {new_tier}',
@@ -556,24 +584,27 @@ def handle_payment_proof(request, proof_id, action):
                 }, status=400)
             
             # Update proof status
-            proof.status = action
+            proof.status = {'approve': 'approved', 'reject': 'rejected'}[action]
             proof.processed_by = request.user
             proof.processed_at = timezone.now()
             proof.save()
             
-            # If approved, update user's membership
+            # If approved, update user's membership and record the revenue
             if action == 'approve':
                 profile = proof.user.profile
                 profile.membership_tier = proof.requested_tier
-                profile.membership_start_date = timezone.now()
-                profile.membership_end_date = timezone.now() + timezone.timedelta(days=365)
+                profile.membership_start_date = proof.processed_at
+                profile.membership_end_date = proof.processed_at + timezone.timedelta(days=365)
                 profile.save()
+                record_payment_proof(
+                    proof, request.user, profile.membership_start_date, profile.membership_end_date
+                )
             
             # Log the action
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action_type='payment_proof',
-                action=f'{action.title()}d payment proof for user {proof.user.username}',
+                action=f'{proof.get_status_display()} payment proof for user {proof.user.username}',
                 ip_address=get_client_ip(request),
                 status='success'
             )
@@ -583,7 +614,7 @@ def handle_payment_proof(request, proof_id, action):
             
             return JsonResponse({
                 'success': True,
-                'message': f'Payment proof {action}d successfully',
+                'message': f'Payment proof {proof.status} successfully',
                 'status': proof.status
             })
             
@@ -604,9 +635,10 @@ def user_management(request):
     users = User.objects.exclude(is_superuser=True).select_related('profile').prefetch_related('payment_proofs').order_by('-date_joined')
     
     # Get counts for each payment proof status
-    pending_count = PaymentProof.objects.filter(status='pending').count()
-    approved_count = PaymentProof.objects.filter(status='approved').count()
-    rejected_count = PaymentProof.objects.filter(status='rejected').count()
+    counters = get_counters()
+    pending_count = counters.get('payments.pending', 0)
+    approved_count = counters.get('payments.approved', 0)
+    rejected_count = counters.get('payments.rejected', 0)
     
     users_data = []
     for user in users:
@@ -650,7 +682,7 @@ def process_payment_proof(request, proof_id):
             ip_address = request.META.get('REMOTE_ADDR')
             
         # Create base audit log for the action
-        audit_log = AuditLog.objects.create(
+        audit_log = record_audit(
             user=proof.user,
             action_type='payment',
             action=f'Payment proof {action}ed by {request.user.username}',
@@ -714,10 +746,10 @@ def log_activity(user, action_type, action_detail, request=None):
     """Log user activities"""
     try:
         client_ip = get_client_ip(request) if request else None
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action_type=action_type,
-            action_detail=action_detail,
+            action=action_detail,
             ip_address=client_ip
         )
     except Exception as e:
@@ -789,7 +821,7 @@ def get_video(request, video_id):
             'description': video.description,
             'url': video.url,
             'membership_tier': video.membership_tier,
-            'views': video.views,
+            'views': current_views(video),
             'is_active': video.is_active,
         }
         return JsonResponse(data)
@@ -810,7 +842,7 @@ def toggle_video_status(request, video_id):
             video.save()
             
             action = "Activated" if video.is_active else "Deactivated"
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action=f"{action} video: {video.title}",
                 action_type='video_update',
@@ -837,7 +869,7 @@ def delete_video(request, video_id):
             
             video.delete()
             
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action=f"Deleted video: {title}",
                 action_type='video_delete',
@@ -859,39 +891,25 @@ def payment_management(request):
     # Get all payment proofs
     payment_proofs = PaymentProof.objects.select_related('user', 'processed_by').order_by('-uploaded_at')
     
-    # Get counts
-    pending_count = payment_proofs.filter(status='pending').count()
-    approved_count = payment_proofs.filter(status='approved').count()
-    rejected_count = payment_proofs.filter(status='rejected').count()
-    
-    # Calculate total revenue from approved payments
-    total_revenue = 0
-    for proof in payment_proofs.filter(status='approved'):
-        total_revenue += PaymentProof.TIER_PRICING.get(proof.requested_tier, 0)
-
-    # Calculate monthly revenue for the last 6 months
-    monthly_revenue = []
-    for i in range(5, -1, -1):
-        month_start = timezone.now() - timezone.timedelta(days=30 * i)
-        month_end = month_start + timezone.timedelta(days=30)
-        month_proofs = payment_proofs.filter(
-            status='approved',
-            uploaded_at__gte=month_start,
-            uploaded_at__lt=month_end
-        )
-        revenue = sum(PaymentProof.TIER_PRICING.get(proof.requested_tier, 0) for proof in month_proofs)
-        monthly_revenue.append({
-            'month': month_start.strftime('%B'),
-            'revenue': revenue
-        })
+    # Get counts from the maintained counters
+    counters = get_counters()
+    pending_count = counters.get('payments.pending', 0)
+    approved_count = counters.get('payments.approved', 0)
+    rejected_count = counters.get('payments.rejected', 0)
+
+    # Revenue totals from the ledger, summed in SQL
+    monthly_revenue = [
+        {'month': timezone.localtime(month_start).strftime('%B'), 'revenue': float(revenue)}
+        for month_start, revenue in revenue_by_month(6)
+    ]
     
     context = {
         'payment_proofs': payment_proofs,
-        'total_revenue': total_revenue,
+        'total_revenue': total_revenue(),
         'pending_count': pending_count,
         'approved_count': approved_count,
         'rejected_count': rejected_count,
-        'monthly_revenue': monthly_revenue,
+        'monthly_revenue': json.dumps(monthly_revenue),  # Parsed with JSON.parse in the template
         'active_section': 'payments',
         'tier_pricing': PaymentProof.TIER_PRICING
     }
@@ -927,9 +945,11 @@ def approve_payment(request, payment_id):
         user_profile.membership_start_date = timezone.now()
         user_profile.membership_end_date = timezone.now() + timezone.timedelta(days=PaymentProof.TIER_DURATION.get(payment.requested_tier, 0))
         user_profile.save()
+
+        record_payment_proof(payment, request.user, user_profile.membership_start_date, user_profile.membership_end_date)
         
         # Log the activity
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='payment',
             action=f'Approved payment proof #{payment_id} for {payment.requested_tier} membership (${amount})',
@@ -992,45 +1012,101 @@ def reports(request):
         return redirect('dashboard')
 
     # Get basic statistics
-    total_users = User.objects.filter(is_superuser=False).count()
-    active_users = User.objects.filter(is_active=True).count()
+    counters = get_counters()
+    total_users = counters.get('users.members', 0)
+    active_users = counters.get('users.active', 0)
     
     # Get membership statistics
     membership_stats = []
     for tier, label in UserProfile.MEMBERSHIP_CHOICES:
-        count = UserProfile.objects.filter(membership_tier=tier).count()
         membership_stats.append({
             'membership_tier': tier,
-            'count': count
+            'count': counters.get(f'members.{tier}', 0)
         })
 
     # Get payment statistics
     approved_payments = PaymentProof.objects.filter(status='approved')
-    total_revenue = sum(payment.get_amount() for payment in approved_payments)
     recent_payments = approved_payments.order_by('-uploaded_at')[:5]
     
-    # Calculate monthly revenue for the last 6 months
-    today = timezone.now()
-    monthly_revenue = []
-    for i in range(5, -1, -1):
-        start_date = today - timedelta(days=today.day) - timedelta(days=30*i)
-        end_date = start_date + timedelta(days=32)
-        end_date = end_date.replace(day=1)
-        month_payments = approved_payments.filter(uploaded_at__gte=start_date, uploaded_at__lt=end_date)
-        monthly_revenue.append(sum(payment.get_amount() for payment in month_payments))
+    # Monthly revenue for the last 6 months, from the ledger
+    monthly_revenue = [float(revenue) for _, revenue in revenue_by_month(6)]
+
+    # Video engagement over the last 30 days, read from the daily rollups
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=29)
+    top_videos = video_totals(start_day, end_day, limit=10)
     
     context = {
         'total_users': total_users,
         'active_users': active_users,
         'membership_stats': json.dumps(membership_stats),  # Convert to JSON for JavaScript
-        'total_revenue': total_revenue,
+        'total_revenue': total_revenue(),
         'recent_payments': recent_payments,
         'monthly_revenue': json.dumps(monthly_revenue),  # Convert to JSON for JavaScript
+        'top_videos': top_videos,
         'active_section': 'reports'
     }
     
     return render(request, 'dashboard/reports.html', context)
 
+def _report_day_range(request):
+    """start/end query params (YYYY-MM-DD), defaulting to the last 30 days"""
+    try:
+        end_day = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else timezone.localdate()
+        start_day = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else end_day - timedelta(days=29)
+    except ValueError:
+        raise ValueError('Invalid start or end date')
+    if start_day > end_day or (end_day - start_day).days > 366:
+        raise ValueError('Date range must be between 1 and 367 days')
+    return start_day, end_day
+
+@login_required
+def video_analytics_report(request):
+    """
+    Rolled-up video engagement as JSON for the reports page. Query params:
+    start/end (YYYY-MM-DD, default the last 30 days), video (optional id).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
+
+    try:
+        start_day, end_day = _report_day_range(request)
+        video_id = int(request.GET['video']) if request.GET.get('video') else None
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat(),
+        'videos': video_totals(start_day, end_day, video_ids=[video_id] if video_id else None, limit=None if video_id else 50),
+        'daily': daily_series(start_day, end_day, video_id=video_id),
+        'tiers': tier_totals(start_day, end_day, video_id=video_id)
+    })
+
+@login_required
+def video_retention_report(request, video_id):
+    """
+    Audience retention for one video as JSON: the share of sessions still
+    watching at each bin_seconds step, a rewatch heatmap and drop-off.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
+
+    try:
+        start_day, end_day = _report_day_range(request)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    video = get_object_or_404(Video, id=video_id)
+    return JsonResponse({
+        'status': 'success',
+        'title': video.title,
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat(),
+        **get_retention(video.id, start_day, end_day)
+    })
+
 @login_required
 def admin_settings(request):
     if not is_admin(request.user):
@@ -1139,7 +1215,7 @@ def update_profile(request):
             user.save()
             
             # Create audit log entry
-            AuditLog.objects.create(
+            record_audit(
                 user=user,
                 action_type='profile_update',
                 action=f"Updated profile fields: {', '.join(changed_fields)}",
@@ -1161,7 +1237,7 @@ def update_profile(request):
         logger.error(f"Error updating profile: {str(e)}")
         
         # Log the error
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='profile_update',
             action=f"Failed to update profile: {str(e)}",
@@ -1184,66 +1260,36 @@ def audit_logs(request):
     user_id = request.GET.get('user_id', '')
     start_date = request.GET.get('start_date', '')
     end_date = request.GET.get('end_date', '')
+    search = request.GET.get('q', '')
 
-    # Base queryset
-    activities = AuditLog.objects.select_related('user', 'related_user').order_by('-timestamp')
-
-    # Apply filters
-    if action_type:
-        activities = activities.filter(action_type=action_type)
-    if user_id:
-        activities = activities.filter(user_id=user_id)
-    if start_date:
-        try:
-            start_date = timezone.datetime.strptime(start_date, '%Y-%m-%d').date()
-            activities = activities.filter(timestamp__date__gte=start_date)
-        except ValueError:
-            pass
-    if end_date:
-        try:
-            end_date = timezone.datetime.strptime(end_date, '%Y-%m-%d').date()
-            activities = activities.filter(timestamp__date__lte=end_date)
-        except ValueError:
-            pass
-
-    # Add color-coded badges and format action details
-    for activity in activities:
-        activity.badge_color = {
-            'login': 'info',
-            'logout': 'secondary',
-            'register': 'success',
-            'profile_update': 'primary',
-            'payment': 'warning',
-            'video_upload': 'info',
-            'video_delete': 'danger',
-            'membership_change': 'primary',
-            'settings_update': 'info',
-            'user_activation': 'success',
-            'user_deactivation': 'danger',
-        }.get(activity.action_type, 'secondary')
-        
-        # Format action detail based on action type
-        if activity.action_type == 'membership_change':
-            activity.action_detail = f"Changed to {activity.action.split(' to ')[1]}"
-        elif activity.action_type == 'payment':
-            activity.action_detail = f"Payment for {activity.action}"
-        elif activity.action_type == 'video_upload':
-            activity.action_detail = f"Uploaded {activity.action}"
-        elif activity.action_type == 'video_delete':
-            activity.action_detail = f"Deleted {activity.action}"
-        else:
-            activity.action_detail = activity.action
-
-    # Get unique users for filter dropdown
+    # One keyset page; badges and details are rendered for these rows only
+    cursor = request.GET.get('cursor', '')
+    try:
+        activities, next_cursor = page_audit_logs(request.GET, cursor or None)
+    except ValueError:
+        return redirect('audit_logs')
+
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    first_query = query.urlencode()
+    next_query = ''
+    if next_cursor:
+        query['cursor'] = next_cursor
+        next_query = query.urlencode()
+
+    # Users with at least one entry, one index probe each rather than a join over the whole log
     users = User.objects.filter(
-        audit_logs__isnull=False
-    ).distinct().order_by('username')
+        Exists(AuditLog.objects.filter(user=OuterRef('pk')))
+    ).order_by('username')
 
     # Get unique action types for filter dropdown
     action_types = AuditLog.ACTION_TYPES
 
     context = {
         'activities': activities,
+        'cursor': cursor,
+        'first_query': first_query,
+        'next_query': next_query,
         'users': users,
         'action_types': action_types,
         'current_filters': {
@@ -1251,99 +1297,98 @@ def audit_logs(request):
             'user_id': user_id,
             'start_date': start_date,
             'end_date': end_date,
+            'q': search,
         },
         'active_section': 'audit_logs'
     }
 
     return render(request, 'dashboard/audit_logs.html', context)
 
-def export_logs(logs, format):
+@login_required
+def audit_logs_api(request):
     """
-    Export audit logs in CSV or PDF format
-    
-    Args:
-        logs: QuerySet of AuditLog objects to export
-        format: String indicating the export format ('csv' or 'pdf')
-    
-    Returns:
-        HttpResponse with the appropriate content type and file
-        HttpResponseBadRequest if format is invalid or export fails
+    Keyset-paginated audit log as JSON. Takes the audit log page filters
+    (including the full-text q) plus cursor (from the previous response's
+    next_cursor) and page_size.
     """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
+
     try:
-        if format == 'csv':
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-            
-            writer = csv.writer(response)
-            writer.writerow(['User', 'Action', 'Type', 'IP Address', 'Timestamp'])
-            
-            for log in logs:
-                writer.writerow([
-                    log.user.username if log.user else 'Anonymous',
-                    log.action,
-                    log.action_type,
-                    log.ip_address or 'N/A',
-                    log.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                ])
-            
-            return response
-        
-        elif format == 'pdf':
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = 'attachment; filename="audit_logs.pdf"'
-            
-            # Create PDF document
-            doc = SimpleDocTemplate(response, pagesize=letter)
-            elements = []
-            
-            # Add title
-            styles = getSampleStyleSheet()
-            elements.append(Paragraph('Audit Logs', styles['Title']))
-            elements.append(Spacer(1, 12))
-            
-            # Create table data
-            data = [['User', 'Action', 'Type', 'IP Address', 'Timestamp']]
-            for log in logs:
-                data.append([
-                    log.user.username if log.user else 'Anonymous',
-                    log.action,
-                    log.action_type,
-                    log.ip_address or 'N/A',
-                    log.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                ])
-            
-            # Create table
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 14),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 12),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(table)
-            
-            try:
-                # Build PDF
-                doc.build(elements)
-                return response
-            except Exception as e:
-                logger.error(f"Failed to build PDF: {str(e)}")
-                return HttpResponseBadRequest("Failed to generate PDF. Please try again or use CSV format.")
-        
-        else:
-            return HttpResponseBadRequest("Invalid export format. Supported formats: csv, pdf")
-            
-    except Exception as e:
-        logger.error("Failed to export logs: " + str(e))
-        return HttpResponseBadRequest("Failed to export logs. Please try again later.")
+        page_size = min(int(request.GET.get('page_size', AUDIT_PAGE_SIZE)), AUDIT_MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError('page_size must be positive')
+        logs, next_cursor = page_audit_logs(request.GET, request.GET.get('cursor') or None, page_size)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'logs': [{
+            'id': log.id,
+            'timestamp': log.timestamp.isoformat(),
+            'user': log.user.username if log.user else None,
+            'related_user': log.related_user.username if log.related_user else None,
+            'action_type': log.action_type,
+            'action': log.action,
+            'detail': audit_log_detail(log),
+            'badge': AUDIT_BADGE_COLORS.get(log.action_type, 'secondary'),
+            'ip_address': log.ip_address,
+            'status': log.status,
+            'archived': getattr(log, 'archived', False),
+        } for log in logs],
+        'next_cursor': next_cursor
+    })
+
+@login_required
+def export_table(request, name):
+    """
+    Export an admin table (audit_logs, payment_proofs, users, video_analytics)
+    as CSV or JSON Lines, streamed straight from a database cursor. PDFs, and
+    anything over EXPORTS['STREAM_ROW_LIMIT'] rows, are written to a file by
+    the job worker instead; poll status_url for the download link.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
+    if name not in EXPORT_TABLES:
+        raise Http404("Unknown export")
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_TABLES[name]['formats']:
+        return HttpResponseBadRequest(
+            f"Invalid export format. Supported formats: {', '.join(EXPORT_TABLES[name]['formats'])}"
+        )
+
+    queue = export_format == 'pdf' or request.GET.get('background') == '1'
+    if not queue:
+        row_limit = get_export_settings()['STREAM_ROW_LIMIT']
+        queue = bool(row_limit) and export_queryset(name, request.GET).count() > row_limit
+
+    if queue:
+        job = enqueue(
+            'export_table',
+            {'name': name, 'filters': export_filters(name, request.GET), 'export_format': export_format},
+            created_by=request.user
+        )
+        return JsonResponse({
+            'status': 'queued',
+            'message': f'{export_format.upper()} export queued',
+            'job_id': job.id,
+            'status_url': reverse('job_status_api', args=[job.id])
+        }, status=202)
+
+    # Pulled chunk by chunk under ASGI too, instead of being read into memory whole
+    response = StreamingHttpResponse(
+        streaming_body(iter_export(name, request.GET, export_format)),
+        content_type=EXPORT_FORMATS[export_format]['content_type']
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_file_name(name, export_format)}"'
+    return response
+
+@login_required
+def export_audit_logs(request):
+    """Export the filtered audit log (see export_table)"""
+    return export_table(request, 'audit_logs')
 
 @login_required
 def dashboard_stats(request, timeframe):
@@ -1351,54 +1396,8 @@ def dashboard_stats(request, timeframe):
         return HttpResponseForbidden("You don't have permission to access this page.")
     
     try:
-        now = timezone.now()
-        if timeframe == 'week':
-            start_date = now - timezone.timedelta(days=7)
-            interval = timezone.timedelta(days=1)
-            date_format = '%A'
-        elif timeframe == 'month':
-            start_date = now - timezone.timedelta(days=30)
-            interval = timezone.timedelta(days=1)
-            date_format = '%b %d'
-        else:  # year
-            start_date = now - timezone.timedelta(days=365)
-            interval = timezone.timedelta(days=30)
-            date_format = '%B'
-        
-        # Initialize data points
-        data_points = []
-        current_date = start_date
-        
-        while current_date <= now:
-            next_date = current_date + interval
-            
-            # Get user count
-            user_count = User.objects.filter(
-                date_joined__gte=current_date,
-                date_joined__lt=next_date
-            ).count()
-            
-            # Get revenue
-            revenue = PaymentProof.objects.filter(
-                status='approved',
-                uploaded_at__gte=current_date,
-                uploaded_at__lt=next_date
-            ).aggregate(Sum('amount'))['amount__sum'] or 0
-            
-            data_points.append({
-                'date': current_date.strftime(date_format),
-                'users': user_count,
-                'revenue': float(revenue)
-            })
-            
-            current_date = next_date
-        
-        return JsonResponse({
-            'labels': [point['date'] for point in data_points],
-            'users': [point['users'] for point in data_points],
-            'revenue': [point['revenue'] for point in data_points]
-        })
-        
+        # One grouped query per metric at most; closed buckets come from the cache
+        return JsonResponse(dashboard_series(timeframe))
     except Exception as e:
         logger.error(f"Error fetching dashboard stats: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
@@ -1414,44 +1413,13 @@ def dashboard_events(request):
     return response
 
 def event_stream(request):
-    """Generate server-sent events"""
+    """Generate server-sent events from the shared dashboard snapshot"""
+    interval = get_dashboard_events_settings()['INTERVAL']
     while True:
-        # Get latest statistics
-        stats = {
-            'total_users': User.objects.count(),
-            'active_users': User.objects.filter(is_active=True).count(),
-            'pending_payments': PaymentProof.objects.filter(status='pending').count(),
-            'total_revenue': float(PaymentProof.objects.filter(status='approved').aggregate(Sum('amount'))['amount__sum'] or 0)
-        }
-        
-        # Get latest activities
-        activities = AuditLog.objects.select_related('user', 'related_user').order_by('-timestamp')[:5]
-        activity_data = [{
-            'user': activity.user.username,
-            'action': activity.action,
-            'action_type': activity.action_type,
-            'badge_color': {
-                'login': 'info',
-                'logout': 'secondary',
-                'register': 'success',
-                'profile_update': 'primary',
-                'payment': 'warning',
-                'video_upload': 'info',
-                'video_delete': 'danger',
-                'membership_change': 'primary',
-                'settings_update': 'info',
-                'user_activation': 'success',
-                'user_deactivation': 'danger',
-            }.get(activity.action_type, 'secondary')
-        } for activity in activities]
-        
-        data = {
-            'stats': stats,
-            'activities': activity_data
-        }
-        
+        # Computed at most once per interval across all connections
+        data = get_dashboard_snapshot()
         yield f"data: {json.dumps(data)}\n\n"
-        time.sleep(5)  # Update every 5 seconds
+        time.sleep(interval)
 
 @login_required
 def course_list(request):
@@ -1507,15 +1475,15 @@ def course_detail(request, course_id):
         
         # Get user progress for accessible videos
         video_progress = {}
-        progress_objects = VideoProgress.objects.filter(
-            user=request.user,
-            video__in=accessible_videos
+        progress_entries = get_progress_map(
+            request.user.id,
+            accessible_videos.values_list('id', flat=True)
         )
         
-        for progress in progress_objects:
-            video_progress[progress.video.id] = {
-                'progress': progress.progress,
-                'completed': progress.completed
+        for video_id, progress in progress_entries.items():
+            video_progress[video_id] = {
+                'progress': progress['progress'],
+                'completed': progress['completed']
             }
         
         context = {
@@ -1647,6 +1615,11 @@ def video_player(request, video_id):
             if not stream_url:
                 raise Exception("Unable to generate streaming URL")
 
+            # Serve the adaptive ladder when one has been packaged
+            hls_url = video.get_hls_url()
+            if hls_url:
+                stream_url = hls_url
+
             # Get previous and next videos of the same tier
             videos = MegaVideo.objects.filter(membership_tier=video.membership_tier).order_by('title')
             video_list = list(videos)
@@ -1656,7 +1629,7 @@ def video_player(request, video_id):
             next_video = video_list[current_index + 1] if current_index < len(video_list) - 1 else None
             
             # Log video access
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action_type='video_access',
                 action=f'Accessed video: {video.title}',
@@ -1667,6 +1640,7 @@ def video_player(request, video_id):
             context = {
                 'video': video,
                 'stream_url': stream_url,
+                'hls_url': hls_url,
                 'previous_video': previous_video,
                 'next_video': next_video,
                 'videos': video_list,
@@ -1685,32 +1659,84 @@ def video_player(request, video_id):
         messages.error(request, "An error occurred while loading the video.")
         return redirect('video_streaming_course')
 
+def _clean_analytics_event(event):
+    """Validate one player event; raises ValueError on malformed input"""
+    if not isinstance(event, dict):
+        raise ValueError("Each event must be an object")
+    event_type = event.get('event_type')
+    if not isinstance(event_type, str) or not event_type or len(event_type) > 50:
+        raise ValueError("Invalid event_type")
+    metadata = event.get('metadata') or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata must be an object")
+    return {
+        'event_type': event_type,
+        'position': float(event.get('position')),
+        'duration': float(event.get('duration')),
+        'metadata': metadata
+    }
+
+def _get_analytics_session(request, video_id, session_id):
+    """Load the stream session and its video in one query and check ownership"""
+    session = get_object_or_404(
+        VideoStreamSession.objects.select_related('video'),
+        id=session_id,
+        video_id=video_id
+    )
+    if session.user_id != request.user.id:
+        raise PermissionDenied("Invalid session")
+    return session
+
 @login_required
 @require_http_methods(["POST"])
 def track_video_analytics(request, video_id):
     """Track video analytics events"""
     try:
         data = json.loads(request.body)
-        video = get_object_or_404(Video, id=video_id)
-        session = get_object_or_404(VideoStreamSession, id=data.get('session_id'))
-        
-        if session.user != request.user:
-            return HttpResponseForbidden("Invalid session")
-        
-        video.track_analytics(
-            session=session,
-            event_type=data.get('event_type'),
-            position=data.get('position'),
-            duration=data.get('duration'),
-            metadata=data.get('metadata')
-        )
+        session = _get_analytics_session(request, video_id, data.get('session_id'))
+        session.video.track_analytics_batch(session, [_clean_analytics_event(data)])
         
         return JsonResponse({'status': 'success'})
         
+    except PermissionDenied:
+        return HttpResponseForbidden("Invalid session")
     except Exception as e:
         logger.error(f"Error tracking analytics: {str(e)}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@login_required
+@require_http_methods(["POST"])
+def track_video_analytics_batch(request, video_id):
+    """
+    Accept a batch of player events for one session:
+    {"session_id": "...", "events": [{"event_type", "position", "duration", "metadata"}, ...]}
+    The events are buffered and written with bulk_create.
+    """
+    try:
+        data = json.loads(request.body)
+        events = data.get('events')
+        if not isinstance(events, list) or not events:
+            return JsonResponse({'status': 'error', 'message': 'events must be a non-empty list'}, status=400)
+        max_events = get_analytics_settings()['MAX_EVENTS_PER_REQUEST']
+        if len(events) > max_events:
+            return JsonResponse({'status': 'error', 'message': f'At most {max_events} events per request'}, status=400)
+
+        cleaned = [_clean_analytics_event(event) for event in events]
+        session = _get_analytics_session(request, video_id, data.get('session_id'))
+        session.video.track_analytics_batch(session, cleaned)
+
+        return JsonResponse({'status': 'success', 'accepted': len(cleaned)}, status=202)
+
+    except PermissionDenied:
+        return HttpResponseForbidden("Invalid session")
+    except Http404:
+        raise
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error tracking analytics batch: {str(e)}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
 @login_required
 def manage_drive_folders(request):
     """View for managing Google Drive folders"""
@@ -1776,9 +1802,10 @@ def create_drive_folder(request):
                 existing_folder.parent_folder = parent_folder
             existing_folder.is_active = True
             existing_folder.save()
+            publish_folder_change(existing_folder, 'updated')
             
             # Log the update
-            AuditLog.objects.create(
+            record_audit(
             user=request.user,
                 action_type='folder_update',
                 action=f'Updated Google Drive folder connection: {name}',
@@ -1807,9 +1834,10 @@ def create_drive_folder(request):
             folder_id=clean_folder_id,
             parent_folder=parent_folder
         )
+        publish_folder_change(folder, 'created')
         
         # Log the creation
-        AuditLog.objects.create(
+        record_audit(
                     user=request.user,
             action_type='folder_create',
             action=f'Created Google Drive folder connection: {name}',
@@ -1850,30 +1878,26 @@ def sync_drive_folder(request, folder_id):
         # Get the folder from database
         folder = get_object_or_404(GoogleDriveFolder, id=folder_id)
         
-        # Initialize Google Drive service
-        drive_service = GoogleDriveService()
-        
-        # Sync folder using the folder's Google Drive ID
-        result = drive_service.sync_folder(folder.folder_id)
-        
-        # Update folder in database
-        folder.last_synced = timezone.now()
-        folder.save()
-        
-        # Log the sync
-        AuditLog.objects.create(
-            user=request.user,
-            action_type='folder_sync',
-            action=f'Synced Google Drive folder: {folder.name}',
-            ip_address=get_client_ip(request),
-            status='success'
+        # Sync in the job worker using the folder's Google Drive ID
+        job = enqueue(
+            'sync_drive_folder',
+            {
+                'folder_id': folder.folder_id,
+                'folder_name': folder.name,
+                'full': request.GET.get('full') == 'true',
+                'user_id': request.user.id,
+                'ip_address': get_client_ip(request)
+            },
+            created_by=request.user,
+            unique_key=f'folder_sync:{folder.folder_id}'
         )
         
         return JsonResponse({
-            'status': 'success',
-            'message': 'Folder synced successfully',
-            'data': result
-        })
+            'status': 'queued',
+            'message': 'Folder sync queued',
+            'job_id': job.id,
+            'status_url': reverse('job_status_api', args=[job.id])
+        }, status=202)
         
     except Exception as e:
         logger.error(f"Error syncing folder {folder_id}: {str(e)}")
@@ -1890,18 +1914,10 @@ def update_video_progress(request, video_id):
             video = get_object_or_404(GoogleDriveVideo, id=video_id)
             data = json.loads(request.body)
             
-            # Get or create progress record
-            progress, created = VideoProgress.objects.get_or_create(
-                user=request.user,
-                video=video,
-                defaults={
-                    'progress': 0,
-                    'current_time': 0
-                }
-            )
-            
-            # Update progress
-            progress.update_progress(
+            # Cache the position; it is written to the database in bulk
+            record_progress(
+                request.user.id,
+                video.id,
                 current_time=data.get('current_time', 0),
                 duration=data.get('duration', 0)
             )
@@ -1914,20 +1930,11 @@ def update_video_progress(request, video_id):
     
     elif request.method == 'GET':
         try:
-            progress = VideoProgress.objects.get(
-                user=request.user,
-                video_id=video_id
-            )
-            return JsonResponse({
-                'success': True,
-                'current_time': progress.current_time,
-                'progress': progress.progress
-            })
-        except VideoProgress.DoesNotExist:
+            progress = get_progress(request.user.id, video_id) or {'current_time': 0, 'progress': 0}
             return JsonResponse({
                 'success': True,
-                'current_time': 0,
-                'progress': 0
+                'current_time': progress['current_time'],
+                'progress': progress['progress']
             })
         except Exception as e:
             logger.error(f"Error getting video progress: {str(e)}")
@@ -2141,7 +2148,7 @@ def video_streaming_course(request):
         }
         
         # Log the page view
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='page_view',
             action='Viewed video streaming course page',
@@ -2170,11 +2177,11 @@ def get_folder_videos(request, folder_id):
             }, status=403)
         
         # Get videos from Google Drive
-        drive_service = GoogleDriveService()
-        videos = drive_service.list_folder_videos(folder.folder_id)
+        with drive_client() as drive_service:
+            videos = drive_service.list_folder_videos(folder.folder_id)
         
         # Log the access
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='folder_access',
             action=f'Accessed folder: {folder.name}',
@@ -2321,9 +2328,10 @@ def delete_drive_folder(request, folder_id):
         
         # Delete folder from database
         folder.delete()
+        publish_folder_change(folder, 'deleted', folder_pk=folder_id)
         
         # Log the deletion
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='folder_delete',
             action=f'Deleted Google Drive folder connection: {folder_name}',
@@ -2366,12 +2374,13 @@ def update_folder_tier(request, folder_id):
             old_tier = folder.membership_tier
             folder.membership_tier = new_tier
             folder.save()
+            publish_folder_change(folder, 'updated')
             
             # Update access cache
             folder.update_access_cache()
             
             # Log the change
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action_type='folder_update',
                 action=f'Updated folder "{folder.name}" membership tier from {old_tier} to {new_tier}',
@@ -2411,92 +2420,33 @@ def folder_videos(request, folder_id):
 
 @staff_member_required
 def sync_folder(request, folder_id):
-    """View for syncing a Google Drive folder"""
+    """View for syncing a Google Drive folder; the sync itself runs in the job worker"""
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Invalid request method'})
     
     folder = get_object_or_404(GoogleDriveFolder, id=folder_id)
     
     try:
-        # Initialize Google Drive service
-        try:
-            drive_service = GoogleDriveService()
-        except Exception as service_error:
-            logger.error(f"Failed to initialize Google Drive service: {str(service_error)}")
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Failed to initialize Google Drive service. Please check your credentials.'
-            }, status=500)
+        job = enqueue(
+            'sync_drive_folder',
+            {
+                'folder_id': folder.folder_id,
+                'folder_name': folder.name,
+                'full': request.POST.get('full') == 'true',
+                'user_id': request.user.id,
+                'ip_address': get_client_ip(request)
+            },
+            created_by=request.user,
+            unique_key=f'folder_sync:{folder.folder_id}'
+        )
         
-        try:
-            # Start sync process with improved functionality
-            sync_result = drive_service.sync_folder(folder.folder_id)
-            
-            # Create audit log entry with detailed information
-            AuditLog.objects.create(
-                user=request.user,
-                action_type='folder_sync',
-                action=f'Synced folder: {folder.name}',
-                ip_address=get_client_ip(request),
-                status=sync_result['status'],
-                details=json.dumps({
-                    'total_videos': sync_result['total_videos'],
-                    'new_videos': sync_result['new_videos'],
-                    'updated_videos': sync_result['updated_videos'],
-                    'deleted_videos': sync_result['deleted_videos'],
-                    'sync_duration': sync_result['sync_duration'],
-                    'errors': sync_result['errors'] if sync_result['errors'] else None
-                })
-            )
-            
-            # Prepare response message
-            message = (
-                f"Successfully synced {sync_result['total_videos']} videos "
-                f"({sync_result['new_videos']} new, {sync_result['updated_videos']} updated, "
-                f"{sync_result['deleted_videos']} deleted)"
-            )
-            
-            if sync_result['errors']:
-                message += f" with {len(sync_result['errors'])} errors"
-            
-            return JsonResponse({
-                'status': sync_result['status'],
-                'message': message,
-                'videos_count': sync_result['total_videos'],
-                'last_synced': sync_result['timestamp'],
-                'details': {
-                    'new_videos': sync_result['new_videos'],
-                    'updated_videos': sync_result['updated_videos'],
-                    'deleted_videos': sync_result['deleted_videos'],
-                    'sync_duration': f"{sync_result['sync_duration']:.2f} seconds",
-                    'errors': sync_result['errors'] if sync_result['errors'] else None
-                }
-            })
-            
-        except Exception as sync_error:
-            error_msg = f"Error syncing folder {folder.name}: {str(sync_error)}"
-            logger.error(error_msg)
-            
-            # Log the error
-            AuditLog.objects.create(
-                user=request.user,
-                action_type='folder_sync',
-                action=f'Failed to sync folder: {folder.name}',
-                ip_address=get_client_ip(request),
-                status='error',
-                details=json.dumps({'error': str(sync_error)})
-            )
-            
-            return JsonResponse({
-                'status': 'error',
-                'message': error_msg
-            }, status=500)
-            
-    except GoogleDriveFolder.DoesNotExist:
         return JsonResponse({
-            'status': 'error',
-            'message': 'Folder not found'
-        }, status=404)
+            'status': 'queued',
+            'message': f'Sync of {folder.name} queued',
+            'job_id': job.id,
+            'status_url': reverse('job_status_api', args=[job.id])
+        }, status=202)
+            
     except Exception as e:
         logger.error(f"Error in sync_folder view: {str(e)}")
         return JsonResponse({
@@ -2518,9 +2468,10 @@ def delete_folder(request, folder_id):
         
         # Delete the folder and its videos
         folder.delete()
+        publish_folder_change(folder, 'deleted', folder_pk=folder_id)
         
         # Log the deletion
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='folder_delete',
             action=f'Deleted folder: {folder_name}',
@@ -2534,7 +2485,7 @@ def delete_folder(request, folder_id):
         
     except Exception as e:
         # Log the error
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='folder_delete',
             action=f'Failed to delete folder: {folder.name}. Error: {str(e)}',
@@ -2547,36 +2498,21 @@ def delete_folder(request, folder_id):
 
 @staff_member_required
 def folder_events(request):
-    """Server-Sent Events endpoint for real-time folder updates"""
+    """Server-Sent Events endpoint for real-time folder updates, woken by the change bus"""
     def event_stream():
-        last_check = time.time()
-        
-        while True:
-            # Check for updates every 5 seconds
-            current_time = time.time()
-            if current_time - last_check >= 5:
-                folders = GoogleDriveFolder.objects.filter(
-                    last_synced__gte=last_check
-                ).annotate(
-                    video_count=Count('googledrivevideo')
-                )
-                
-                for folder in folders:
-                    data = {
-                        'folder_id': folder.id,
-                        'video_count': folder.video_count,
-                        'last_synced': folder.last_synced.isoformat() if folder.last_synced else None
-                    }
-                    yield f"data: {json.dumps(data)}\n\n"
-                
-                last_check = current_time
-            
-            time.sleep(1)
+        for change in listen(FOLDER_CHANNEL):
+            if change is None:
+                # Keep-alive so proxies don't drop an idle connection
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(change)}\n\n"
     
-    return StreamingHttpResponse(
+    response = StreamingHttpResponse(
         event_stream(),
         content_type='text/event-stream'
     )
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 @login_required
 @user_passes_test(lambda u: u.is_staff or u.is_superuser)  # Only allow staff/admin users
@@ -2653,7 +2589,7 @@ def manage_folder_access(request, folder_id):
                 messages.success(request, f"Access revoked from {user.username}")
                 
             # Log the action
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action_type='folder_access',
                 action=f"{action} access for {user.username} to {folder.name}",
@@ -2763,9 +2699,10 @@ def add_folder(request):
             membership_tier=membership_tier,
             is_active=True
         )
+        publish_folder_change(folder, 'created')
         
         # Log the action
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='folder_create',
             action=f'Created folder: {name}',
@@ -2773,14 +2710,21 @@ def add_folder(request):
             status='success'
         )
         
-        # Try to sync the folder immediately
+        # Queue the initial sync of the folder
         try:
-            drive_service = GoogleDriveService()
-            sync_result = drive_service.sync_folder(folder_id)
-            folder.last_synced = timezone.now()
-            folder.save()
+            enqueue(
+                'sync_drive_folder',
+                {
+                    'folder_id': folder_id,
+                    'folder_name': name,
+                    'user_id': request.user.id,
+                    'ip_address': get_client_ip(request)
+                },
+                created_by=request.user,
+                unique_key=f'folder_sync:{folder_id}'
+            )
         except Exception as e:
-            logger.warning(f"Initial folder sync failed: {str(e)}")
+            logger.warning(f"Could not queue initial folder sync: {str(e)}")
         
         return JsonResponse({
             'success': True,
@@ -2801,38 +2745,48 @@ def add_folder(request):
 
 @login_required
 def video_streaming(request, video_id):
-    """Stream video from Google Drive with support for range requests"""
+    """Stream video from Google Drive through the range-aware chunk cache"""
     try:
-        # Get video record
+        from .services.drive_chunk_cache import get_chunk_store, get_drive_file_info, iter_byte_range
+        from .utils import parse_range_header
+
+        # Get video record and check tier access
         video = get_object_or_404(MegaVideo, id=video_id)
-        
-        # Initialize Google Drive service
-        drive_service = GoogleDriveService()
-        
-        # Get range header if present
+        if not video.get_stream_url(request.user):
+            raise PermissionError("Membership tier does not allow access")
+
+        file_id = video.drive_file_id
+        if not file_id:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Video is not hosted on Google Drive'
+            }, status=400)
+
+        file_info = get_drive_file_info(file_id)
+        size = file_info['size']
+        store = get_chunk_store()
+        store.ensure_version(file_id, file_info['version'])
+
+        # Parse range header if present
         range_header = request.META.get('HTTP_RANGE')
-        
-        # Get video stream info
-        stream_info = drive_service.get_video_stream(
-            video.drive_file_id,
-            request.user,
-            range_header
-        )
-        
-        # Create response
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        start, end = byte_range if byte_range else (0, size - 1)
+
         response = StreamingHttpResponse(
-            stream_info['request'].execute(),
-            content_type=stream_info['mime_type']
+            iter_byte_range(file_id, start, end, size, store),
+            content_type=file_info['mime_type'],
+            status=206 if byte_range else 200
         )
-        
-        # Set content length
-        response['Content-Length'] = stream_info['size']
-        
-        # Handle range request
-        if range_header:
-            response.status_code = 206
-            response['Content-Range'] = f'bytes {stream_info["start"]}-{stream_info["end"]}/{stream_info["size"]}'
-            response['Accept-Ranges'] = 'bytes'
+        response['Content-Length'] = end - start + 1
+        response['Accept-Ranges'] = 'bytes'
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
         
         # Set cache control headers
         response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -2843,13 +2797,14 @@ def video_streaming(request, video_id):
         response['X-Content-Type-Options'] = 'nosniff'
         response['X-Frame-Options'] = 'DENY'
         
-        # Log video access
-        log_activity(
-            request.user,
-            'video_stream',
-            f'Streamed video: {video.title}',
-            request
-        )
+        # Log video access once per playback rather than on every seek
+        if start == 0:
+            log_activity(
+                request.user,
+                'video_stream',
+                f'Streamed video: {video.title}',
+                request
+            )
         
         return response
         
@@ -2949,7 +2904,7 @@ def delete_mega_video(request, video_id):
     try:
         video = get_object_or_404(MegaVideo, id=video_id)
         video.delete()
-        AuditLog.objects.create(user=request.user, action=f"Deleted MEGA video: {video.title}", action_type='mega_video_delete')
+        record_audit(user=request.user, action=f"Deleted MEGA video: {video.title}", action_type='mega_video_delete')
         return JsonResponse({'status': 'success'})
     except Exception as e:
         logger.error(f"Error deleting MEGA video: {str(e)}")
@@ -3001,7 +2956,7 @@ def upgrade_membership(request):
         )
         
         # Log the upgrade request
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='membership_change',
             action=f'Requested upgrade to {tier} membership',
@@ -3069,10 +3024,11 @@ def membership_upgrade(request):
             upgrade_request.save()
             
             # Log the request
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
-                action='membership_upgrade_request',
-                details=f'Requested upgrade to {upgrade_request.get_desired_tier_display()}'
+                action_type='membership_change',
+                action=f'Requested upgrade to {upgrade_request.get_desired_tier_display()} membership',
+                status='pending'
             )
             
             # Send email notification to admin
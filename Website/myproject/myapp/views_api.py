@@ -1,8 +1,8 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
-from .models import MegaVideo, VideoProgress, AuditLog
+from .models import MegaVideo
+from .services.write_buffer import record_audit
 from django.shortcuts import get_object_or_404
 import json
 
@@ -14,20 +14,18 @@ def is_admin(user):
 def video_progress_api(request, video_id):
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=405)
-    user = request.user
     try:
         data = json.loads(request.body.decode('utf-8'))
-        current_time = data.get('current_time')
-        duration = data.get('duration')
-        percent = data.get('percent')
+        current_time = float(data.get('current_time', 0))
+        duration = float(data.get('duration', 0))
         video = MegaVideo.objects.get(pk=video_id)
-        progress, created = VideoProgress.objects.get_or_create(user=user, video_id=video.id)
-        progress.current_time = current_time
-        progress.duration = duration
-        progress.percent = percent
-        progress.last_updated = timezone.now()
-        progress.save()
-        return JsonResponse({'ok': True})
+        # Acknowledged but not stored: VideoProgress.video references Video, not
+        # MegaVideo, so a MegaVideo id there would overwrite another video's progress
+        return JsonResponse({
+            'ok': True,
+            'video_id': video.id,
+            'progress': min(100, (current_time / duration) * 100) if duration > 0 else 0
+        })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -47,7 +45,7 @@ def delete_mega_video_api(request, video_id):
         video.delete()
         
         # Log the deletion
-        AuditLog.objects.create(
+        record_audit(
             user=request.user,
             action_type='video_delete',
             action=f'Deleted MEGA video: {title}',
@@ -64,3 +62,30 @@ def delete_mega_video_api(request, video_id):
             'status': 'error',
             'error': str(e)
         }, status=400)
+
+@login_required
+def drive_pool_stats_api(request):
+    """Report this worker's Google Drive client pool usage"""
+    if not is_admin(request.user):
+        return JsonResponse({'status': 'error', 'error': 'Permission denied'}, status=403)
+
+    from .services.drive_client_pool import get_drive_pool
+    from .services.drive_metadata_cache import get_metadata_cache_stats
+    return JsonResponse({
+        'status': 'success',
+        'stats': get_drive_pool().stats(),
+        'metadata_cache': get_metadata_cache_stats()
+    })
+
+@login_required
+def job_status_api(request, job_id):
+    """Status of a background job, for polling from the dashboard"""
+    from .models import BackgroundJob
+    job = get_object_or_404(BackgroundJob, pk=job_id)
+    if not is_admin(request.user) and job.created_by_id != request.user.id:
+        return JsonResponse({'status': 'error', 'error': 'Permission denied'}, status=403)
+
+    return JsonResponse({
+        'status': 'success',
+        'job': job.to_dict()
+    })
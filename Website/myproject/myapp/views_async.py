@@ -0,0 +1,197 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse, Http404
+from asgiref.sync import sync_to_async
+from .models import MegaVideo
+from .services.mega_service import MegaService
+from .services.drive_chunk_cache import get_chunk_store, get_drive_file_info
+from .services.async_relay import (
+    RELAYED_HEADERS, open_upstream, iter_upstream, aiter_drive_range
+)
+from .services.stats_broadcaster import get_broadcaster
+from .services.change_bus import FOLDER_CHANNEL, alisten
+from .utils import parse_range_header
+from .views import log_activity
+import httpx
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Async streaming views, mounted in place of the sync ones when the app is served
+# over ASGI (settings.ASYNC_STREAMING['ENABLED']). Each open stream costs a
+# coroutine instead of a whole worker.
+
+
+async def _get_video_for_user(request, video_id):
+    """Fetch a video and check tier access without blocking the event loop"""
+    try:
+        video = await MegaVideo.objects.aget(id=video_id)
+    except MegaVideo.DoesNotExist:
+        raise Http404("Video not found")
+
+    user = await request.auser()
+    if not await sync_to_async(video.get_stream_url)(user):
+        raise PermissionError("Membership tier does not allow access")
+    return video, user
+
+
+def _add_stream_headers(response):
+    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    response['Pragma'] = 'no-cache'
+    response['Expires'] = '0'
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['X-Frame-Options'] = 'DENY'
+    return response
+
+
+@login_required
+async def video_streaming(request, video_id):
+    """Stream video from Google Drive through the chunk cache, asynchronously"""
+    try:
+        video, user = await _get_video_for_user(request, video_id)
+
+        file_id = video.drive_file_id
+        if not file_id:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Video is not hosted on Google Drive'
+            }, status=400)
+
+        file_info = await sync_to_async(get_drive_file_info, thread_sensitive=False)(file_id)
+        size = file_info['size']
+        store = get_chunk_store()
+        await sync_to_async(store.ensure_version, thread_sensitive=False)(file_id, file_info['version'])
+
+        try:
+            byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        start, end = byte_range if byte_range else (0, size - 1)
+
+        response = StreamingHttpResponse(
+            aiter_drive_range(file_id, start, end, size, store),
+            content_type=file_info['mime_type'],
+            status=206 if byte_range else 200
+        )
+        response['Content-Length'] = end - start + 1
+        response['Accept-Ranges'] = 'bytes'
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        _add_stream_headers(response)
+
+        if start == 0:
+            await sync_to_async(log_activity)(user, 'video_stream', f'Streamed video: {video.title}', request)
+
+        return response
+
+    except PermissionError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to access this video'
+        }, status=403)
+    except Http404:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming video {video_id}: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Error streaming video'
+        }, status=500)
+
+
+@login_required
+async def relay_video_source(request, video_id):
+    """
+    Relay a directly readable source (pCloud direct links) byte for byte,
+    passing the viewer's Range header through to the upstream host.
+    MEGA files are encrypted client-side and stay on the embed player.
+    """
+    try:
+        video, user = await _get_video_for_user(request, video_id)
+
+        if video.video_source == 'pcloud':
+            source_url = MegaService.convert_pcloud_to_direct(video.mega_file_link)
+        else:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'This video source cannot be relayed'
+            }, status=400)
+
+        upstream_headers = {}
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header:
+            upstream_headers['Range'] = range_header
+
+        upstream = await open_upstream(source_url, upstream_headers)
+        if upstream.status_code not in (200, 206):
+            await upstream.aclose()
+            logger.error(f"Upstream returned {upstream.status_code} for video {video_id}")
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Error streaming video'
+            }, status=416 if upstream.status_code == 416 else 502)
+
+        response = StreamingHttpResponse(iter_upstream(upstream), status=upstream.status_code)
+        for header in RELAYED_HEADERS:
+            if header in upstream.headers:
+                response[header] = upstream.headers[header]
+        _add_stream_headers(response)
+
+        if not range_header or range_header.startswith('bytes=0-'):
+            await sync_to_async(log_activity)(user, 'video_stream', f'Streamed video: {video.title}', request)
+
+        return response
+
+    except PermissionError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to access this video'
+        }, status=403)
+    except Http404:
+        raise
+    except httpx.HTTPError as e:
+        logger.error(f"Upstream error relaying video {video_id}: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Error streaming video'
+        }, status=502)
+
+
+@login_required
+async def dashboard_events(request):
+    """Server-sent dashboard statistics fanned out from the loop's shared broadcaster"""
+    user = await request.auser()
+    if not (user.is_staff or user.is_superuser):
+        return HttpResponseForbidden("You don't have permission to access this page.")
+
+    async def event_stream():
+        async for data in get_broadcaster().subscribe():
+            yield f"data: {json.dumps(data)}\n\n"
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+async def folder_events(request):
+    """Folder change events, pushed by the change bus instead of polled per connection"""
+    user = await request.auser()
+    if not user.is_staff:
+        return HttpResponseForbidden("You don't have permission to access this page.")
+
+    async def event_stream():
+        async for change in alisten(FOLDER_CHANNEL):
+            if change is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(change)}\n\n"
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
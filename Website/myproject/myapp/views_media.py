@@ -0,0 +1,15 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseForbidden
+from .services.media_delivery import can_access_media, serve_protected_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+@login_required
+def protected_media(request, path):
+    """Serve uploaded videos and payment proofs after checking the user's access"""
+    if not can_access_media(request.user, path):
+        logger.warning(f"Denied media access to {path} for user {request.user.id}")
+        return HttpResponseForbidden("You do not have permission to access this file.")
+
+    return serve_protected_file(request, path)
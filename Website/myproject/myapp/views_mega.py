@@ -7,8 +7,10 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.views.decorators.clickjacking import xframe_options_exempt
-from .models import MegaVideo, VideoProgress, AuditLog
+from .models import MegaVideo, VideoProgress
 from .services.mega_service import MegaService
+from .services.write_buffer import record_audit
+from .services.view_counter import count_view
 from .views import get_client_ip
 import logging
 import json
@@ -98,7 +100,7 @@ def add_mega_video(request):
             # Log the action
             source_names = {'mega': 'MEGA', 'pcloud': 'pCloud', 'gdrive': 'Google Drive'}
             source_name = source_names.get(video_source, video_source)
-            AuditLog.objects.create(
+            record_audit(
                 user=request.user,
                 action_type='mega_video_create',
                 action=f"Created {source_name} video: {title}",
@@ -230,13 +232,17 @@ def play_mega_video(request, video_id):
     elif user_tier == 'vip' and video.membership_tier == 'diamond':
         return HttpResponseForbidden("Your membership tier does not allow access to this video.")
     
-    # Generate streaming URL based on video source
-    mega_service = MegaService()
-    streaming_url = mega_service.get_universal_streaming_url(
-        video.mega_file_link, 
-        video.video_source, 
-        request.user
-    )
+    # Prefer the packaged HLS ladder, fall back to the source platform URL
+    hls_url = video.get_hls_url()
+    if hls_url:
+        streaming_url = hls_url
+    else:
+        mega_service = MegaService()
+        streaming_url = mega_service.get_universal_streaming_url(
+            video.mega_file_link, 
+            video.video_source, 
+            request.user
+        )
     
     # Debug logging
     logger.info(f"Original URL: {video.mega_file_link}")
@@ -253,14 +259,13 @@ def play_mega_video(request, video_id):
         'position': 'random'
     }
     
-    # Increment view count
-    video.views += 1
-    video.save()
+    # Increment view count; buffered and written as views = views + n
+    count_view(video)
     
     # Log video access
     source_names = {'mega': 'MEGA', 'pcloud': 'pCloud', 'gdrive': 'Google Drive'}
     source_name = source_names.get(video.video_source, video.video_source)
-    AuditLog.objects.create(
+    record_audit(
         user=request.user,
         action_type='video_access',
         action=f'Accessed {source_name} video: {video.title}',
@@ -271,6 +276,7 @@ def play_mega_video(request, video_id):
     context = {
         'video': video,
         'streaming_url': streaming_url,
+        'hls_url': hls_url,
         'video_source': video.video_source,
         'watermark_data': watermark_data
     }
@@ -5,8 +5,9 @@ from django.utils import timezone
 from django.urls import reverse
 from django.conf import settings
 from django.views.decorators.clickjacking import xframe_options_exempt
-from .models import Video, VideoStreamSession, VideoProgress, MembershipAccess
+from .models import Video, VideoStreamSession, MembershipAccess
 from .services.mega_service import MegaService
+from .services.progress_buffer import record_progress, progress_instance
 import jwt
 import time
 import json
@@ -94,16 +95,8 @@ def mega_video_player(request, video_id):
         }
     )
     
-    # Get or create video progress
-    progress, created = VideoProgress.objects.get_or_create(
-        user=request.user,
-        video=video,
-        defaults={
-            'progress': 0,
-            'current_time': 0,
-            'completed': False
-        }
-    )
+    # Latest progress, including positions not yet written to the database
+    progress = progress_instance(request.user, video)
     
     # Generate secure video URL
     secure_url = video.get_stream_url(request.user)
@@ -170,35 +163,14 @@ def update_video_progress_api(request, video_id):
         duration = float(data.get('duration', 0))
         completed = bool(data.get('completed', False))
         
-        # Calculate progress percentage
-        progress_percent = 0
-        if duration > 0:
-            progress_percent = min(100, (current_time / duration) * 100)
-        
-        # If we're at 95% or more, consider it completed
-        if progress_percent >= 95:
-            completed = True
-        
-        # Get or create progress record
-        progress, created = VideoProgress.objects.get_or_create(
-            user=request.user,
-            video_id=video_id,
-            defaults={
-                'current_time': current_time,
-                'progress': progress_percent,
-                'completed': completed
-            }
-        )
+        video = Video.objects.get(id=video_id)
         
-        # Update existing record
-        if not created:
-            progress.current_time = current_time
-            progress.progress = progress_percent
-            progress.completed = completed
-            progress.save()
+        # Cache the position; it is written to the database in bulk
+        progress = record_progress(request.user.id, video.id, current_time, duration, completed)
+        progress_percent = progress['progress']
+        completed = progress['completed']
         
         # Track analytics if available
-        video = Video.objects.get(id=video_id)
         sessions = VideoStreamSession.objects.filter(
             user=request.user,
             video=video,
@@ -3,6 +3,15 @@ ASGI config for myproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through this entry point switches the video streaming routes to their
+async views (see ASYNC_STREAMING in settings), e.g.:
+
+    gunicorn myproject.asgi:application -k uvicorn.workers.UvicornWorker
+
+Under ASGI a sync response body is read into memory in full before it is
+sent, so views that stream from a sync iterator wrap it in
+myapp.services.async_relay.streaming_body.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -11,6 +20,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+# Check if we're running on Render
+if 'RENDER' in os.environ:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.production_settings')
+else:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+
+os.environ.setdefault('ASYNC_STREAMING_ENABLED', 'True')
 
 application = get_asgi_application()
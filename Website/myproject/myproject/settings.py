@@ -403,6 +403,188 @@ VIDEO_STREAMING = {
     'MAX_VIDEO_SIZE': 1024 * 1024 * 1024,  # 1GB
 }
 
+# Protected uploads (videos, payment proofs) are access-checked by Django and then
+# delivered by the front-end server:
+#   'nginx'    -> X-Accel-Redirect to INTERNAL_URL, which must be an `internal` location
+#                 aliased to MEDIA_ROOT, e.g. location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+#   'sendfile' -> X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+#   'python'   -> Range-aware response from Django itself. Under WSGI (gunicorn sync workers)
+#                 it is sent with os.sendfile; under ASGI (UvicornWorker, see myproject/asgi.py)
+#                 it is read in chunks off the event loop, so each stream costs a coroutine
+#                 and a 64KB buffer. Prefer 'nginx' or 'sendfile' wherever such a front end exists.
+PROTECTED_MEDIA = {
+    'BACKEND': os.getenv('PROTECTED_MEDIA_BACKEND', 'python'),
+    'INTERNAL_URL': '/protected-media/',
+    'PROTECTED_DIRS': ['videos/', 'payment_proofs/', 'upgrade_proofs/', 'exports/', 'hls/'],
+}
+
+# HLS adaptive-bitrate packaging (see myapp/services/hls_service.py)
+HLS_STREAMING = {
+    'OUTPUT_DIR': 'hls',  # relative to MEDIA_ROOT; must be listed in PROTECTED_MEDIA['PROTECTED_DIRS']
+    'SEGMENT_SECONDS': 6,
+    'PROCESSING_TIMEOUT': 6 * 3600,  # a 'processing' status older than this is treated as failed
+    'FFMPEG_BIN': os.getenv('FFMPEG_BIN', 'ffmpeg'),
+}
+
+# Thumbnail extraction for MegaVideo (see myapp/services/mega_thumbnail_service.py)
+VIDEO_THUMBNAILS = {
+    'SEEK_SECONDS': 2,
+    'MAX_LEADING_BYTES': 32 * 1024 * 1024,  # never read more than this from MEGA or Drive
+    'TAIL_BYTES': 16 * 1024 * 1024,  # plus this much from the end when the MP4 index (moov) is there
+    'TIMEOUT': 120,
+    'FFMPEG_BIN': os.getenv('FFMPEG_BIN', 'ffmpeg'),
+}
+
+# Per-process Google Drive client pool (see myapp/services/drive_client_pool.py)
+DRIVE_CLIENT_POOL = {
+    'MAX_SIZE': int(os.getenv('DRIVE_CLIENT_POOL_SIZE', 8)),
+    'LEASE_TIMEOUT': 10,
+    'REFRESH_MARGIN': 300,  # renew tokens 5 minutes before they expire
+    'REFRESH_RETRY': 30,
+    'HTTP_TIMEOUT': 60,
+}
+
+# On-disk LRU chunk store for the Drive streaming proxy (see myapp/services/drive_chunk_cache.py)
+DRIVE_CHUNK_CACHE = {
+    'ROOT': os.getenv('DRIVE_CHUNK_CACHE_ROOT', os.path.join(BASE_DIR, 'drive_chunk_cache')),
+    'CHUNK_SIZE': 1024 * 1024,  # 1MB
+    'MAX_SIZE': int(os.getenv('DRIVE_CHUNK_CACHE_MAX_SIZE', 2 * 1024 * 1024 * 1024)),  # 2GB
+}
+
+# Shared Drive file metadata cache (see myapp/services/drive_metadata_cache.py)
+DRIVE_METADATA_CACHE = {
+    'FRESH_TTL': 300,  # served without contacting Drive
+    'MAX_TTL': 86400,  # stale entries are revalidated by `version` until then
+    'LOCK_TIMEOUT': 10,
+    'WAIT_FOR_LEADER': 2,
+}
+
+# Admin dashboard server-sent events (see myapp/services/stats_broadcaster.py)
+DASHBOARD_EVENTS = {
+    'INTERVAL': 5,  # one statistics query set per interval for the whole deployment
+    'LOCK_TIMEOUT': 30,
+}
+
+# Change notifications for folder_events: Postgres LISTEN/NOTIFY, or the ChangeEvent
+# table polled with max(id) (SQLite, CockroachDB) (see myapp/services/change_bus.py)
+CHANGE_BUS = {
+    'BACKEND': os.getenv('CHANGE_BUS_BACKEND', 'auto'),
+    'POLL_INTERVAL': 1.0,
+    'HEARTBEAT': 15,
+}
+
+# Async streaming proxy, enabled when served through myproject/asgi.py
+ASYNC_STREAMING = {
+    'ENABLED': os.getenv('ASYNC_STREAMING_ENABLED', 'False') == 'True',
+    'MAX_UPSTREAM_CONNECTIONS': int(os.getenv('ASYNC_STREAMING_MAX_CONNECTIONS', 1000)),
+    'MAX_KEEPALIVE_CONNECTIONS': 100,
+    'CONNECT_TIMEOUT': 10,
+    'READ_TIMEOUT': 30,
+    'RELAY_CHUNK_SIZE': 64 * 1024,
+}
+
+# Database job queue run by `manage.py runworker` (see myapp/jobs.py)
+BACKGROUND_JOBS = {
+    'POLL_INTERVAL': float(os.getenv('JOB_POLL_INTERVAL', 2)),
+    'LEASE_SECONDS': 300,  # jobs of a worker that died are picked up again after this
+    'HEARTBEAT_SECONDS': 60,  # running jobs renew their lease this often
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'PERIODIC': {
+        # Repairs counter drift from bulk updates and raw SQL, which skip signals
+        'reconcile_dashboard_counters': 3600,
+        'roll_up_video_analytics': 600,
+        'prune_change_events': 3600,
+        # Add 'archive_old_rows': 86400 once ARCHIVE['STORAGE'] points at shared storage
+    },
+}
+
+# Per-day video analytics rollups (see myapp/services/analytics_rollup.py)
+ANALYTICS_ROLLUP = {
+    'LAG': 300,  # must exceed VIDEO_ANALYTICS['FLUSH_INTERVAL']
+    'WINDOW': 3600,
+    'MAX_WINDOWS': 24,
+}
+
+# Parquet archive of old AuditLog and VideoAnalytics rows (see myapp/services/archive.py)
+# Rows are deleted only after their file reads back from STORAGE, which must be
+# shared by every service and survive redeploys; local disks are neither.
+ARCHIVE = {
+    'STORAGE': {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.getenv('ARCHIVE_BUCKET'),
+            'endpoint_url': os.getenv('ARCHIVE_ENDPOINT_URL'),
+            'access_key': os.getenv('ARCHIVE_ACCESS_KEY_ID'),
+            'secret_key': os.getenv('ARCHIVE_SECRET_ACCESS_KEY'),
+            'location': 'archive',
+            'default_acl': 'private',
+            'file_overwrite': True,
+        },
+    } if os.getenv('ARCHIVE_BUCKET') else None,
+    'AUDIT_LOG_DAYS': 90,
+    'VIDEO_ANALYTICS_DAYS': 60,
+    'BATCH_SIZE': 10000,
+    'MAX_BATCHES': 50,
+    'COMPRESSION': 'zstd',
+}
+
+# Player progress is cached and written to VideoProgress in bulk (see myapp/services/progress_buffer.py)
+VIDEO_PROGRESS = {
+    'FLUSH_INTERVAL': 30,  # seconds
+    'CACHE_TIMEOUT': 24 * 3600,
+    'COMPLETE_AT': 95,
+    'BATCH_SIZE': 500,
+}
+
+# Video and MegaVideo view counts are buffered in the cache (see myapp/services/view_counter.py)
+VIEW_COUNTERS = {
+    'FLUSH_INTERVAL': 10,  # seconds
+    # Pending deltas stay in each process unless this names a shared, non-evicting
+    # cache (e.g. Redis); the default LocMemCache culls entries and would drop plays
+    'CACHE': None,
+}
+
+# Audience retention curves (see myapp/services/retention.py)
+VIDEO_RETENTION = {
+    'BIN_SECONDS': 1,
+    'MAX_BINS': 1000,
+    'CACHE_TIMEOUT': 900,  # seconds
+}
+
+# Player analytics events are buffered per process and written in batches
+VIDEO_ANALYTICS = {
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 5,  # seconds
+    'MAX_PENDING': 20000,
+    'MAX_EVENTS_PER_REQUEST': 200,
+}
+
+# Dashboard chart series; ended buckets are cached this long (see myapp/services/time_series.py)
+DASHBOARD_TIME_SERIES = {
+    'CACHE_TIMEOUT': 6 * 3600,  # seconds
+}
+
+# Admin table exports (see myapp/services/exports.py); PDFs and anything
+# past STREAM_ROW_LIMIT rows are written to MEDIA_ROOT/exports/ by the worker
+EXPORTS = {
+    'CHUNK_SIZE': 2000,
+    'STREAM_ROW_LIMIT': 200000,
+}
+
+# Routine audit log entries are buffered per process and written in batches;
+# these action types are always saved before the request continues
+AUDIT_LOG_WRITER = {
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2,  # seconds
+    'MAX_PENDING': 50000,
+    'SYNC_ACTION_TYPES': [
+        'payment', 'membership_change', 'user_activation', 'user_deactivation',
+        'settings_update', 'video_delete', 'mega_video_delete',
+    ],
+}
+
 # Cache settings for video streaming
 CACHES = {
     'default': {
@@ -1,8 +1,9 @@
+import re
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from myapp import views
+from myapp import views, views_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,6 +14,15 @@ urlpatterns = [
     path('videos/<int:video_id>/', views.video_player, name='video_player'),
     path('free-videos/<int:video_id>/', views.free_video_player, name='free_video_player'),
     path('video-streaming/course/', views.video_streaming_course, name='video_streaming_course'),
+    # Protected uploads are access-checked before the generic MEDIA route below can serve them
+    re_path(
+        r'^%s(?P<path>(?:%s)/.+)$' % (
+            re.escape(settings.MEDIA_URL.lstrip('/')),
+            '|'.join(re.escape(d.strip('/')) for d in settings.PROTECTED_MEDIA['PROTECTED_DIRS'])
+        ),
+        views_media.protected_media,
+        name='protected_media'
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 # Add static and media file serving for development